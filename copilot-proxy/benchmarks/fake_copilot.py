@@ -0,0 +1,187 @@
+"""
+Stand-in for api.githubcopilot.com (and the token endpoint) - no quota burnt.
+
+    cd copilot-proxy && python -m benchmarks.fake_copilot [--port 9100] [--token-ms 5] [--error-rate 0.05]
+
+then point the proxy at it:
+
+    COPILOT_API_URL=http://localhost:9100 COPILOT_TOKEN_URL=http://localhost:9100/copilot_internal/v2/token COPILOT_TOKEN=fake
+
+/chat/completions streams a scripted agent turn by turn: think, then
+send_message, then task_complete (only tools offered in the request are
+used; without tools it streams a plain reply). With parallel_tool_calls in
+the request body the three calls come in a single turn.
+
+Behaviour is set with FAKE_* environment variables (or the CLI flags):
+    FAKE_TTFT_MS         delay before the first chunk (50)
+    FAKE_TOKEN_MS        delay between chunks (5)
+    FAKE_REPLY_TOKENS    words in the reply (40)
+    FAKE_ERROR_RATE      share of requests answered with FAKE_ERROR_STATUS (0)
+    FAKE_ERROR_STATUS    429, 500, 503... (429, with Retry-After: FAKE_RETRY_AFTER)
+    FAKE_CUT_RATE        share of streams cut off midway without [DONE] (0)
+"""
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+
+TTFT_MS = float(os.getenv("FAKE_TTFT_MS", "50"))
+TOKEN_MS = float(os.getenv("FAKE_TOKEN_MS", "5"))
+REPLY_TOKENS = int(os.getenv("FAKE_REPLY_TOKENS", "40"))
+ERROR_RATE = float(os.getenv("FAKE_ERROR_RATE", "0"))
+ERROR_STATUS = int(os.getenv("FAKE_ERROR_STATUS", "429"))
+RETRY_AFTER = os.getenv("FAKE_RETRY_AFTER", "1")
+CUT_RATE = float(os.getenv("FAKE_CUT_RATE", "0"))
+
+WORDS = ("the", "answer", "is", "four", "and", "that", "follows", "from", "simple", "arithmetic")
+
+app = FastAPI(title="Fake Copilot API")
+_rnd = random.Random(int(os.getenv("FAKE_SEED", "0")) or None)
+_stats = {"completions": 0, "streams": 0, "tokens": 0, "errors": 0, "cuts": 0, "token_requests": 0}
+
+
+def reply_text(n: int = REPLY_TOKENS) -> str:
+    return " ".join(WORDS[i % len(WORDS)] for i in range(n))
+
+
+def script(body: dict) -> list:
+    """Tool calls for this turn: [(name, arguments)], [] = plain content reply"""
+    offered = {t["function"]["name"] for t in body.get("tools") or []}
+    if not offered:
+        return []
+    plan = [("think", {"thought": "Short question, I can answer directly."}),
+            ("send_message", {"message": reply_text()}),
+            ("task_complete", {})]
+    plan = [(name, args) for name, args in plan if name in offered]
+    if body.get("parallel_tool_calls"):
+        return plan
+
+    # One step per turn: count the tool turns since the last user message
+    messages = body.get("messages") or []
+    last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=-1)
+    step = sum(1 for m in messages[last_user + 1:] if m.get("role") == "assistant" and m.get("tool_calls"))
+    return plan[step:step + 1] if step < len(plan) else [plan[-1]]
+
+
+def chunk(delta: dict, model: str, finish: str = None) -> bytes:
+    return b"data: " + json.dumps({
+        "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+    }, separators=(",", ":")).encode() + b"\n\n"
+
+
+def pieces(text: str) -> list:
+    """Cut text into token-sized fragments (a word plus its separator)"""
+    out, start = [], 0
+    for i, c in enumerate(text):
+        if c == " " and i > start:
+            out.append(text[start:i])
+            start = i
+    out.append(text[start:])
+    return [p for p in out if p]
+
+
+async def stream_turn(body: dict):
+    model = body.get("model", "gpt-4.1")
+    calls = script(body)
+    cut_at = None
+    if CUT_RATE and _rnd.random() < CUT_RATE:
+        _stats["cuts"] += 1
+        cut_at = _rnd.randint(1, 10)
+    sent = 0
+
+    await asyncio.sleep(TTFT_MS / 1000)
+    if calls:
+        frames = []
+        for index, (name, args) in enumerate(calls):
+            frames.append({"tool_calls": [{"index": index, "id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+                                           "function": {"name": name, "arguments": ""}}]})
+            for part in pieces(json.dumps(args)):
+                frames.append({"tool_calls": [{"index": index, "function": {"arguments": part}}]})
+    else:
+        frames = [{"content": part} for part in pieces(reply_text())]
+
+    for delta in frames:
+        if cut_at is not None and sent >= cut_at:
+            return  # Connection dropped mid-stream
+        yield chunk(delta, model)
+        sent += 1
+        _stats["tokens"] += 1
+        if TOKEN_MS:
+            await asyncio.sleep(TOKEN_MS / 1000)
+    yield chunk({}, model, "tool_calls" if calls else "stop")
+    yield b"data: [DONE]\n\n"
+
+
+@app.head("/")
+@app.get("/")
+async def root():
+    return {"status": "ok", "fake": True}
+
+
+@app.get("/copilot_internal/v2/token")
+async def token():
+    _stats["token_requests"] += 1
+    now = int(time.time())
+    return {"token": f"fake-{now}", "expires_at": now + 1800, "refresh_in": 1500}
+
+
+@app.post("/chat/completions")
+async def completions(request: Request):
+    body = await request.json()
+    _stats["completions"] += 1
+    if ERROR_RATE and _rnd.random() < ERROR_RATE:
+        _stats["errors"] += 1
+        return JSONResponse({"error": {"message": "injected error"}}, status_code=ERROR_STATUS,
+                            headers={"Retry-After": RETRY_AFTER} if ERROR_STATUS == 429 else {})
+
+    if body.get("stream"):
+        _stats["streams"] += 1
+        return StreamingResponse(stream_turn(body), media_type="text/event-stream")
+
+    # Non-streaming (context summaries): the reply text as one message
+    await asyncio.sleep(TTFT_MS / 1000 + REPLY_TOKENS * TOKEN_MS / 1000)
+    return {"id": "chatcmpl-fake", "object": "chat.completion", "model": body.get("model", "gpt-4.1"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply_text()}, "finish_reason": "stop"}]}
+
+
+@app.get("/_fake/stats")
+async def stats():
+    return _stats
+
+
+@app.post("/_fake/reset")
+async def reset():
+    for key in _stats:
+        _stats[key] = 0
+    return Response(status_code=204)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--ttft-ms", type=float)
+    parser.add_argument("--token-ms", type=float)
+    parser.add_argument("--reply-tokens", type=int)
+    parser.add_argument("--error-rate", type=float)
+    parser.add_argument("--error-status", type=int)
+    parser.add_argument("--cut-rate", type=float)
+    args = parser.parse_args()
+
+    # Settings are read at import: set them, then let uvicorn load the module fresh
+    for flag, env in (("ttft_ms", "FAKE_TTFT_MS"), ("token_ms", "FAKE_TOKEN_MS"), ("reply_tokens", "FAKE_REPLY_TOKENS"),
+                      ("error_rate", "FAKE_ERROR_RATE"), ("error_status", "FAKE_ERROR_STATUS"), ("cut_rate", "FAKE_CUT_RATE")):
+        if getattr(args, flag) is not None:
+            os.environ[env] = str(getattr(args, flag))
+
+    import uvicorn
+    uvicorn.run("benchmarks.fake_copilot:app", host="0.0.0.0", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
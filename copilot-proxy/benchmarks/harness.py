@@ -0,0 +1,88 @@
+"""Shared plumbing for the benchmarks: local service processes, readiness, percentiles"""
+import os
+import sys
+import time
+import socket
+import asyncio
+import subprocess
+import httpx
+
+PROXY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(PROXY_DIR)
+
+# Benchmark traffic stays on this host
+NO_PROXY_ENV = {"NO_PROXY": "*", "no_proxy": "*", "HTTP_PROXY": "", "HTTPS_PROXY": "", "http_proxy": "", "https_proxy": ""}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def launch(app: str, port: int, workers: int = 1, env: dict = None, cwd: str = PROXY_DIR) -> subprocess.Popen:
+    """uvicorn in a subprocess (output discarded)"""
+    cmd = [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port),
+           "--workers", str(workers), "--log-level", "warning"]
+    return subprocess.Popen(cmd, cwd=cwd, env={**os.environ, **NO_PROXY_ENV, **(env or {})},
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def stop(*procs):
+    for proc in procs:
+        if proc and proc.poll() is None:
+            proc.terminate()
+            proc.wait()
+
+
+async def wait_ready(url: str, timeout: float = 30.0, proc: subprocess.Popen = None):
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient(trust_env=False) as client:
+        while time.time() < deadline:
+            if proc is not None and proc.poll() is not None:
+                raise RuntimeError(f"{url}: process exited with {proc.returncode}")
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def proxy_env(fake_url: str, mcp_url: str, **extra) -> dict:
+    """copilot-proxy settings pointing at the fake Copilot API"""
+    return {
+        "COPILOT_TOKEN": "fake", "COPILOT_API_URL": fake_url,
+        "COPILOT_TOKEN_URL": f"{fake_url}/copilot_internal/v2/token",
+        "MCP_SERVER_URL": mcp_url, "UPSTREAM_HTTP2": "0", "UPSTREAM_MAX_CONNECTIONS": "200",
+        **{k: str(v) for k, v in extra.items()},
+    }
+
+
+def cpu_seconds(proc: subprocess.Popen):
+    """User + system CPU of a process and its descendants (uvicorn workers), None without /proc"""
+    try:
+        tick = os.sysconf("SC_CLK_TCK")
+        stats = {}
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                try:
+                    with open(f"/proc/{entry}/stat") as f:
+                        fields = f.read().rsplit(")", 1)[1].split()
+                except OSError:
+                    continue  # Exited meanwhile
+                stats[int(entry)] = (int(fields[1]), int(fields[11]) + int(fields[12]))  # ppid, utime + stime
+    except (OSError, ValueError, AttributeError):
+        return None
+    tree, total = {proc.pid}, 0
+    for pid in sorted(stats):  # Parents before children (pids grow)
+        if pid in tree or stats[pid][0] in tree:
+            tree.add(pid)
+            total += stats[pid][1]
+    return total / tick
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
@@ -0,0 +1,305 @@
+"""
+End-to-end load benchmark: copilot-proxy, mcp-server and memory-service under concurrency.
+
+    cd copilot-proxy && python -m benchmarks.load --spawn [--targets proxy,mcp] [--concurrency 1,8,32] [--duration 10]
+
+--spawn starts the fake Copilot API (benchmarks.fake_copilot), mcp-server, the
+proxy and (for the memory target) memory-service on a throwaway database. Without it, the services at --proxy-url / --mcp-url /
+--memory-url are driven as they are. The proxy must then point at a fake
+upstream, or it burns real quota. A target that isn't reachable is skipped.
+
+What each target measures (TTFT = time to first useful byte):
+    proxy    streamed agentic chat (think -> send_message -> task_complete);
+             TTFT = first message content. Upstream iterations per run come from the timing event
+    mcp      POST /execute_batch with a local tool; TTFT = response headers
+    memory   alternating POST /conversations/message and GET .../recent-messages
+
+Each run is appended to --history (JSON lines). The default file is
+gitignored: baselines are only meaningful on the machine that recorded them. Every result is compared
+with the median of the previous --baseline runs that used the same
+settings. Throughput or p95 latency worse than --tolerance is flagged,
+and --fail-on-regression then exits with status 1.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timezone
+import httpx
+from .harness import PROXY_DIR, REPO_DIR, free_port, launch, stop, wait_ready, proxy_env, percentile
+
+DEFAULT_HISTORY = os.path.join(PROXY_DIR, "benchmarks", "history.jsonl")
+
+
+# --- One request per target: (ttft seconds, total seconds, ok, iterations) ------
+
+async def proxy_request(client: httpx.AsyncClient, n: int, extra: dict):
+    body = {"model": "gpt-4.1", "stream": True, "use_tools": True, "caller": f"bench:{n % 64}",
+            "messages": [{"role": "user", "content": f"What is 2+2? (#{n})"}], **extra}
+    start = time.perf_counter()
+    ttft, iterations = None, None
+    async with client.stream("POST", "/v1/chat/completions", json=body) as resp:
+        async for line in resp.aiter_lines():
+            if ttft is None and line.startswith('data: {"id":"agentic"') and '"content"' in line:
+                ttft = time.perf_counter() - start
+            elif line.startswith('data: {"type":"timing"'):
+                iterations = len(json.loads(line[6:])["iterations"])
+    total = time.perf_counter() - start
+    return ttft or total, total, resp.status_code == 200 and ttft is not None, iterations
+
+
+async def mcp_request(client: httpx.AsyncClient, n: int, extra: dict):
+    body = {"tool_calls": [{"id": f"call_{n}", "type": "function",
+                            "function": {"name": "calculate", "arguments": json.dumps({"expression": f"{n} * 2"})}}],
+            "include_events": True}
+    start = time.perf_counter()
+    async with client.stream("POST", "/execute_batch", json=body) as resp:
+        ttft = time.perf_counter() - start
+        await resp.aread()
+    return ttft, time.perf_counter() - start, resp.status_code == 200, None
+
+
+async def memory_request(client: httpx.AsyncClient, n: int, extra: dict):
+    chat_id = f"bench-{n % 50}"
+    start = time.perf_counter()
+    if n % 2:
+        req = client.build_request("POST", "/conversations/message", json={
+            "conversation_id": f"telegram_{chat_id}", "role": "user", "content": f"benchmark message {n}"})
+    else:
+        req = client.build_request("GET", f"/conversations/user/{chat_id}/recent-messages", params={"limit": 20})
+    resp = await client.send(req, stream=True)
+    ttft = time.perf_counter() - start
+    await resp.aread()
+    await resp.aclose()
+    return ttft, time.perf_counter() - start, resp.status_code == 200, None
+
+
+TARGETS = {
+    "proxy": (proxy_request, "proxy_url", "/health"),
+    "mcp": (mcp_request, "mcp_url", "/"),
+    "memory": (memory_request, "memory_url", "/health"),
+}
+
+
+# --- Load generation ---------------------------------------------------------
+
+async def drive(request, base_url: str, concurrency: int, duration: float, extra: dict) -> dict:
+    """Closed loop: `concurrency` clients issue requests back to back for `duration` seconds"""
+    ttfts, totals, iterations = [], [], []
+    errors = 0
+    counter = iter(range(10 ** 9))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits, trust_env=False) as client:
+        async def user(deadline: float, record: bool):
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                try:
+                    ttft, total, ok, its = await request(client, next(counter), extra)
+                except httpx.HTTPError:
+                    ttft, total, ok, its = 0.0, 0.0, False, None
+                if not record:
+                    continue
+                if ok:
+                    ttfts.append(ttft)
+                    totals.append(total)
+                    if its is not None:
+                        iterations.append(its)
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(user(time.perf_counter() + min(2.0, duration / 5), False) for _ in range(concurrency)))
+        start = time.perf_counter()
+        await asyncio.gather(*(user(start + duration, True) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    ttfts.sort()
+    totals.sort()
+    ms = lambda v: round(v * 1000, 1)
+    return {
+        "requests": len(totals), "errors": errors, "rps": round(len(totals) / elapsed, 2),
+        "ttft_p50": ms(percentile(ttfts, 50)), "ttft_p95": ms(percentile(ttfts, 95)), "ttft_p99": ms(percentile(ttfts, 99)),
+        "total_p50": ms(percentile(totals, 50)), "total_p95": ms(percentile(totals, 95)), "total_p99": ms(percentile(totals, 99)),
+        "iterations": round(statistics.mean(iterations), 2) if iterations else None,
+    }
+
+
+async def spawn(args) -> list:
+    """Fake Copilot API + mcp-server + proxy (+ memory-service) on free local ports; returns the processes"""
+    fake_port, mcp_port, proxy_port = free_port(), free_port(), free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    fake_env = {"FAKE_TTFT_MS": args.ttft_ms, "FAKE_TOKEN_MS": args.token_ms,
+                "FAKE_ERROR_RATE": args.error_rate, "FAKE_CUT_RATE": args.cut_rate}
+    procs = [launch("benchmarks.fake_copilot:app", fake_port, env={k: str(v) for k, v in fake_env.items()})]
+    procs.append(launch("main:app", mcp_port, cwd=os.path.join(REPO_DIR, "mcp-server")))
+    procs.append(launch("src.app:app", proxy_port, args.workers,
+                        proxy_env(fake_url, f"http://127.0.0.1:{mcp_port}", WORKERS=args.workers)))
+    args.proxy_url = f"http://127.0.0.1:{proxy_port}"
+    args.mcp_url = f"http://127.0.0.1:{mcp_port}"
+    try:
+        await wait_ready(fake_url, proc=procs[0])
+        await wait_ready(f"{args.mcp_url}/", proc=procs[1])
+        await wait_ready(f"{args.proxy_url}/health", proc=procs[2])
+    except RuntimeError:
+        stop(*procs)
+        raise
+    if "memory" in args.targets:
+        procs.append(await spawn_memory(args))
+    return procs
+
+
+async def spawn_memory(args):
+    """memory-service on a temporary database; None (target skipped) if it doesn't start"""
+    port = free_port()
+    args.memory_data = tempfile.mkdtemp(prefix="bench-memory-")
+    proc = launch("main:app", port, cwd=os.path.join(REPO_DIR, "memory-service"),
+                  env={"DATABASE_PATH": os.path.join(args.memory_data, "memory.db")})
+    args.memory_url = f"http://127.0.0.1:{port}"
+    try:
+        await wait_ready(f"{args.memory_url}/health", proc=proc)
+    except RuntimeError as e:
+        print(f"⚠️  memory-service did not start ({e}), are its requirements installed?")
+        stop(proc)
+        return None
+    return proc
+
+
+async def reachable(url: str) -> bool:
+    try:
+        async with httpx.AsyncClient(timeout=3.0, trust_env=False) as client:
+            await client.get(url)
+        return True
+    except httpx.HTTPError:
+        return False
+
+
+async def run(args) -> list:
+    procs = await spawn(args) if args.spawn else []
+    results = []
+    try:
+        for target in args.targets:
+            request, url_attr, health = TARGETS[target]
+            base_url = getattr(args, url_attr)
+            if not await reachable(base_url + health):
+                print(f"⏭️  {target}: {base_url} not reachable, skipped")
+                continue
+            for concurrency in args.concurrency:
+                r = await drive(request, base_url, concurrency, args.duration, args.body if target == "proxy" else {})
+                results.append({"target": target, "concurrency": concurrency, **r})
+                print_row(results[-1])
+    finally:
+        stop(*procs)
+        if getattr(args, "memory_data", None):
+            shutil.rmtree(args.memory_data, ignore_errors=True)
+    return results
+
+
+# --- Report and history ------------------------------------------------------
+
+HEADER = (f"{'target':<8} {'conc':>5} {'req/s':>8} {'ttft p50':>9} {'p95':>8} {'p99':>8} "
+          f"{'total p50':>10} {'p95':>8} {'p99':>8} {'iters':>6} {'errors':>7}")
+
+
+def print_row(r: dict):
+    iters = f"{r['iterations']:.2f}" if r["iterations"] is not None else "-"
+    print(f"{r['target']:<8} {r['concurrency']:>5} {r['rps']:>8.1f} {r['ttft_p50']:>9.1f} {r['ttft_p95']:>8.1f} "
+          f"{r['ttft_p99']:>8.1f} {r['total_p50']:>10.1f} {r['total_p95']:>8.1f} {r['total_p99']:>8.1f} "
+          f"{iters:>6} {r['errors']:>7}")
+
+
+def settings_of(args) -> dict:
+    """What makes two runs comparable"""
+    return {"duration": args.duration, "workers": args.workers, "spawn": args.spawn, "body": args.body,
+            "ttft_ms": args.ttft_ms, "token_ms": args.token_ms, "error_rate": args.error_rate,
+            "cut_rate": args.cut_rate, "cpus": os.cpu_count()}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROXY_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def load_history(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def regressions(results: list, history: list, settings: dict, baseline: int, tolerance: float) -> list:
+    """Results worse than the median of the last `baseline` comparable runs"""
+    found = []
+    previous = [run for run in history if run.get("settings") == settings][-baseline:]
+    for r in results:
+        past = [p for run in previous for p in run["results"]
+                if p["target"] == r["target"] and p["concurrency"] == r["concurrency"]]
+        if not past:
+            continue
+        base_rps = statistics.median(p["rps"] for p in past)
+        base_p95 = statistics.median(p["total_p95"] for p in past)
+        if base_rps and r["rps"] < base_rps * (1 - tolerance):
+            found.append(f"{r['target']}@{r['concurrency']}: {r['rps']:.1f} req/s vs {base_rps:.1f} baseline")
+        if base_p95 and r["total_p95"] > base_p95 * (1 + tolerance):
+            found.append(f"{r['target']}@{r['concurrency']}: p95 {r['total_p95']:.0f} ms vs {base_p95:.0f} ms baseline")
+    return found
+
+
+def main():
+    csv = lambda s: [x for x in s.split(",") if x]
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--targets", type=csv, default=["proxy", "mcp", "memory"])
+    parser.add_argument("--concurrency", type=lambda s: [int(c) for c in csv(s)], default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per (target, concurrency)")
+    parser.add_argument("--spawn", action="store_true", help="start fake upstream, mcp-server and proxy locally")
+    parser.add_argument("--workers", type=int, default=1, help="proxy workers (with --spawn)")
+    parser.add_argument("--proxy-url", default=os.getenv("COPILOT_PROXY_URL", "http://localhost:8080"))
+    parser.add_argument("--mcp-url", default=os.getenv("MCP_SERVER_URL", "http://localhost:8081"))
+    parser.add_argument("--memory-url", default=os.getenv("MEMORY_SERVICE_URL", "http://localhost:8084"))
+    parser.add_argument("--body", type=json.loads, default={}, help="extra JSON fields for proxy requests")
+    parser.add_argument("--ttft-ms", type=float, default=50, help="fake upstream (with --spawn)")
+    parser.add_argument("--token-ms", type=float, default=5)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--cut-rate", type=float, default=0)
+    parser.add_argument("--history", default=DEFAULT_HISTORY)
+    parser.add_argument("--no-record", action="store_true", help="compare with history but don't append")
+    parser.add_argument("--baseline", type=int, default=5, help="previous runs in the baseline median")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    unknown = set(args.targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(sorted(unknown))}")
+
+    print(f"{os.cpu_count()} CPUs | {args.duration:g}s per level | targets {','.join(args.targets)}")
+    print(HEADER)
+    results = asyncio.run(run(args))
+    if not results:
+        sys.exit("Nothing measured")
+
+    settings = settings_of(args)
+    found = regressions(results, load_history(args.history), settings, args.baseline, args.tolerance)
+    if not args.no_record:
+        record = {"time": datetime.now(timezone.utc).isoformat(timespec="seconds"), "commit": git_commit(),
+                  "python": platform.python_version(), "settings": settings, "results": results}
+        with open(args.history, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    for line in found:
+        print(f"⚠️  Regression: {line}")
+    if found and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Micro-benchmark: upstream SSE parsing and outgoing SSE encoding.
+
+Compares the current path (bytes, orjson, content-only fast path, pre-encoded
+envelopes) with the previous one (aiter_lines + json.loads / json.dumps).
+
+    cd copilot-proxy && python -m benchmarks.sse_parsing [--chunks 5000] [--rounds 5]
+"""
+import json
+import time
+import codecs
+import random
+import argparse
+from src.agentic.copilot_stream import parse_chunk
+from src.streaming import sse, sse_content
+from src import fastjson
+
+
+def make_stream(n_chunks: int, tool_ratio: float = 0.2) -> list:
+    """A Copilot-like completion stream, cut into network-sized reads"""
+    rnd = random.Random(42)
+    words = ["le", "chat", "est", "sur", "la", "table", "café", "naïve", "\"quoted\"", "line\nbreak", "🙂"]
+    lines = []
+    for i in range(n_chunks):
+        if rnd.random() < tool_ratio:
+            delta = {"tool_calls": [{"index": 0, "function": {"arguments": " ".join(rnd.choices(words, k=3))}}]}
+        else:
+            delta = {"content": " " + " ".join(rnd.choices(words, k=2))}
+        chunk = {"id": "chatcmpl-x", "object": "chat.completion.chunk", "created": 1700000000, "model": "gpt-4.1",
+                 "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+        lines.append(f"data: {json.dumps(chunk, separators=(',', ':'), ensure_ascii=False)}\n\n")
+    lines.append("data: [DONE]\n\n")
+    raw = "".join(lines).encode()
+
+    reads, pos = [], 0
+    while pos < len(raw):
+        size = rnd.randint(512, 4096)
+        reads.append(raw[pos:pos + size])
+        pos += size
+    return reads
+
+
+class LegacyLines:
+    """
+    What httpx's aiter_lines() did per read: incremental UTF-8 decode, then
+    splitlines() with the partial last line and a trailing \\r carried over.
+    Vendored so the baseline doesn't depend on httpx internals.
+    """
+
+    NEWLINES = "\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+
+    def __init__(self):
+        self.text = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.buffer = []
+        self.trailing_cr = False
+
+    def feed(self, data: bytes) -> list:
+        text = self.text.decode(data)
+        if self.trailing_cr:
+            text, self.trailing_cr = "\r" + text, False
+        if text.endswith("\r"):
+            text, self.trailing_cr = text[:-1], True
+        if not text:
+            return []
+
+        trailing_newline = text[-1] in self.NEWLINES
+        lines = text.splitlines()
+        if len(lines) == 1 and not trailing_newline:
+            self.buffer.append(lines[0])
+            return []
+        if self.buffer:
+            lines = ["".join(self.buffer) + lines[0]] + lines[1:]
+            self.buffer = []
+        if not trailing_newline:
+            self.buffer = [lines.pop()]
+        return lines
+
+
+def legacy_parse(reads: list) -> list:
+    """Previous stream_copilot: aiter_lines() + json.loads + nested .get()"""
+    out = []
+    lines = LegacyLines()
+    for data in reads:
+        for line in lines.feed(data):
+            if not line.startswith("data: "):
+                continue
+            payload = line[6:].strip()
+            if payload == "[DONE]":
+                return out
+            try:
+                chunk = json.loads(payload)
+                delta = chunk.get("choices", [{}])[0].get("delta", {})
+                if "content" in delta and delta["content"]:
+                    out.append(("content_chunk", delta["content"]))
+                for tc in delta.get("tool_calls", []):
+                    out.append(("tool_chunk", {
+                        "index": tc.get("index"), "id": tc.get("id"),
+                        "name": tc.get("function", {}).get("name"),
+                        "arguments": tc.get("function", {}).get("arguments", ""),
+                    }))
+            except Exception:
+                pass
+    return out
+
+
+def current_parse(reads: list) -> list:
+    """stream_copilot's loop body, without the network"""
+    out, pending = [], b""
+    for data in reads:
+        lines = (pending + data).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if not line.startswith(b"data:"):
+                continue
+            payload = line[5:].strip()
+            if payload == b"[DONE]":
+                return out
+            out.extend(parse_chunk(payload))
+    return out
+
+
+def legacy_encode(chunks: list) -> list:
+    """Previous streaming.sse / sse_content: a dict and json.dumps per delta"""
+    out = []
+    for kind, data in chunks:
+        if kind == "content_chunk":
+            out.append(f"data: {json.dumps({'id': 'agentic', 'object': 'chat.completion.chunk', 'choices': [{'index': 0, 'delta': {'content': data}, 'finish_reason': None}]})}\n\n")
+        else:
+            out.append(f"data: {json.dumps({'type': 'thinking_delta', 'content': data['arguments']})}\n\n")
+    return out
+
+
+def current_encode(chunks: list) -> list:
+    return [sse_content(data) if kind == "content_chunk" else sse({"type": "thinking_delta", "content": data["arguments"]})
+            for kind, data in chunks]
+
+
+def bench(fn, arg, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    reads = make_stream(args.chunks)
+    chunks = legacy_parse(reads)
+    assert current_parse(reads) == chunks, "parsers disagree"
+    decoded = [json.loads(s[6:]) for s in legacy_encode(chunks)]
+    assert [json.loads(b[6:]) for b in current_encode(chunks)] == decoded, "encoders disagree"
+
+    print(f"{args.chunks} upstream chunks, {sum(map(len, reads)) / 1024:.0f} KiB, orjson={'yes' if fastjson.orjson else 'no'}")
+    print(f"{'':10} {'legacy µs/chunk':>16} {'current µs/chunk':>17} {'speedup':>8}")
+    for name, legacy, current, arg in (("parse", legacy_parse, current_parse, reads),
+                                       ("encode", legacy_encode, current_encode, chunks)):
+        old, new = bench(legacy, arg, args.rounds), bench(current, arg, args.rounds)
+        print(f"{name:10} {old / args.chunks * 1e6:16.2f} {new / args.chunks * 1e6:17.2f} {old / new:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
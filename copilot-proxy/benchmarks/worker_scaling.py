@@ -0,0 +1,113 @@
+"""
+Benchmark: throughput of the proxy with 1, 2, 4... uvicorn workers.
+
+The fake Copilot API (benchmarks.fake_copilot) runs in its own process so
+only the proxy's CPU work is measured. Each worker count gets a fresh proxy
+with SHARED_STATE on a temporary SQLite file.
+
+    cd copilot-proxy && python -m benchmarks.worker_scaling [--workers 1,2,4] [--concurrency 32] [--requests 400]
+
+Scaling is bounded by the cores available: on an N-core host expect gains
+up to about N workers (the fake upstream and the load generator need CPU too).
+The proxy's CPU time per request is reported too: it should stay flat as
+workers are added (shared state must not add per-request work), which can
+be checked even on a host with fewer cores than workers.
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import httpx
+from src.config import MODELS
+from .harness import free_port, launch, stop, wait_ready, proxy_env, percentile, cpu_seconds
+
+# Reply streamed by the fake upstream for each request
+FAKE_ENV = {"FAKE_REPLY_TOKENS": "60", "FAKE_TOKEN_MS": "2", "FAKE_TTFT_MS": "0"}
+
+
+async def drive(base: str, concurrency: int, total: int, proxy=None) -> dict:
+    """Streamed tool-free completions, spread over the models (each has its own slots)"""
+    latencies, errors = [], 0
+    pending = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base, timeout=60.0, limits=limits, trust_env=False) as client:
+        async def one(i: int):
+            nonlocal errors
+            body = {"model": MODELS[i % len(MODELS)]["id"], "stream": True, "use_tools": False,
+                    "messages": [{"role": "user", "content": f"request {i}"}]}  # Distinct: no coalescing
+            start = time.perf_counter()
+            async with client.stream("POST", "/v1/chat/completions", json=body) as resp:
+                async for _ in resp.aiter_bytes():
+                    pass
+            if resp.status_code != 200:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+        async def user():
+            for i in pending:
+                await one(i)
+
+        await asyncio.gather(*(one(-1 - n) for n in range(min(concurrency, 8))))  # Warm-up
+        latencies.clear()
+        cpu_start = cpu_seconds(proxy) if proxy else None
+        start = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        cpu = cpu_seconds(proxy) - cpu_start if cpu_start is not None else None
+
+    latencies.sort()
+    return {"rps": total / elapsed, "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000, "errors": errors,
+            "cpu_ms": cpu * 1000 / total if cpu is not None else None}
+
+
+async def run(args):
+    fake_port = free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    fake = launch("benchmarks.fake_copilot:app", fake_port, env=FAKE_ENV)
+    results = {}
+    try:
+        await wait_ready(fake_url, proc=fake)
+        for workers in args.workers:
+            port = free_port()
+            state = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+            # Tool-free requests: the MCP catalog is never needed
+            proxy = launch("src.app:app", port, workers, proxy_env(
+                fake_url, fake_url, WORKERS=workers, SHARED_STATE=f"sqlite:{state}"))
+            try:
+                await wait_ready(f"http://127.0.0.1:{port}/v1/models", proc=proxy)
+                results[workers] = await drive(f"http://127.0.0.1:{port}", args.concurrency, args.requests, proxy)
+            finally:
+                stop(proxy)
+                for suffix in ("", "-wal", "-shm"):
+                    if os.path.exists(state + suffix):
+                        os.unlink(state + suffix)
+    finally:
+        stop(fake)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=lambda s: [int(w) for w in s.split(",")], default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=400)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    base = results[args.workers[0]]["rps"] / args.workers[0]
+    print(f"{os.cpu_count()} CPUs | {args.concurrency} concurrent | {args.requests} requests | "
+          f"{FAKE_ENV['FAKE_REPLY_TOKENS']} chunks/response")
+    print(f"{'workers':>8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'scaling':>9} {'cpu ms/req':>11} {'errors':>7}")
+    for workers, r in results.items():
+        cpu = f"{r['cpu_ms']:.2f}" if r["cpu_ms"] is not None else "-"
+        print(f"{workers:>8} {r['rps']:>9.1f} {r['p50']:>9.1f} {r['p95']:>9.1f} "
+              f"{r['rps'] / (base * workers):>8.0%} {cpu:>11} {r['errors']:>7}")
+    if max(args.workers) > (os.cpu_count() or 1):
+        print(f"Note: more workers than CPUs ({os.cpu_count()}): throughput can't scale here, compare cpu ms/req")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,12 @@
 Copilot Proxy - Entry point
 """
 from src.app import app
+from src.config import WORKERS
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8080)
+    if WORKERS > 1:
+        # Workers need an import string; they share state through SHARED_STATE
+        uvicorn.run("src.app:app", host="0.0.0.0", port=8080, workers=WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8080)
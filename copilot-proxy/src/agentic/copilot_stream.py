@@ -1,8 +1,13 @@
-"""Parse SSE stream from Copilot API"""
-import json
-import httpx
+"""Parse SSE stream from Copilot API (bytes in, orjson, content-only fast path)"""
+from typing import Optional
 from src.config import COPILOT_API_URL
 from src.copilot import get_headers
+from src.fastjson import loads
+from src.upstream import get_client
+from src import scheduler
+
+DONE = b"[DONE]"
+CONTENT_KEY = b'"content":"'
 
 
 async def stream_copilot(token: str, messages: list, body: dict):
@@ -10,44 +15,84 @@ async def stream_copilot(token: str, messages: list, body: dict):
     Stream from Copilot API and yield parsed chunks.
     
     Yields: (chunk_type, data) tuples
+        - ("content_chunk", text)
         - ("tool_chunk", {index, id, name, arguments})
         - ("done", None)
         - ("error", status_code)
     """
     headers = get_headers(token, messages)
     
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        async with client.stream("POST", f"{COPILOT_API_URL}/chat/completions", headers=headers, json=body) as resp:
-            if resp.status_code != 200:
-                yield ("error", resp.status_code)
-                return
-            
-            async for line in resp.aiter_lines():
-                if not line.startswith("data: "):
+    client = get_client()
+    async with client.stream("POST", f"{COPILOT_API_URL}/chat/completions", headers=headers, json=body) as resp:
+        scheduler.observe(body.get("model"), resp.status_code, resp.headers.get("retry-after"))
+        if resp.status_code != 200:
+            yield ("error", resp.status_code)
+            return
+        
+        # Split lines on bytes: no str decode of the whole stream, no per-line decoder state
+        pending = b""
+        async for data in resp.aiter_bytes():
+            lines = (pending + data).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                if not line.startswith(b"data:"):
                     continue
-                
-                data = line[6:].strip()
-                if data == "[DONE]":
+                payload = line[5:].strip()
+                if payload == DONE:
                     yield ("done", None)
                     return
-                
-                try:
-                    chunk = json.loads(data)
-                    delta = chunk.get("choices", [{}])[0].get("delta", {})
-                    
-                    # Handle text content
-                    if "content" in delta and delta["content"]:
-                        yield ("content_chunk", delta["content"])
-
-                    # Handle tool calls
-                    for tc in delta.get("tool_calls", []):
-                        yield ("tool_chunk", {
-                            "index": tc.get("index"),
-                            "id": tc.get("id"),
-                            "name": tc.get("function", {}).get("name"),
-                            "arguments": tc.get("function", {}).get("arguments", "")
-                        })
-                except:
-                    pass
+                for chunk in parse_chunk(payload):
+                    yield chunk
     
     yield ("done", None)
+
+
+def parse_chunk(payload: bytes) -> list:
+    """Chunks carried by one completion.chunk payload"""
+    content = content_only(payload)
+    if content is not None:
+        return [("content_chunk", content)] if content else []
+    
+    try:
+        chunk = loads(payload)
+        delta = chunk.get("choices", [{}])[0].get("delta", {})
+    except Exception:
+        return []
+    
+    chunks = []
+    # Handle text content
+    if delta.get("content"):
+        chunks.append(("content_chunk", delta["content"]))
+    
+    # Handle tool calls
+    for tc in delta.get("tool_calls") or []:
+        function = tc.get("function") or {}
+        chunks.append(("tool_chunk", {
+            "index": tc.get("index"),
+            "id": tc.get("id"),
+            "name": function.get("name"),
+            "arguments": function.get("arguments", "")
+        }))
+    return chunks
+
+
+def content_only(payload: bytes) -> Optional[str]:
+    """
+    Text of a chunk that only carries a content delta, decoding just that string.
+
+    None when the chunk has tool calls, or the content string can't be sliced
+    out on its own (the caller then parses the whole chunk).
+    """
+    if b'"tool_calls"' in payload:
+        return None
+    start = payload.find(CONTENT_KEY)
+    if start < 0:
+        return None
+    start += len(CONTENT_KEY) - 1  # Opening quote
+    # Content is the last key of the delta; an escaped quote or another key after it
+    # makes the slice invalid JSON, which falls back to the full parse
+    end = payload.find(b'"}', start + 1)
+    try:
+        return loads(payload[start:end + 1]) if end > 0 else None
+    except ValueError:
+        return None
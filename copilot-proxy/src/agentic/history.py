@@ -0,0 +1,79 @@
+"""History shaping - keep consumed tool outputs from being re-sent in full every iteration"""
+import hashlib
+import logging
+from src.config import TOOL_OUTPUT_POLICIES
+
+logger = logging.getLogger(__name__)
+
+ELIDED_PREFIX = "[elided]"
+DUPLICATE_PREFIX = "[duplicate]"
+MIN_DEDUPE_CHARS = 64  # Shorter results cost less than the reference that would replace them
+
+
+def _policy(name: str) -> dict:
+    return {**TOOL_OUTPUT_POLICIES["default"], **TOOL_OUTPUT_POLICIES.get(name, {})}
+
+
+def cap(content: str, max_chars: int) -> str:
+    """Keep head and tail of an oversized tool output (marker included, so a capped output isn't cut again)"""
+    if len(content) <= max_chars:
+        return content
+    cut = len(content) - max_chars
+    while True:
+        marker = f"\n[… {cut} chars cut …]\n"
+        kept = max(0, max_chars - len(marker))
+        if len(content) - kept == cut:
+            break
+        cut = len(content) - kept
+    return f"{content[:kept - kept // 2]}{marker}{content[len(content) - kept // 2:]}"
+
+
+def shape_history(messages: list) -> list:
+    """
+    Shape tool results in place (per-tool policies from config):
+      - cap each result to max_chars
+      - replace results identical to an earlier one with a reference
+      - collapse results the model has already seen in full keep_iterations times
+
+    A result's age is the number of assistant tool_calls messages after it.
+    """
+    names = {}
+    for m in messages:
+        for tc in m.get("tool_calls") or []:
+            names[tc["id"]] = tc["function"]["name"]
+
+    before = sum(len(m.get("content") or "") for m in messages if m.get("role") == "tool")
+    seen = {}
+    age = 0
+    for m in reversed(messages):
+        if m.get("role") == "assistant" and m.get("tool_calls"):
+            age += 1
+            continue
+        if m.get("role") != "tool":
+            continue
+        content = m.get("content") or ""
+        if content.startswith((ELIDED_PREFIX, DUPLICATE_PREFIX)):
+            continue
+
+        name = names.get(m.get("tool_call_id"), "?")
+        policy = _policy(name)
+        if age >= policy["keep_iterations"] and len(content) > policy["preview_chars"]:
+            m["content"] = f"{ELIDED_PREFIX} {name} output already used ({len(content)} chars): {content[:policy['preview_chars']]}"
+        else:
+            m["content"] = cap(content, policy["max_chars"])
+
+    # Dedupe oldest-first so the first occurrence stays verbatim
+    for m in messages:
+        content = m.get("content") or ""
+        if m.get("role") != "tool" or len(content) <= MIN_DEDUPE_CHARS or content.startswith((ELIDED_PREFIX, DUPLICATE_PREFIX)):
+            continue
+        digest = hashlib.sha256(content.encode()).hexdigest()
+        if digest in seen:
+            m["content"] = f"{DUPLICATE_PREFIX} Same result as tool call {seen[digest]}"
+        else:
+            seen[digest] = m.get("tool_call_id")
+
+    after = sum(len(m.get("content") or "") for m in messages if m.get("role") == "tool")
+    if after < before:
+        logger.info(f"✂️ Tool outputs shaped: {before} → {after} chars")
+    return messages
@@ -0,0 +1,75 @@
+"""In-process execution of pure tools (think, send_message, task_complete)"""
+import json
+import time
+import logging
+from typing import Optional
+from src.mcp_client import execute_tool_calls
+from src import timing
+
+logger = logging.getLogger(__name__)
+
+
+def is_local(name: str, tool_handlers: dict) -> bool:
+    """Pure tools carry result/event templates in their handler info"""
+    handler = tool_handlers.get(name, {})
+    return bool(handler.get("is_pure") and "pure" in handler)
+
+
+def _fill(template, args: dict):
+    """Build a value from a pure tool's spec: {"$arg": name} is replaced by that argument"""
+    if isinstance(template, dict):
+        if set(template) == {"$arg"}:
+            if template["$arg"] not in args:
+                raise ValueError(f"missing argument: {template['$arg']}")
+            return args[template["$arg"]]
+        return {k: _fill(v, args) for k, v in template.items()}
+    if isinstance(template, list):
+        return [_fill(v, args) for v in template]
+    return template
+
+
+def _parse_args(tc: dict) -> dict:
+    try:
+        return json.loads(tc["function"].get("arguments") or "{}")
+    except ValueError:
+        return {}
+
+
+def run_local(tc: dict, tool_handlers: dict) -> dict:
+    """Execute a pure tool call, returning a tool result message"""
+    start = time.perf_counter()
+    spec = tool_handlers[tc["function"]["name"]]["pure"]
+    try:
+        result = _fill(spec["result"], _parse_args(tc))
+    except ValueError as e:
+        logger.warning(f"⚠️ {tc['function']['name']}: {e}")
+        result = {"error": str(e)}
+    timing.tool(tc["function"]["name"], time.perf_counter() - start)
+    return {"tool_call_id": tc["id"], "role": "tool", "content": json.dumps(result)}
+
+
+def local_event(name: str, args: dict, tool_handlers: dict) -> Optional[dict]:
+    """to_event() of a pure tool, without the MCP round trip"""
+    try:
+        return _fill(tool_handlers[name]["pure"]["event"], args)
+    except ValueError as e:
+        logger.warning(f"⚠️ {name} event: {e}")
+        return None
+
+
+async def execute_tools(tool_calls: list, tool_handlers: dict) -> list:
+    """Run pure tools locally and the rest via MCP server, results in tool_calls order"""
+    remote = [tc for tc in tool_calls if not is_local(tc["function"]["name"], tool_handlers)]
+    remote_results = {}
+    if remote:
+        start = time.perf_counter()
+        remote_results = {r["tool_call_id"]: r for r in await execute_tool_calls(remote)}
+        # One batch request: each of its tools is charged the batch time
+        for tc in remote:
+            timing.tool(tc["function"]["name"], time.perf_counter() - start)
+
+    return [
+        run_local(tc, tool_handlers) if is_local(tc["function"]["name"], tool_handlers)
+        else remote_results.get(tc["id"], {"tool_call_id": tc["id"], "role": "tool", "content": "{}"})
+        for tc in tool_calls
+    ]
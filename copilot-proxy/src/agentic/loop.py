@@ -1,88 +1,171 @@
 """Main agentic loop - orchestrates tool calling iterations"""
 import logging
-from src.config import MAX_AGENTIC_ITERATIONS, AUTO_SUMMARIZE_THRESHOLD
+from src.config import MAX_AGENTIC_ITERATIONS, SPECULATIVE_TOOLS, FAST_PATH_PASSIVE_TOOLS
+from src.context import fit_to_budget
 from src.prompts import build_system_prompt
-from .copilot_stream import stream_copilot
-from .realtime import extract_delta, get_event_type
+from src import timing
+from .resilient_stream import stream_resilient
+from .realtime import FieldStream, stream_spec, stream_fields
 from .tool_processor import process_tools
+from .speculative import SpeculativeExecutor, ready_tool_calls
+from .history import shape_history
+from .tool_selection import select_tools, widen
+from .routing import should_cascade, pick_model, split_draft, escalate_next, held_back, tag
 
 logger = logging.getLogger(__name__)
 
 
 async def run_agentic_loop(messages: list, copilot_token: str, mcp_tools: list, 
                            tool_handlers: dict, use_tools: bool = True, model: str = "gpt-4.1",
-                           user_context: dict = None):
+                           user_context: dict = None, conversation_id: str = None, cascade: bool = False,
+                           fast_path: bool = False):
     """Run the agentic loop - yields events as they occur."""
     
-    current_messages = _prepare_messages(messages, mcp_tools, use_tools, user_context)
-    yield {"type": "model_info", "model": model}
+    trace = timing.current() or timing.begin()
+    current_messages = _prepare_messages(messages, mcp_tools, use_tools, user_context, fast_path)
+    yield {"type": "model_info", "model": model}  # First bytes out before any summarization
+    with timing.phase("context"):
+        current_messages = await fit_to_budget(current_messages, model, copilot_token, conversation_id)
+    offered_tools = select_tools(mcp_tools, current_messages) if mcp_tools and use_tools else []
+    cascade = should_cascade(model, cascade and bool(offered_tools))
+    escalate = False
+    last_model = model
+    streamed_fields = stream_fields(tool_handlers)
     
-    for iteration in range(1, MAX_AGENTIC_ITERATIONS + 1):
-        logger.info(f"🔄 Iteration {iteration}/{MAX_AGENTIC_ITERATIONS}")
+    executor = None
+    iteration = 0
+    try:
+        while iteration < MAX_AGENTIC_ITERATIONS:
+            iteration += 1
+            run_model = pick_model(model, cascade, escalate)
+            # Draft turn: the cheap model dispatches tools, its reasoning and replies are held back
+            draft = run_model != model
+            logger.info(f"🔄 Iteration {iteration}/{MAX_AGENTIC_ITERATIONS} ({run_model})")
+            if run_model != last_model:
+                yield {"type": "model_info", "model": run_model, "iteration": iteration}
+                last_model = run_model
+            trace.start_iteration(iteration, run_model)
         
-        # Build request
-        body = {"model": model, "messages": current_messages, "stream": True}
-        if mcp_tools and use_tools:
-            body["tools"] = mcp_tools
-            body["tool_choice"] = "required"
+            # Build request
+            body = {"model": run_model, "messages": current_messages, "stream": True}
+            if mcp_tools and use_tools:
+                body["tools"] = offered_tools
+                body["tool_choice"] = "required"
+                if fast_path:
+                    body["parallel_tool_calls"] = True
         
-        # Stream and collect tool calls
-        tool_buffer = {}
-        content_buffer = []
+            # Stream and collect tool calls
+            tool_buffer = {}
+            content_buffer = []
+            executor = SpeculativeExecutor(tool_handlers) if SPECULATIVE_TOOLS and use_tools else None
         
-        async for chunk_type, data in stream_copilot(copilot_token, current_messages, body):
-            if chunk_type == "error":
-                logger.error(f"❌ Copilot error: {data}")
-                return
-            if chunk_type == "done":
-                break
-            if chunk_type == "content_chunk":
-                content_buffer.append(data)
-                yield {"type": "message_delta", "content": data}
-            if chunk_type == "tool_chunk":
-                event = _process_chunk(tool_buffer, data)
-                if event:
-                    yield event
+            async for chunk_type, data in stream_resilient(copilot_token, current_messages, body, streamed_fields):
+                if chunk_type == "failover":
+                    run_model = last_model = data
+                    trace.set_model(data)
+                    yield {"type": "model_info", "model": data, "iteration": iteration, "failover": True}
+                    continue
+                if chunk_type == "tool_reset":
+                    # Cut-off call that the resumed stream will redo
+                    tool_buffer.pop(data, None)
+                    continue
+                if chunk_type == "error":
+                    logger.error(f"❌ Copilot error: {data}")
+                    if executor:
+                        executor.cancel()
+                    yield {"type": "error", "status": data}
+                    yield trace.finish()
+                    return
+                if chunk_type == "done":
+                    break
+                trace.first_token()
+                if chunk_type == "content_chunk":
+                    content_buffer.append(data)
+                    if not draft:
+                        yield {"type": "message_delta", "content": data}
+                if chunk_type == "tool_chunk":
+                    event = _process_chunk(tool_buffer, data, tool_handlers)
+                    if event and not (draft and held_back(event)):
+                        yield event
+                    # Start tools whose arguments are complete while the stream continues
+                    if executor:
+                        executor.submit(ready_tool_calls(tool_buffer))
+            trace.stream_done()
         
-        # If we got content but no tools, we are done (unless we want to continue conversation?)
-        # For now, if we have content, we yield a full message event and break if no tools
-        if content_buffer:
-            full_content = "".join(content_buffer)
-            yield {"type": "message", "content": full_content, "role": "assistant"}
+            # If we got content but no tools, we are done (unless we want to continue conversation?)
+            # For now, if we have content, we yield a full message event and break if no tools
+            if content_buffer and not draft:
+                full_content = "".join(content_buffer)
+                yield tag({"type": "message", "content": full_content, "role": "assistant"}, run_model)
             
-            # If we have content and NO tools, we should probably stop the loop
-            # unless the model output both content AND tool calls (which is possible)
+                # If we have content and NO tools, we should probably stop the loop
+                # unless the model output both content AND tool calls (which is possible)
         
-        # Reconstruct tool calls
-        tool_calls = _build_tool_calls(tool_buffer)
-        if not tool_calls:
-            logger.info("No tool calls, exiting")
-            break
+            # Reconstruct tool calls
+            tool_calls = _build_tool_calls(tool_buffer)
+            if draft:
+                tool_calls, answered = split_draft(tool_calls, tool_handlers)
+                # Once the chosen model takes over, it keeps the run
+                escalate = answered or bool(content_buffer) or escalate_next(tool_calls)
+                if not tool_calls:
+                    iteration -= 1  # Nothing kept: the chosen model redoes this iteration
+                    continue
+            if not tool_calls:
+                logger.info("No tool calls, exiting")
+                break
+            offered_tools = widen(offered_tools, mcp_tools, tool_calls)
         
-        # Process tools and collect results
-        task_done = False
-        tool_results = []
-        async for event in process_tools(tool_calls, tool_handlers, copilot_token):
-            if event.get("type") == "_results":
-                tool_results = event["results"]
-                task_done = event.get("task_done", False)
-            elif event.get("type") == "terminal":
-                pass  # Already handled in _results
-            else:
-                yield event
+            # Process tools and collect results
+            task_done = False
+            summarize = False
+            tool_results = []
+            async for event in process_tools(tool_calls, tool_handlers, executor):
+                if event.get("type") == "_results":
+                    tool_results = event["results"]
+                    task_done = event.get("task_done", False)
+                    summarize = event.get("summarize", False)
+                elif event.get("type") == "terminal":
+                    pass  # Already handled in _results
+                elif draft and held_back(event):
+                    continue
+                else:
+                    yield tag(event, run_model)
         
-        if task_done:
-            logger.info("🎉 Task complete")
-            break
+            if fast_path and len(tool_calls) > 1:
+                trace.save_iterations("parallel", len(tool_calls) - 1)
+            if task_done:
+                logger.info("🎉 Task complete")
+                break
+            if fast_path and not draft and _answered(tool_calls):
+                logger.info("⚡ Answer sent, completing without another round trip")
+                trace.save_iterations("early_stop", 1)
+                break
         
-        # Update messages for next iteration - add assistant message with tool_calls and tool results
-        current_messages.append({"role": "assistant", "tool_calls": tool_calls})
-        current_messages.extend(tool_results)
-    
+            # Update messages for next iteration - add assistant message with tool_calls and tool results
+            current_messages.append({"role": "assistant", "tool_calls": tool_calls})
+            current_messages.extend(tool_results)
+            shape_history(current_messages)
+        
+            # summarize_conversation() was called, or tool results pushed us over budget
+            with timing.phase("context"):
+                current_messages = await fit_to_budget(current_messages, model, copilot_token, conversation_id, force=summarize)
+    finally:
+        # Run cancelled (client gone, DELETE /v1/runs/{id}): stop tool calls started speculatively
+        if executor:
+            executor.cancel()
+
     logger.info(f"✨ Agentic loop complete")
+    yield trace.finish()
+
+
+def _answered(tool_calls: list) -> bool:
+    """Fast path: the turn sent a message and nothing whose result the model still has to read"""
+    names = [tc["function"]["name"] for tc in tool_calls]
+    return "send_message" in names and all(name in FAST_PATH_PASSIVE_TOOLS for name in names)
 
 
-def _prepare_messages(messages: list, mcp_tools: list, use_tools: bool, user_context: dict = None) -> list:
+def _prepare_messages(messages: list, mcp_tools: list, use_tools: bool, user_context: dict = None,
+                      fast_path: bool = False) -> list:
     """Prepare messages with system prompt"""
     msgs = messages.copy()
     
@@ -90,7 +173,7 @@ def _prepare_messages(messages: list, mcp_tools: list, use_tools: bool, user_con
         tool_names = [t["function"]["name"] for t in mcp_tools]
         
         if not any(m.get("role") == "system" for m in msgs):
-            msgs = [build_system_prompt(tool_names, user_context)] + msgs
+            msgs = [build_system_prompt(tool_names, user_context, fast_path)] + msgs
         elif user_context:
             # Inject user_context into existing system prompt
             for m in msgs:
@@ -98,38 +181,38 @@ def _prepare_messages(messages: list, mcp_tools: list, use_tools: bool, user_con
                     ctx_str = "\n".join(f"- {k}: {v}" for k, v in user_context.items())
                     m["content"] += f"\n\n## User Context (auto-injected, use these values for tools)\n{ctx_str}"
                     break
-        
-        if len(msgs) > AUTO_SUMMARIZE_THRESHOLD:
-            logger.warning(f"⚠️ Auto-summarize: {len(msgs)} messages")
-            msgs.append({"role": "system", "content": "SYSTEM: Call summarize_conversation() NOW."})
-    
+
     return msgs
 
 
-def _process_chunk(buffer: dict, data: dict):
+def _process_chunk(buffer: dict, data: dict, tool_handlers: dict):
     """Process a tool call chunk, return event if any"""
     idx = data["index"]
     
     if idx not in buffer:
-        buffer[idx] = {"id": "", "name": "", "arguments": "", "yielded_len": 0}
+        buffer[idx] = {"id": "", "name": "", "arguments": "", "decoder": None}
+    entry = buffer[idx]
     
     if data["id"]:
-        buffer[idx]["id"] = data["id"]
+        entry["id"] = data["id"]
     if data["name"]:
-        buffer[idx]["name"] = data["name"]
+        entry["name"] = data["name"]
     if data["arguments"]:
-        buffer[idx]["arguments"] += data["arguments"]
+        entry["arguments"] += data["arguments"]
         
-        # Check for real-time streaming
-        name = buffer[idx]["name"]
-        args = buffer[idx]["arguments"]
-        content, new_len = extract_delta(name, args, buffer[idx]["yielded_len"])
+        # Real-time streaming of the tool's declared string field (decoded incrementally)
+        spec = stream_spec(entry["name"], tool_handlers)
+        if not spec:
+            return None
+        if entry["decoder"] is None:
+            entry["decoder"] = FieldStream(spec["field"])
+            content = entry["decoder"].feed(entry["arguments"])
+        else:
+            content = entry["decoder"].feed(data["arguments"])
         
         if content:
-            buffer[idx]["yielded_len"] = new_len
-            buffer[idx]["streamed"] = True
-            event_type = get_event_type(name)
-            return {"type": event_type, "content": content}
+            entry["streamed"] = True
+            return {"type": spec["event"], "content": content}
     
     return None
 
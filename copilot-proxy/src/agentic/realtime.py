@@ -1,41 +1,182 @@
-"""Real-time streaming for think() and send_message()"""
-from typing import Optional, Tuple
+"""Real-time streaming of tool string arguments (think, send_message, ...)"""
+import re
+from typing import Optional
 
-# Tools that support real-time streaming with their JSON prefix
-STREAMABLE_TOOLS = {
-    "think": ('{"thought": "', "thinking_delta"),
-    "send_message": ('{"message": "', "message_delta"),
-}
+WHITESPACE = " \t\r\n"
+SPECIAL = re.compile(r'["\\]')
+ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
 
 
-def extract_delta(tool_name: str, args: str, yielded_len: int) -> Tuple[str, int]:
+def stream_spec(tool_name: str, tool_handlers: dict) -> Optional[dict]:
+    """{"field", "event"} declared by the tool (MCP handler info), or None"""
+    return (tool_handlers.get(tool_name) or {}).get("stream")
+
+
+def stream_fields(tool_handlers: dict) -> dict:
+    """Tool name -> streamed field, for every tool that declares one"""
+    return {name: info["stream"]["field"] for name, info in tool_handlers.items() if info.get("stream")}
+
+
+class FieldStream:
     """
-    Extract new content from streaming tool arguments.
-    
-    Returns: (new_content, new_yielded_len)
+    Incremental JSON tokenizer that decodes one top-level string field of a
+    tool call's arguments as they stream in.
+
+    feed() takes only the new chunk and returns the newly decoded text, so the
+    work per chunk is proportional to the chunk. Keys may come in any order,
+    other values (nested objects, arrays, numbers...) are skipped, and JSON
+    escapes (including \\uXXXX surrogate pairs) are decoded.
     """
-    if tool_name not in STREAMABLE_TOOLS:
-        return "", yielded_len
-    
-    prefix, _ = STREAMABLE_TOOLS[tool_name]
-    
-    if not args.startswith(prefix):
-        return "", yielded_len
-    
-    start = max(len(prefix), yielded_len)
-    new_content = args[start:]
-    
-    # Remove trailing incomplete JSON
-    for suffix in ['"}', '"']:
-        if new_content.endswith(suffix):
-            new_content = new_content[:-len(suffix)]
-            break
-    
-    return new_content, len(args) if new_content else yielded_len
-
-
-def get_event_type(tool_name: str) -> Optional[str]:
-    """Get the event type for a streamable tool"""
-    if tool_name in STREAMABLE_TOOLS:
-        return STREAMABLE_TOOLS[tool_name][1]
-    return None
+
+    def __init__(self, field: str):
+        self.field = field
+        self.text = ""  # Everything decoded so far
+        self.value_start = None  # Raw offset where the field's string content starts
+        self.done = False  # Field value closed (or object ended without it)
+        self._pos = 0  # Raw characters consumed
+        self._state = "start"
+        self._key = []
+        self._depth = 0  # Nesting while skipping a non-string value
+        self._in_str = False  # Inside a string while skipping a value
+        self._skip_escape = False
+        self._escape = None  # Pending escape: "" after "\", or "u" + hex digits
+        self._high = None  # High surrogate waiting for its pair
+
+    @property
+    def in_value(self) -> bool:
+        """Inside the field's string, at a character boundary (safe to splice more content)"""
+        return self._state == "value" and self._escape is None and self._high is None
+
+    def feed(self, chunk: str) -> str:
+        out = []
+        i, n = 0, len(chunk)
+        while i < n and not self.done:
+            state = self._state
+            if state == "value":
+                i = self._read_value(chunk, i, out)
+                continue
+
+            c = chunk[i]
+            i += 1
+            if state == "start":
+                if c == "{":
+                    self._state = "key_or_end"
+                elif c not in WHITESPACE:
+                    self.done = True
+            elif state == "key_or_end":
+                if c == '"':
+                    self._state, self._key = "key", []
+                elif c == "}":
+                    self.done = True
+            elif state == "key":
+                if self._skip_escape:
+                    self._key.append(c)
+                    self._skip_escape = False
+                elif c == "\\":
+                    self._skip_escape = True
+                elif c == '"':
+                    self._state = "colon"
+                else:
+                    self._key.append(c)
+            elif state == "colon":
+                if c == ":":
+                    self._state = "before_value"
+            elif state == "before_value":
+                if c in WHITESPACE:
+                    continue
+                if c == '"' and "".join(self._key) == self.field:
+                    self._state = "value"
+                    self.value_start = self._pos + i
+                else:
+                    self._state, self._depth = "skip", 0
+                    self._in_str = c == '"'
+                    self._depth += c in "{["
+            elif state == "skip":
+                self._skip(c)
+
+        self._pos += n
+        delta = "".join(out)
+        self.text += delta
+        return delta
+
+    def _skip(self, c: str):
+        """Consume one character of a value that isn't the streamed field"""
+        if self._in_str:
+            if self._skip_escape:
+                self._skip_escape = False
+            elif c == "\\":
+                self._skip_escape = True
+            elif c == '"':
+                self._in_str = False
+        elif c == '"':
+            self._in_str = True
+        elif c in "{[":
+            self._depth += 1
+        elif c in "}]":
+            if self._depth == 0:
+                self.done = True  # End of the arguments object
+            else:
+                self._depth -= 1
+        elif c == "," and self._depth == 0:
+            self._state = "key_or_end"
+
+    def _read_value(self, chunk: str, i: int, out: list) -> int:
+        """Decode the field's string content from chunk[i:]; returns the new index"""
+        n = len(chunk)
+        while i < n:
+            if self._escape is not None:
+                i = self._read_escape(chunk, i, out)
+                continue
+            # Copy the plain run up to the next quote or backslash in one slice
+            match = SPECIAL.search(chunk, i)
+            end = match.start() if match else n
+            if end > i:
+                self._flush_high(out)
+                out.append(chunk[i:end])
+            if end == n:
+                return n
+            if chunk[end] == '"':
+                self._flush_high(out)
+                self.done = True
+                return end + 1
+            self._escape = ""
+            i = end + 1
+        return i
+
+    def _read_escape(self, chunk: str, i: int, out: list) -> int:
+        c = chunk[i]
+        if self._escape == "":
+            if c == "u":
+                self._escape = "u"
+            else:
+                self._flush_high(out)
+                out.append(ESCAPES.get(c, c))
+                self._escape = None
+            return i + 1
+
+        self._escape += c
+        if len(self._escape) < 5:
+            return i + 1
+        try:
+            code = int(self._escape[1:], 16)
+        except ValueError:
+            code = 0xFFFD
+        self._escape = None
+        if 0xD800 <= code < 0xDC00:
+            self._flush_high(out)
+            self._high = code
+        elif 0xDC00 <= code < 0xE000:
+            # Low surrogate: completes a pair, or is invalid on its own
+            pair = self._high is not None
+            out.append(chr(0x10000 + ((self._high - 0xD800) << 10) + (code - 0xDC00)) if pair else "\ufffd")
+            self._high = None
+        else:
+            self._flush_high(out)
+            out.append(chr(code))
+        return i + 1
+
+    def _flush_high(self, out: list):
+        """A high surrogate not followed by its pair"""
+        if self._high is not None:
+            out.append("\ufffd")
+            self._high = None
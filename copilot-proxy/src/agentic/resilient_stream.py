@@ -0,0 +1,286 @@
+"""Resilient upstream streaming - retries, hedging, stall watchdog, model failover and resume"""
+import json
+import random
+import asyncio
+import logging
+from src.config import (
+    MODELS, FALLBACK_MODELS, UPSTREAM_RETRIES, UPSTREAM_BACKOFF, UPSTREAM_TTFT_DEADLINE,
+    UPSTREAM_HEDGE, UPSTREAM_IDLE_TIMEOUT,
+)
+from .copilot_stream import stream_copilot
+from .realtime import FieldStream
+
+logger = logging.getLogger(__name__)
+
+# 4xx statuses worth retrying; every other 4xx is final
+RETRYABLE_4XX = (408, 409, 429)
+
+
+async def stream_resilient(token: str, messages: list, body: dict, stream_fields: dict = None):
+    """
+    stream_copilot() with recovery. Same chunks, plus:
+        - ("failover", model)   the stream continues on a fallback model
+        - ("tool_reset", index) drop a cut-off tool call from the buffer
+
+    Failures before the first chunk are retried with backoff and jitter. After
+    the first chunk, a failure (error, stall) resumes: the next request is told
+    what was already produced and its output is spliced onto the same indices,
+    so the client sees one continuous response. stream_fields maps tool name
+    -> streamed string field (think: thought, ...): those calls are continued
+    in place when cut off, others are redone.
+    """
+    progress = _Progress(stream_fields or {})
+    last_error = None
+
+    for model in _model_chain(body.get("model")):
+        if model != body.get("model"):
+            logger.warning(f"🔀 Failing over to {model}")
+            yield ("failover", model)
+
+        for attempt in range(UPSTREAM_RETRIES + 1):
+            req_messages = progress.resume_messages(messages)
+            req_body = {**body, "model": model, "messages": req_messages}
+            failure = None
+
+            async for kind, data in _guarded(token, req_messages, req_body):
+                if kind == "failure":
+                    failure = data
+                    break
+                for chunk in progress.translate(kind, data):
+                    yield chunk
+                if kind == "done":
+                    return
+
+            last_error = failure
+            if not _retryable(failure):
+                yield ("error", failure)
+                return
+            for chunk in progress.on_failure():
+                yield chunk
+
+            if attempt < UPSTREAM_RETRIES:
+                delay = min(UPSTREAM_BACKOFF * 2 ** attempt, 8.0) * random.uniform(0.5, 1.5)
+                logger.warning(f"🔁 Upstream {failure} on {model}, retry {attempt + 1}/{UPSTREAM_RETRIES} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    yield ("error", last_error)
+
+
+def _model_chain(model: str) -> list:
+    """Requested model, then its configured fallback (if it is a known model)"""
+    chain = [model]
+    fallback = FALLBACK_MODELS.get(model)
+    if fallback and fallback != model and any(m["id"] == fallback for m in MODELS):
+        chain.append(fallback)
+    return chain
+
+
+def _retryable(failure) -> bool:
+    """Timeouts/connection errors (str) and 408/409/429/5xx statuses"""
+    if isinstance(failure, int):
+        return failure in RETRYABLE_4XX or failure >= 500
+    return True
+
+
+class _Pump:
+    """Drains one upstream stream into a queue so reads can time out"""
+
+    def __init__(self, gen):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run(gen))
+
+    async def _run(self, gen):
+        try:
+            async for item in gen:
+                await self.queue.put(item)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self.queue.put(("error", f"{type(e).__name__}: {e}"))
+
+    def cancel(self):
+        self.task.cancel()
+
+
+async def _guarded(token: str, messages: list, body: dict):
+    """One attempt: TTFT deadline (+ optional hedge), then an idle-chunk watchdog"""
+    pumps = [_Pump(stream_copilot(token, messages, body))]
+    try:
+        item, pump = await _first_item(pumps, token, messages, body)
+        if item is None:
+            yield ("failure", "ttft_timeout")
+            return
+        for other in pumps:
+            if other is not pump:
+                other.cancel()
+
+        while True:
+            kind, data = item
+            if kind == "error":
+                yield ("failure", data)
+                return
+            yield item
+            if kind == "done":
+                return
+            try:
+                item = await asyncio.wait_for(pump.queue.get(), UPSTREAM_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                yield ("failure", "stalled")
+                return
+    finally:
+        for p in pumps:
+            p.cancel()
+
+
+async def _first_item(pumps: list, token: str, messages: list, body: dict):
+    """First chunk within the TTFT deadline; with hedging, race a second request after it"""
+    gets = {asyncio.create_task(pumps[0].queue.get()): pumps[0]}
+    try:
+        done, _ = await asyncio.wait(gets, timeout=UPSTREAM_TTFT_DEADLINE)
+        if not done and UPSTREAM_HEDGE:
+            logger.warning(f"🏇 No first token after {UPSTREAM_TTFT_DEADLINE}s, hedging {body.get('model')}")
+            pumps.append(_Pump(stream_copilot(token, messages, body)))
+            gets[asyncio.create_task(pumps[1].queue.get())] = pumps[1]
+            done, _ = await asyncio.wait(gets, timeout=UPSTREAM_TTFT_DEADLINE, return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            return None, None
+        winner = done.pop()
+        return winner.result(), gets[winner]
+    finally:
+        # Also on cancellation (client gone): no queue.get() left pending
+        for task in gets:
+            task.cancel()
+
+
+class _Progress:
+    """What the client has already received, and how to splice a resumed stream onto it"""
+
+    def __init__(self, stream_fields: dict):
+        self.fields = stream_fields
+        self.content = ""
+        self.calls = {}  # output index -> {"id", "name", "args"}
+        self.base = 0  # output index of the resumed stream's tool index 0
+        self.cont = None  # output index of a cut-off streamable call being continued
+        self.cont_state = None  # "await" (prefix not seen yet) | "active" | "abandoned"
+        self.pending = {"id": None, "name": None, "args": ""}
+
+    @property
+    def started(self) -> bool:
+        return bool(self.content or self.calls)
+
+    def translate(self, kind: str, data) -> list:
+        if kind == "content_chunk":
+            self.content += data
+            return [(kind, data)]
+        if kind == "tool_chunk":
+            if self.cont is not None and data["index"] == 0 and self.cont_state != "abandoned":
+                return self._continue(data)
+            return [self._record(self.base + data["index"], data)]
+        if kind == "done" and self.cont_state == "await":
+            return self._abandon() + [(kind, data)]
+        return [(kind, data)]
+
+    def _record(self, out: int, data: dict):
+        call = self.calls.setdefault(out, {"id": "", "name": "", "args": ""})
+        call["id"] = data["id"] or call["id"]
+        call["name"] = data["name"] or call["name"]
+        call["args"] += data["arguments"] or ""
+        return ("tool_chunk", {**data, "index": out})
+
+    def _continue(self, data: dict) -> list:
+        """Splice the resumed call's string value onto the cut-off call"""
+        if self.cont_state == "active":
+            return [self._record(self.cont, {**data, "id": None, "name": None})]
+
+        self.pending["id"] = data["id"] or self.pending["id"]
+        self.pending["name"] = data["name"] or self.pending["name"]
+        self.pending["args"] += data["arguments"] or ""
+        target = self.calls[self.cont]["name"]
+        if self.pending["name"] and self.pending["name"] != target:
+            return self._abandon()
+
+        # Wait until the resumed call opens the same string field
+        start = _value_start(self.fields[target], self.pending["args"])
+        if start is None:
+            return []
+        self.cont_state = "active"
+        rest = self.pending["args"][start:]
+        return [self._record(self.cont, {"index": 0, "id": None, "name": None, "arguments": rest})] if rest else []
+
+    def _abandon(self) -> list:
+        """The model did not continue the cut-off call: drop it, emit what it sent instead"""
+        chunks = [("tool_reset", self.cont)]
+        del self.calls[self.cont]
+        self.base, self.cont, self.cont_state = self.cont, None, "abandoned"
+        if self.pending["name"]:
+            chunks.append(self._record(self.base, {"index": 0, "id": self.pending["id"], "name": self.pending["name"],
+                                                   "arguments": self.pending["args"]}))
+        return chunks
+
+    def on_failure(self) -> list:
+        """Prepare the next attempt; returns chunks to undo a cut-off, non-resumable call"""
+        self.pending = {"id": None, "name": None, "args": ""}
+        self.cont, self.cont_state = None, None
+        if not self.calls:
+            self.base = 0
+            return []
+
+        last = max(self.calls)
+        call = self.calls[last]
+        if _complete(call["args"]):
+            self.base = last + 1
+            return []
+        if _resumable(call, self.fields):
+            self.base, self.cont, self.cont_state = last, last, "await"
+            return []
+        del self.calls[last]
+        self.base = last
+        return [("tool_reset", last)]
+
+    def resume_messages(self, messages: list) -> list:
+        """Original messages, plus a note describing what the interrupted response already produced"""
+        if not self.started:
+            return messages
+
+        notes = ["Your previous response was interrupted by a network error. Do not repeat anything already produced."]
+        done_calls = [f"{c['name']}({c['args'][:200]})" for i, c in sorted(self.calls.items()) if i != self.cont]
+        if done_calls:
+            notes.append(f"Tool calls already made (do NOT call them again): {'; '.join(done_calls)}.")
+        if self.cont is not None:
+            call = self.calls[self.cont]
+            partial = _decoded(call, self.fields)
+            notes.append(f"Your {call['name']}() call was cut off after: «{partial[-500:]}». "
+                         f"Call {call['name']}() again with ONLY the remaining text, continuing exactly where it stopped.")
+        elif self.content:
+            notes.append(f"Your reply was cut off after: «{self.content[-500:]}». Continue exactly from there.")
+        return messages + [{"role": "system", "content": " ".join(notes)}]
+
+
+def _complete(args: str) -> bool:
+    try:
+        json.loads(args or "{}")
+        return True
+    except ValueError:
+        return False
+
+
+def _resumable(call: dict, stream_fields: dict) -> bool:
+    """A cut-off call whose streamed field was being written (the text was shown live)"""
+    field = stream_fields.get(call["name"])
+    if not field:
+        return False
+    stream = FieldStream(field)
+    stream.feed(call["args"])
+    return stream.in_value
+
+
+def _decoded(call: dict, stream_fields: dict) -> str:
+    stream = FieldStream(stream_fields[call["name"]])
+    return stream.feed(call["args"])
+
+
+def _value_start(field: str, args: str):
+    """Offset of the field's string content in args (None until it has started)"""
+    stream = FieldStream(field)
+    stream.feed(args)
+    return stream.value_start
@@ -0,0 +1,66 @@
+"""Cascade model routing - cheap model for tool dispatch, chosen model for user-facing turns"""
+import logging
+from src.config import MODELS, TOOL_CALL_MODEL, FAST_PATH_PASSIVE_TOOLS as PASSIVE_TOOLS
+
+logger = logging.getLogger(__name__)
+
+# Tools whose output the user reads directly
+USER_FACING_TOOLS = ("send_message",)
+
+# Events carrying the model's own words
+VOICE_EVENTS = ("message_delta", "message", "thinking_delta", "thinking")
+
+
+def is_premium(model: str) -> bool:
+    """Models that consume credits (cost other than "0x")"""
+    return any(m["id"] == model and m["cost"] != "0x" for m in MODELS)
+
+
+def should_cascade(model: str, enabled: bool) -> bool:
+    return enabled and model != TOOL_CALL_MODEL and is_premium(model)
+
+
+def pick_model(model: str, cascade: bool, escalate: bool) -> str:
+    """Model for the next iteration"""
+    return model if not cascade or escalate else TOOL_CALL_MODEL
+
+
+def split_draft(tool_calls: list, tool_handlers: dict) -> tuple:
+    """
+    Split a cheap-model turn into (tool calls to execute, whether it answered the user).
+
+    A draft turn normally runs as is, terminal calls included. If the cheap
+    model wrote the reply anyway, the reply and the calls that would end the
+    run with it are dropped: the chosen model redoes that part of the turn.
+    """
+    if not any(tc["function"]["name"] in USER_FACING_TOOLS for tc in tool_calls):
+        return tool_calls, False
+    kept = [
+        tc for tc in tool_calls
+        if tc["function"]["name"] not in USER_FACING_TOOLS
+        and not tool_handlers.get(tc["function"]["name"], {}).get("is_terminal")
+    ]
+    dropped = [tc["function"]["name"] for tc in tool_calls if tc not in kept]
+    logger.info(f"⬆️ Escalating to chosen model (draft turn answered with {dropped})")
+    return kept, True
+
+
+def escalate_next(tool_calls: list) -> bool:
+    """
+    Hand the run to the chosen model before the user-facing turn: once a
+    draft turn dispatched no real work (only passive tools like think), the
+    next turn is most likely the answer.
+    """
+    return all(tc["function"]["name"] in PASSIVE_TOOLS for tc in tool_calls)
+
+
+def held_back(event: dict) -> bool:
+    """The cheap model's voice (reasoning, replies): never shown for a draft turn"""
+    return event.get("type") in VOICE_EVENTS
+
+
+def tag(event: dict, model: str) -> dict:
+    """Record which model produced an event (deltas stay compact)"""
+    if not event.get("type", "").endswith("_delta"):
+        event["model"] = model
+    return event
@@ -0,0 +1,90 @@
+"""Speculative tool execution - start each tool call as soon as its arguments are complete"""
+import json
+import asyncio
+import logging
+from .local_tools import execute_tools
+
+logger = logging.getLogger(__name__)
+
+
+class SpeculativeExecutor:
+    """
+    Runs tool calls while the model is still streaming.
+
+    Batches are chained so side effects keep the order the model emitted them
+    in; calls that complete while a batch is still waiting to start join it,
+    so each batch is one /execute_batch round trip. The gain is that
+    execution overlaps with the rest of the upstream stream.
+    """
+
+    def __init__(self, tool_handlers: dict):
+        self._handlers = tool_handlers
+        self._tasks = {}  # tool call id -> task of the batch it runs in
+        self._last = None
+        self._waiting = None  # Calls of the last batch, until it starts
+
+    def submit(self, tool_calls: list):
+        """Start executing completed tool calls (idempotent per id)"""
+        new = [tc for tc in tool_calls if tc["id"] not in self._tasks]
+        if not new:
+            return
+        logger.info(f"🏃 Speculative start: {', '.join(tc['function']['name'] for tc in new)}")
+        if self._waiting is None:
+            self._waiting = []
+            self._last = asyncio.create_task(self._run(self._last, self._waiting))
+        self._waiting.extend(new)
+        for tc in new:
+            self._tasks[tc["id"]] = self._last
+
+    async def _run(self, previous, batch: list) -> list:
+        if previous is not None:
+            await asyncio.wait([previous])
+        if self._waiting is batch:
+            self._waiting = None  # Calls completing from now on go to the next batch
+        return await execute_tools(batch, self._handlers)
+
+    async def results(self, tool_calls: list) -> list:
+        """Start whatever is left (one batch), then return results in tool_calls order"""
+        self.submit(tool_calls)
+        tasks = list(dict.fromkeys(self._tasks[tc["id"]] for tc in tool_calls))
+        by_id = {r["tool_call_id"]: r for batch in await asyncio.gather(*tasks) for r in batch}
+        return [by_id[tc["id"]] for tc in tool_calls]
+
+    def cancel(self):
+        """Abandon in-flight executions (e.g. upstream stream failed)"""
+        for task in self._tasks.values():
+            task.cancel()
+
+
+def ready_tool_calls(buffer: dict) -> list:
+    """
+    Return tool calls from the stream buffer whose arguments are complete.
+
+    A call is complete once a later index has started, or once its
+    argument JSON parses (only tried when it ends with '}').
+    """
+    ready = []
+    last_idx = max(buffer) if buffer else None
+
+    for idx in sorted(buffer):
+        entry = buffer[idx]
+        if entry.get("submitted") or not entry["id"] or not entry["name"]:
+            continue
+        if idx == last_idx and not (entry["arguments"].rstrip().endswith("}") and _parses(entry["arguments"])):
+            continue
+        entry["submitted"] = True
+        ready.append({
+            "id": entry["id"],
+            "type": "function",
+            "function": {"name": entry["name"], "arguments": entry["arguments"]},
+        })
+
+    return ready
+
+
+def _parses(s: str) -> bool:
+    try:
+        json.loads(s)
+        return True
+    except ValueError:
+        return False
@@ -1,8 +1,8 @@
 """Process tool calls and convert to events"""
 import json
 import logging
-from src.mcp_client import execute_tool_calls, tool_to_event
-from src.copilot import make_request
+from src.mcp_client import tool_to_event
+from .local_tools import execute_tools, is_local, local_event
 
 logger = logging.getLogger(__name__)
 
@@ -15,10 +15,13 @@ def parse_json(s: str) -> dict:
         return {}
 
 
-async def process_tools(tool_calls: list, tool_handlers: dict, copilot_token: str = None):
+async def process_tools(tool_calls: list, tool_handlers: dict, executor=None):
     """
     Execute tool calls and yield events.
     
+    If a SpeculativeExecutor is given, calls it already started are awaited
+    instead of executed again.
+    
     Yields: event dicts or special control events
     Final yield: {"type": "results", "results": [...], "tool_calls": [...]} for loop to use
     """
@@ -26,9 +29,13 @@ async def process_tools(tool_calls: list, tool_handlers: dict, copilot_token: st
         return
     
     logger.info(f"⚡ Executing {len(tool_calls)} tool(s)...")
-    results = await execute_tool_calls(tool_calls)
+    results = await executor.results(tool_calls) if executor else await execute_tools(tool_calls, tool_handlers)
     
     task_done = False
+    summarize = False
+    by_id = {r["tool_call_id"]: r for r in results}
+    # Events returned inline by /execute_batch (must not go back upstream)
+    inline_events = {tc_id: r.pop("event") for tc_id, r in by_id.items() if "event" in r}
     
     for tc in tool_calls:
         name = tc["function"]["name"]
@@ -36,12 +43,13 @@ async def process_tools(tool_calls: list, tool_handlers: dict, copilot_token: st
         tc_id = tc["id"]
         
         # Get result for this tool
-        result_str = next((r["content"] for r in results if r["tool_call_id"] == tc_id), "{}")
+        result_str = by_id[tc_id]["content"] if tc_id in by_id else "{}"
         
         # Handle summarize specially
-        if name == "summarize_conversation" and copilot_token:
-            async for event in _handle_summarize(copilot_token):
-                yield event
+        if name == "summarize_conversation":
+            logger.info("📝 Summarizing conversation...")
+            summarize = True
+            yield {"type": "thinking", "content": "Summarizing conversation..."}
             continue
         
         handler = tool_handlers.get(name, {})
@@ -53,13 +61,18 @@ async def process_tools(tool_calls: list, tool_handlers: dict, copilot_token: st
             yield {"type": "terminal", "name": name}
             continue
         
-        # Convert to UI event via MCP
+        # Convert to UI event (locally for pure tools, else via MCP)
         if handler.get("has_to_event"):
             # Skip if already streamed
-            if tc.get("streamed") and name in ("think", "send_message"):
+            if tc.get("streamed") and handler.get("stream"):
                 continue
             
-            event = await tool_to_event(name, parse_json(args_str), parse_json(result_str))
+            if is_local(name, tool_handlers):
+                event = local_event(name, parse_json(args_str), tool_handlers)
+            elif tc_id in inline_events:
+                event = inline_events[tc_id]
+            else:
+                event = await tool_to_event(name, parse_json(args_str), parse_json(result_str))
             if event:
                 logger.info(f"📤 {name} → {event.get('type')}")
                 yield event
@@ -70,11 +83,5 @@ async def process_tools(tool_calls: list, tool_handlers: dict, copilot_token: st
         yield {"type": "tool_call", "tool_call": {"name": name, "arguments": args_str, "result": result_str}}
     
     # Return results for the loop to add to messages
-    yield {"type": "_results", "results": results, "task_done": task_done}
-
+    yield {"type": "_results", "results": results, "task_done": task_done, "summarize": summarize}
 
-async def _handle_summarize(copilot_token: str):
-    """Handle summarize_conversation by calling Copilot to generate summary"""
-    logger.info("📝 Summarizing conversation...")
-    # Note: This is a placeholder - actual implementation would need messages
-    yield {"type": "thinking", "content": "Summarizing conversation..."}
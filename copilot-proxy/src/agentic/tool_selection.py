@@ -0,0 +1,103 @@
+"""Tool selection - send only the tools relevant to the conversation (BM25 ranking)"""
+import re
+import json
+import math
+import logging
+from collections import Counter
+from src.config import PINNED_TOOLS, TOOL_SELECTION_TOP_K, TOOL_SELECTION_MIN_SCORE
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Index cache: keyed on the catalog list object (replaced when the catalog changes)
+_index = {"tools": None, "docs": None, "df": None, "avg_len": 0}
+
+
+def _tokens(text: str) -> list:
+    return re.findall(r"[a-z0-9à-ÿ]+", text.lower().replace("_", " "))
+
+
+def _tool_text(tool: dict) -> str:
+    fn = tool["function"]
+    params = fn.get("parameters", {}).get("properties", {})
+    param_text = " ".join(f"{name} {p.get('description', '')}" for name, p in params.items())
+    # Name counts twice: it is the strongest signal
+    return f"{fn['name']} {fn['name']} {fn.get('description', '')} {param_text}"
+
+
+def _build_index(tools: list):
+    if _index["tools"] is tools:
+        return
+    docs = [Counter(_tokens(_tool_text(t))) for t in tools]
+    df = Counter(term for doc in docs for term in doc)
+    _index.update(tools=tools, docs=docs, df=df, avg_len=sum(sum(d.values()) for d in docs) / max(len(docs), 1))
+
+
+def _query(messages: list) -> list:
+    """Query terms from the latest user turns"""
+    user_msgs = [m.get("content") or "" for m in messages if m.get("role") == "user"]
+    return _tokens(" ".join(user_msgs[-3:]))
+
+
+def rank_tools(tools: list, messages: list) -> list:
+    """Return (score, tool) pairs, best first"""
+    return _rank(tools, set(_query(messages)))
+
+
+def _rank(tools: list, terms: set) -> list:
+    _build_index(tools)
+    n = len(tools)
+    scored = []
+    for tool, doc in zip(tools, _index["docs"]):
+        length = sum(doc.values())
+        score = 0.0
+        for term in terms:
+            tf = doc.get(term, 0)
+            if not tf:
+                continue
+            idf = math.log(1 + (n - _index["df"][term] + 0.5) / (_index["df"][term] + 0.5))
+            score += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / _index["avg_len"]))
+        scored.append((score, tool))
+    scored.sort(key=lambda st: st[0], reverse=True)
+    return scored
+
+
+def select_tools(tools: list, messages: list, top_k: int = TOOL_SELECTION_TOP_K) -> list:
+    """Pinned core tools + the top_k most relevant others (catalog order preserved)"""
+    if top_k <= 0 or len(tools) <= len(PINNED_TOOLS) + top_k:
+        return tools
+
+    chosen = {t["function"]["name"] for t in tools if t["function"]["name"] in PINNED_TOOLS}
+    others = [(s, t) for s, t in rank_tools(tools, messages) if t["function"]["name"] not in chosen]
+    if not others or others[0][0] < TOOL_SELECTION_MIN_SCORE:
+        # "hello", another language...: no evidence for a subset, the model gets every tool
+        logger.info(f"🎯 No tool matches the query (best score {others[0][0] if others else 0:.2f}), sending all {len(tools)}")
+        return tools
+    chosen.update(t["function"]["name"] for s, t in others[:top_k] if s > 0)
+
+    selected = [t for t in tools if t["function"]["name"] in chosen]
+    saved = len(json.dumps(tools)) - len(json.dumps(selected))
+    logger.info(f"🎯 Tools selected: {len(selected)}/{len(tools)} (~{saved // 4} prompt tokens saved) {sorted(chosen - set(PINNED_TOOLS))}")
+    return selected
+
+
+def widen(selected: list, tools: list, tool_calls: list, top_k: int = TOOL_SELECTION_TOP_K) -> list:
+    """
+    Add tools that match what the model is working on (its tool call
+    arguments, e.g. the think() text), ranked like the query, plus any
+    catalog tool it called without being offered.
+    """
+    offered = {t["function"]["name"] for t in selected}
+    if len(offered) == len(tools):
+        return selected
+    missing = {tc["function"]["name"] for tc in tool_calls} - offered
+    terms = set(_tokens(" ".join(tc["function"].get("arguments") or "" for tc in tool_calls)))
+    relevant = [t for s, t in _rank(tools, terms) if s >= TOOL_SELECTION_MIN_SCORE][:top_k]
+    missing.update(t["function"]["name"] for t in relevant)
+    added = [t for t in tools if t["function"]["name"] in missing - offered]
+    if added:
+        logger.info(f"🎯 Tool set widened with {[t['function']['name'] for t in added]}")
+    return selected + added
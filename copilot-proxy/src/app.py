@@ -1,21 +1,36 @@
 """Copilot Proxy - FastAPI application"""
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from src.routes import router
-from src.mcp_client import clear_cache
+from src.mcp_client import clear_cache, get_tool_catalog
+from src.upstream import start_client, close_client
+from src.copilot import start_token_refresher, stop_token_refresher
+from src.config import SERVICE_NAME, TRACE_FILE
+from src import runs, tracing
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s", datefmt="%H:%M:%S")
 logger = logging.getLogger(__name__)
+tracing.configure(SERVICE_NAME, TRACE_FILE)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("🚀 Starting Copilot Proxy...")
+    await start_client()
+    start_token_refresher()
+    runs.start_workers()
+    warmup = asyncio.create_task(get_tool_catalog())
     yield
     logger.info("👋 Shutting down...")
+    warmup.cancel()
+    await runs.stop_workers()
+    await stop_token_refresher()
     clear_cache()
+    await close_client()
 
 
 app = FastAPI(title="Copilot Proxy", version="1.0.0", lifespan=lifespan)
+app.add_middleware(tracing.TraceMiddleware)
 app.include_router(router)
@@ -0,0 +1,86 @@
+"""In-flight request coalescing - identical concurrent completions share one upstream run"""
+import asyncio
+import logging
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+# key -> Flight (removed once the run completes)
+_inflight = {}
+_stats = {"leaders": 0, "followers": 0}
+
+
+class Flight:
+    """One upstream run whose events fan out to every subscriber"""
+
+    def __init__(self, key: str, gen):
+        self.key = key
+        self.events = []
+        self.done = False
+        self.subscribers = 0
+        self._changed = asyncio.Condition()
+        # Runs independently of any one client, so a disconnect doesn't cancel the others
+        self._task = asyncio.create_task(self._pump(gen))
+
+    async def _pump(self, gen):
+        try:
+            async for event in gen:
+                async with self._changed:
+                    self.events.append(event)
+                    self._changed.notify_all()
+        except Exception as e:
+            logger.error(f"❌ Coalesced run failed: {e}")
+        finally:
+            if _inflight.get(self.key) is self:
+                del _inflight[self.key]
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    async def subscribe(self):
+        """All events from the start of the run, then live ones as they arrive"""
+        self.subscribers += 1
+        sent = 0
+        try:
+            while True:
+                async with self._changed:
+                    await self._changed.wait_for(lambda: len(self.events) > sent or self.done)
+                    batch = self.events[sent:]
+                    finished = self.done
+                for event in batch:
+                    yield event
+                sent += len(batch)
+                if finished and sent == len(self.events):
+                    return
+        finally:
+            self.subscribers -= 1
+            # Every client left: nobody wants the result any more
+            if not self.subscribers and not self.done:
+                logger.info("🛑 All coalesced clients gone, cancelling run")
+                self._task.cancel()
+
+
+def join(key: str, gen) -> Tuple[object, bool]:
+    """
+    Subscribe to the in-flight run for key, or start one with gen.
+
+    Returns (event generator, joined). When joined is True, gen is discarded
+    without ever being started.
+    """
+    flight = _inflight.get(key)
+    joined = flight is not None
+    if joined:
+        _stats["followers"] += 1
+        logger.info(f"🔗 Coalesced with in-flight request ({flight.subscribers} waiting)")
+    else:
+        flight = _inflight[key] = Flight(key, gen)
+        _stats["leaders"] += 1
+    return flight.subscribe(), joined
+
+
+def in_flight(key: str) -> bool:
+    return key in _inflight
+
+
+def stats() -> dict:
+    return {**_stats, "in_flight": len(_inflight)}
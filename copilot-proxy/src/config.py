@@ -5,14 +5,130 @@ import os
 
 # GitHub Copilot settings
 GITHUB_COPILOT_TOKEN = os.getenv("COPILOT_TOKEN", "")
-COPILOT_API_URL = "https://api.githubcopilot.com"
+COPILOT_API_URL = os.getenv("COPILOT_API_URL", "https://api.githubcopilot.com")
+COPILOT_TOKEN_URL = os.getenv("COPILOT_TOKEN_URL", "https://api.github.com/copilot_internal/v2/token")
+
+# Token renewal: refresh this many seconds before expires_at
+TOKEN_REFRESH_MARGIN = int(os.getenv("TOKEN_REFRESH_MARGIN", "300"))
+
+# Worker processes (python main.py). With several workers, token, tool catalog and
+# rate-limit state go through SHARED_STATE ("memory" or "sqlite:<path>")
+WORKERS = int(os.getenv("WORKERS", "1"))
+SHARED_STATE = os.getenv("SHARED_STATE", "memory" if WORKERS == 1 else "sqlite:/tmp/copilot-proxy-state.db")
+
+# Tracing: W3C traceparent is always propagated; spans are appended as JSON lines to TRACE_FILE (empty = off)
+SERVICE_NAME = os.getenv("SERVICE_NAME", "copilot-proxy")
+TRACE_FILE = os.getenv("TRACE_FILE", "")
 
 # MCP Server settings
 MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", "http://mcp-server:8081")
 
+# Tool catalog is served from cache, revalidated in background after this many seconds
+TOOL_CATALOG_TTL = float(os.getenv("TOOL_CATALOG_TTL", "30"))
+
+# Available models
+MODELS = [
+    {"id": "gpt-4.1", "cost": "0x"}, {"id": "gpt-4o", "cost": "0x"},
+    {"id": "gpt-5-mini", "cost": "0x"}, {"id": "grok-code-fast-1", "cost": "0x"},
+    {"id": "claude-sonnet-4", "cost": "1x"}, {"id": "gemini-2.5-pro", "cost": "1x"},
+]
+
 # Model used for tool calls (FREE = no credits)
 TOOL_CALL_MODEL = "gpt-4.1"
 
+# Cascade routing (opt-in, per request: "cascade"): with a premium model, leading
+# tool-dispatch iterations run on TOOL_CALL_MODEL and the chosen model takes over
+# for the user-facing turns (send_message)
+CASCADE_ROUTING = os.getenv("CASCADE_ROUTING", "0") == "1"
+
 # Agentic loop settings
 MAX_AGENTIC_ITERATIONS = 15
-AUTO_SUMMARIZE_THRESHOLD = 10
+
+# Fast path (opt-in, per request: "fast_path" in the body): the model may call several
+# tools in one turn, and a turn that answers with send_message plus only passive tools
+# ends the run without the round trip for task_complete()
+FAST_PATH = os.getenv("FAST_PATH", "0") == "1"
+FAST_PATH_PASSIVE_TOOLS = ("think", "send_message")  # Results the model never needs to see
+
+# Context budget (estimated prompt tokens). Older turns beyond it are summarized.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "24000"))
+MODEL_CONTEXT_BUDGETS = {
+    "gpt-4o": 24000,
+    "gpt-4.1": 32000,
+    "gpt-5-mini": 32000,
+    "claude-sonnet-4": 32000,
+    "gemini-2.5-pro": 32000,
+}
+CONTEXT_KEEP_RATIO = 0.6  # Share of the budget kept as verbatim recent turns after summarizing
+CONTEXT_SUMMARY_CACHE_SIZE = 256  # Conversations with a cached rolling summary
+CONTEXT_PREFETCH_RATIO = 0.8  # Past this share of the budget, the next turn's summary is prepared in the background
+
+# Tool outputs in the loop history: max_chars caps each result, results are
+# collapsed to a preview once the model has seen them keep_iterations times
+TOOL_OUTPUT_POLICIES = {
+    "default": {"max_chars": 4000, "keep_iterations": 2, "preview_chars": 200},
+    "search_web": {"max_chars": 6000, "keep_iterations": 1},
+    "run_command": {"max_chars": 3000, "keep_iterations": 1},
+    "get_artifact": {"max_chars": 8000, "keep_iterations": 1, "preview_chars": 100},
+    "recall": {"max_chars": 3000},
+}
+
+# Tool selection: send pinned tools + the TOOL_SELECTION_TOP_K most relevant (0 = send all)
+PINNED_TOOLS = ("think", "send_message", "task_complete")
+TOOL_SELECTION_TOP_K = int(os.getenv("TOOL_SELECTION_TOP_K", "8"))
+# Below this best BM25 score the query says nothing about the tools needed: send them all
+TOOL_SELECTION_MIN_SCORE = float(os.getenv("TOOL_SELECTION_MIN_SCORE", "1.0"))
+
+# Start each tool call as soon as its arguments are complete (while the model streams)
+SPECULATIVE_TOOLS = os.getenv("SPECULATIVE_TOOLS", "1") == "1"
+
+# Upstream connection pool (shared client for the Copilot API)
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "1") == "1"
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "20"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "10"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "120"))
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "120"))
+UPSTREAM_PREWARM = int(os.getenv("UPSTREAM_PREWARM", "1"))
+
+# Upstream stream recovery: retries before/after the first chunk, TTFT deadline, stall watchdog
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "2"))
+UPSTREAM_BACKOFF = float(os.getenv("UPSTREAM_BACKOFF", "0.5"))  # Base delay, doubled per retry (+ jitter)
+UPSTREAM_TTFT_DEADLINE = float(os.getenv("UPSTREAM_TTFT_DEADLINE", "20"))
+UPSTREAM_HEDGE = os.getenv("UPSTREAM_HEDGE", "0") == "1"  # Race a 2nd request once the TTFT deadline passes
+UPSTREAM_IDLE_TIMEOUT = float(os.getenv("UPSTREAM_IDLE_TIMEOUT", "30"))  # Max gap between chunks
+
+# Model to fail over to when a model keeps failing (must be in MODELS)
+FALLBACK_MODELS = {"claude-sonnet-4": "gpt-4.1", "gemini-2.5-pro": "gpt-4.1", "gpt-5-mini": "gpt-4.1", "gpt-4.1": "gpt-4o"}
+
+# Response cache for tool-free completions (opt-in per request with Cache-Control: max-age=N)
+RESPONSE_CACHE_DEFAULT_TTL = int(os.getenv("RESPONSE_CACHE_DEFAULT_TTL", "0"))  # 0 = only when requested
+RESPONSE_CACHE_MAX_TTL = int(os.getenv("RESPONSE_CACHE_MAX_TTL", "86400"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Identical tool-free requests in flight at the same time share one upstream call
+COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "1") == "1"
+
+# SSE output: message/thinking deltas are merged and flushed every SSE_FLUSH_MS or
+# SSE_FLUSH_BYTES, whichever comes first (the first delta is always sent at once; 0 = off)
+SSE_FLUSH_MS = int(os.getenv("SSE_FLUSH_MS", "40"))
+SSE_FLUSH_BYTES = int(os.getenv("SSE_FLUSH_BYTES", "2048"))
+
+# Admission control: concurrent runs per model (adaptive, backs off on 429/5xx),
+# lanes in priority order with their queue deadlines (seconds) before a 503
+MODEL_CONCURRENCY = {"default": 8, "claude-sonnet-4": 4, "gemini-2.5-pro": 4}
+LANES = ("interactive", "background")
+QUEUE_DEADLINES = {
+    "interactive": float(os.getenv("QUEUE_DEADLINE_INTERACTIVE", "30")),
+    "background": float(os.getenv("QUEUE_DEADLINE_BACKGROUND", "120")),
+}
+# Fair-share weights by caller prefix (e.g. "telegram", "event-trigger"), default 1
+CALLER_WEIGHTS = {"telegram": 2.0, "chat-ui": 2.0, "event-trigger": 1.0}
+
+# Async run API (POST /v1/runs): worker pool size, pending queue bound, per-run event replay buffer,
+# and retention of finished runs (TTL + total size cap, oldest evicted first)
+RUN_WORKERS = int(os.getenv("RUN_WORKERS", "4"))
+RUN_QUEUE_MAX = int(os.getenv("RUN_QUEUE_MAX", "100"))
+RUN_BUFFER_EVENTS = int(os.getenv("RUN_BUFFER_EVENTS", "2000"))
+RUN_TTL = int(os.getenv("RUN_TTL", "3600"))
+RUN_STORE_MAX_BYTES = int(os.getenv("RUN_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+RUN_CANCEL_POLL = float(os.getenv("RUN_CANCEL_POLL", "1.0"))  # WORKERS > 1: seconds between checks for DELETEs sent to another worker
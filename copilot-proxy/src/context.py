@@ -0,0 +1,236 @@
+"""Context budget - keep upstream requests under a per-model token budget"""
+import json
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Optional
+from src.config import (
+    CONTEXT_TOKEN_BUDGET, MODEL_CONTEXT_BUDGETS, CONTEXT_KEEP_RATIO, CONTEXT_SUMMARY_CACHE_SIZE,
+    CONTEXT_PREFETCH_RATIO, TOOL_CALL_MODEL,
+)
+from src.copilot import make_request
+
+logger = logging.getLogger(__name__)
+
+# Rolling summaries per conversation: key -> {"covered", "prefix_hash", "summary"}
+_summaries = OrderedDict()
+# Background summaries being prepared for a conversation's next turn: key -> task
+_prefetching = {}
+
+SUMMARY_PROMPT = """Summarize the conversation below so it can replace the original messages.
+Keep facts, decisions, names, numbers, open questions and anything the user asked to remember.
+Be concise. Write in the conversation's language."""
+
+SUMMARY_HEADER = "## Summary of earlier conversation"
+
+# Heuristic tokenizer: ~4 chars/token for prose, plus per-message overhead
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(messages: list) -> int:
+    """Estimate prompt tokens for a message list (no network, no tokenizer dependency)"""
+    total = 0
+    for m in messages:
+        total += MESSAGE_OVERHEAD + len(m.get("content") or "") // CHARS_PER_TOKEN
+        if m.get("tool_calls"):
+            total += len(json.dumps(m["tool_calls"])) // CHARS_PER_TOKEN
+    return total
+
+
+def budget_for(model: str) -> int:
+    """Prompt token budget for a model"""
+    return MODEL_CONTEXT_BUDGETS.get(model, CONTEXT_TOKEN_BUDGET)
+
+
+def conversation_key(messages: list, conversation_id: Optional[str] = None) -> str:
+    """Stable key for the summary cache (explicit id, else first user message)"""
+    if conversation_id:
+        return str(conversation_id)
+    first = next((m.get("content") or "" for m in messages if m.get("role") == "user"), "")
+    return hashlib.sha256(first.encode()).hexdigest()[:16]
+
+
+async def fit_to_budget(messages: list, model: str, token: str, conversation_id: Optional[str] = None,
+                        force: bool = False) -> list:
+    """
+    Return messages that fit the model's budget.
+
+    Older turns are replaced by a rolling summary (cached per conversation, so
+    only newly aged-out messages are summarized). Recent turns are kept verbatim.
+    Close to the budget, the summary is prepared in the background so the turn
+    that crosses it doesn't wait for a summarization call.
+    force=True compacts even under budget (summarize_conversation tool).
+    """
+    budget = budget_for(model)
+    system = [m for m in messages if m.get("role") == "system" and not _is_summary(m)]
+    history = [m for m in messages if m.get("role") != "system"]
+    key = conversation_key(messages, conversation_id)
+
+    tokens = estimate_tokens(messages)
+    if not force and tokens <= budget:
+        if tokens > budget * CONTEXT_PREFETCH_RATIO and not _covers(key, history):
+            _prefetch(key, system, history, budget, token)
+        return messages
+
+    # A summary being prepared in the background is cheaper to wait for than a new one
+    if key in _prefetching:
+        await asyncio.shield(_prefetching[key])
+
+    # The cached summary plus everything after it may still fit: no new summarization
+    if not force:
+        reused = _reuse_summary(key, system, history, budget)
+        if reused:
+            if estimate_tokens(reused) > budget * CONTEXT_PREFETCH_RATIO:
+                _prefetch(key, system, history, budget, token)  # Extend it before it stops fitting
+            return reused
+
+    split = _split_point(system, history, int(budget * CONTEXT_KEEP_RATIO))
+    if split == 0:
+        return _truncate(messages, budget)
+
+    older, recent = history[:split], history[split:]
+    summary = await _rolling_summary(key, older, token)
+
+    if summary:
+        note = {"role": "system", "content": f"{SUMMARY_HEADER}\n{summary}"}
+        logger.info(f"🗜️ Context: {len(older)} message(s) summarized, {len(recent)} kept ({estimate_tokens(messages)} → ~{estimate_tokens(system + [note] + recent)} tokens)")
+    else:
+        note = {"role": "system", "content": f"{SUMMARY_HEADER}\n({len(older)} earlier messages omitted)"}
+        logger.warning(f"⚠️ Context: summarization failed, dropped {len(older)} message(s)")
+
+    return _truncate(system + [note] + recent, budget)
+
+
+def _prefetch(key: str, system: list, history: list, budget: int, token: str):
+    """Summarize in the background what the next turn will have to age out"""
+    split = _split_point(system, history, int(budget * CONTEXT_KEEP_RATIO))
+    if split == 0 or key in _prefetching:
+        return
+    if _covers(key, history[:split], exactly=True):
+        return
+    task = asyncio.create_task(_rolling_summary(key, history[:split], token))
+    _prefetching[key] = task
+    task.add_done_callback(lambda _: _prefetching.pop(key, None))
+    logger.info(f"🗜️ Context: summarizing {split} message(s) ahead of the budget")
+
+
+def _covers(key: str, history: list, exactly: bool = False) -> bool:
+    """The cached summary applies to a prefix of history (or to all of it, exactly)"""
+    cached = _summaries.get(key)
+    if not cached or cached["covered"] > len(history) or (exactly and cached["covered"] != len(history)):
+        return False
+    return cached["prefix_hash"] == _hash(history[:cached["covered"]])
+
+
+def _is_summary(m: dict) -> bool:
+    return (m.get("content") or "").startswith(SUMMARY_HEADER)
+
+
+def _reuse_summary(key: str, system: list, history: list, budget: int) -> Optional[list]:
+    """system + cached summary + uncovered history, if the summary still applies and fits"""
+    cached = _summaries.get(key)
+    if not cached or cached["covered"] >= len(history):
+        return None
+    if cached["prefix_hash"] != _hash(history[:cached["covered"]]):
+        return None
+    candidate = system + [{"role": "system", "content": f"{SUMMARY_HEADER}\n{cached['summary']}"}] + history[cached["covered"]:]
+    if estimate_tokens(candidate) > budget:
+        return None
+    _summaries.move_to_end(key)
+    return candidate
+
+
+def _split_point(system: list, history: list, keep_budget: int) -> int:
+    """
+    Index splitting history into (older, recent).
+
+    Recent turns fill keep_budget from the end; the split only lands on a user
+    message so an assistant tool_calls message is never separated from its results.
+    """
+    used = estimate_tokens(system)
+    split = len(history)
+    for i in range(len(history) - 1, -1, -1):
+        used += estimate_tokens([history[i]])
+        if used > keep_budget:
+            break
+        split = i
+
+    # Always keep the latest turn, and start "recent" on a user message
+    split = min(split, max(len(history) - 1, 0))
+    while split > 0 and history[split].get("role") != "user":
+        split -= 1
+    return split
+
+
+async def _rolling_summary(key: str, older: list, token: str) -> Optional[str]:
+    """Summary of `older`, reusing and extending the cached one when it covers a prefix"""
+    cached = _summaries.get(key)
+    previous, new = None, older
+
+    if cached and cached["covered"] <= len(older) and cached["prefix_hash"] == _hash(older[:cached["covered"]]):
+        _summaries.move_to_end(key)
+        if cached["covered"] == len(older):
+            return cached["summary"]
+        previous, new = cached["summary"], older[cached["covered"]:]
+
+    summary = await _summarize(previous, new, token)
+    if summary:
+        _summaries[key] = {"covered": len(older), "prefix_hash": _hash(older), "summary": summary}
+        _summaries.move_to_end(key)
+        while len(_summaries) > CONTEXT_SUMMARY_CACHE_SIZE:
+            _summaries.popitem(last=False)
+    return summary
+
+
+async def _summarize(previous: Optional[str], messages: list, token: str) -> Optional[str]:
+    """Ask the cheap model to (re)summarize"""
+    transcript = "\n".join(_render(m) for m in messages)
+    if previous:
+        transcript = f"Previous summary:\n{previous}\n\nNew messages:\n{transcript}"
+
+    body = {
+        "model": TOOL_CALL_MODEL,
+        "messages": [{"role": "system", "content": SUMMARY_PROMPT}, {"role": "user", "content": transcript}],
+        "stream": False,
+    }
+    try:
+        data = await make_request(body, token)
+        return data["choices"][0]["message"]["content"].strip() if data else None
+    except Exception as e:
+        logger.error(f"❌ Summarization failed: {e}")
+        return None
+
+
+def _render(m: dict, limit: int = 2000) -> str:
+    """One transcript line per message (long contents clipped)"""
+    content = m.get("content") or ""
+    if m.get("tool_calls"):
+        content = ", ".join(f"{tc['function']['name']}({tc['function'].get('arguments', '')[:200]})" for tc in m["tool_calls"])
+    if len(content) > limit:
+        content = content[:limit] + "…"
+    return f"{m.get('role')}: {content}"
+
+
+def _truncate(messages: list, budget: int) -> list:
+    """Last resort: clip the middle of the largest contents until under budget"""
+    messages = [dict(m) for m in messages]
+    while estimate_tokens(messages) > budget:
+        largest = max(messages, key=lambda m: len(m.get("content") or ""))
+        content = largest.get("content") or ""
+        if len(content) < 400:
+            break
+        excess = (estimate_tokens(messages) - budget) * CHARS_PER_TOKEN
+        keep = max(len(content) - excess - 50, 200) // 2
+        largest["content"] = f"{content[:keep]}\n[… truncated …]\n{content[-keep:]}"
+    return messages
+
+
+def _hash(messages: list) -> str:
+    """Identity of a history prefix (tool calls and results included: their content may be empty)"""
+    return hashlib.sha256(json.dumps([
+        (m.get("role"), m.get("content"), m.get("tool_call_id"),
+         [(tc.get("id"), tc["function"]["name"], tc["function"].get("arguments")) for tc in m.get("tool_calls") or []])
+        for m in messages
+    ]).encode()).hexdigest()
@@ -1,41 +1,132 @@
 """GitHub Copilot API client"""
 import time
+import random
+import asyncio
 import logging
 from typing import Optional
-import httpx
 from fastapi import HTTPException
-from src.config import GITHUB_COPILOT_TOKEN, COPILOT_API_URL
+from src.config import GITHUB_COPILOT_TOKEN, COPILOT_API_URL, COPILOT_TOKEN_URL, TOKEN_REFRESH_MARGIN
+from src.upstream import get_client
+from src import scheduler, shared_state
 
 logger = logging.getLogger(__name__)
 
 # Token cache
 _token = {"value": None, "expires": 0}
+_refresher = {"task": None, "lock": None}
+
+
+def _lock() -> asyncio.Lock:
+    """Single-flight lock (created lazily inside the running loop)"""
+    if _refresher["lock"] is None:
+        _refresher["lock"] = asyncio.Lock()
+    return _refresher["lock"]
+
+
+def _is_fresh(margin: float = 60) -> bool:
+    return bool(_token["value"]) and time.time() < _token["expires"] - margin
 
 
 async def get_token() -> str:
-    """Get Copilot API token (cached)"""
-    if _token["value"] and time.time() < _token["expires"] - 60:
+    """Get Copilot API token (cached, single-flight refresh)"""
+    if _is_fresh():
         return _token["value"]
     
     if not GITHUB_COPILOT_TOKEN:
         raise HTTPException(500, "COPILOT_TOKEN not configured")
     
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            "https://api.github.com/copilot_internal/v2/token",
-            headers={"Authorization": f"token {GITHUB_COPILOT_TOKEN}", "Accept": "application/json", "User-Agent": "GithubCopilot/1.0"}
-        )
-        
-        if resp.status_code != 200:
-            logger.error(f"❌ Token error: {resp.status_code}")
-            raise HTTPException(401, f"Failed to get Copilot token: {resp.text}")
-        
-        data = resp.json()
-        _token["value"] = data.get("token")
-        _token["expires"] = data.get("expires_at", time.time() + 1800)
+    async with _lock():
+        # Another request may have refreshed it while we waited
+        if not _is_fresh():
+            await _refresh_token()
         return _token["value"]
 
 
+async def _refresh_token(margin: float = 60):
+    """Adopt a fresh token from shared state, or fetch a new one (call with _lock() held)"""
+    if _load_shared_token() and _is_fresh(margin):
+        return
+    
+    # One worker fetches, the others wait for its token
+    if not shared_state.lease("token_refresh", 30):
+        for _ in range(20):
+            await asyncio.sleep(0.5)
+            if _load_shared_token() and _is_fresh(margin):
+                return
+    try:
+        await _fetch_token()
+    finally:
+        shared_state.release("token_refresh")
+
+
+async def _fetch_token():
+    resp = await get_client().get(
+        COPILOT_TOKEN_URL,
+        headers={"Authorization": f"token {GITHUB_COPILOT_TOKEN}", "Accept": "application/json", "User-Agent": "GithubCopilot/1.0"},
+        timeout=30.0
+    )
+    
+    if resp.status_code != 200:
+        logger.error(f"❌ Token error: {resp.status_code}")
+        raise HTTPException(401, f"Failed to get Copilot token: {resp.text}")
+    
+    data = resp.json()
+    _token["value"] = data.get("token")
+    _token["expires"] = data.get("expires_at", time.time() + 1800)
+    _save_shared_token()
+    logger.info(f"🔑 Copilot token refreshed (expires in {int(_token['expires'] - time.time())}s)")
+
+
+def _load_shared_token() -> bool:
+    """Adopt a newer token published by another worker"""
+    data = shared_state.get("copilot_token")
+    if not data or data.get("expires", 0) <= _token["expires"]:
+        return False
+    _token["value"] = data.get("value")
+    _token["expires"] = data["expires"]
+    return True
+
+
+def _save_shared_token():
+    """Publish the token to the other workers"""
+    shared_state.put("copilot_token", dict(_token), ttl=max(1, _token["expires"] - time.time()))
+
+
+async def _refresh_loop():
+    """Renew the token ahead of expires_at so request paths never wait on it"""
+    while True:
+        try:
+            async with _lock():
+                if not _is_fresh(TOKEN_REFRESH_MARGIN):
+                    await _refresh_token(TOKEN_REFRESH_MARGIN)
+            # Jitter spreads workers so one refreshes and the others adopt its token
+            delay = _token["expires"] - TOKEN_REFRESH_MARGIN - time.time() + random.uniform(0, 30)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Background token refresh failed: {e}")
+            delay = 30
+        await asyncio.sleep(max(delay, 5))
+
+
+def start_token_refresher():
+    """Start background token renewal (no-op without COPILOT_TOKEN)"""
+    if GITHUB_COPILOT_TOKEN and _refresher["task"] is None:
+        _refresher["task"] = asyncio.create_task(_refresh_loop())
+
+
+async def stop_token_refresher():
+    """Stop background token renewal"""
+    task = _refresher["task"]
+    _refresher["task"] = None
+    if task:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
 def get_headers(token: str, messages: list, stream: bool = True) -> dict:
     """Build Copilot API headers"""
     return {
@@ -52,6 +143,6 @@ def get_headers(token: str, messages: list, stream: bool = True) -> dict:
 
 async def make_request(body: dict, token: str) -> Optional[dict]:
     """Make non-streaming request to Copilot API"""
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        resp = await client.post(f"{COPILOT_API_URL}/chat/completions", headers=get_headers(token, body.get("messages", []), False), json=body)
-        return resp.json() if resp.status_code == 200 else None
+    resp = await get_client().post(f"{COPILOT_API_URL}/chat/completions", headers=get_headers(token, body.get("messages", []), False), json=body)
+    scheduler.observe(body.get("model"), resp.status_code, resp.headers.get("retry-after"))
+    return resp.json() if resp.status_code == 200 else None
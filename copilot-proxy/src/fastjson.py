@@ -0,0 +1,19 @@
+"""JSON on bytes - orjson when installed, stdlib json otherwise"""
+import json
+
+try:
+    import orjson
+except ImportError:  # Same results, just slower
+    orjson = None
+
+
+def loads(data):
+    """Parse JSON from bytes or str"""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def dumps(obj) -> bytes:
+    """Compact UTF-8 JSON"""
+    if orjson:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
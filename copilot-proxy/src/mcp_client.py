@@ -1,44 +1,140 @@
 """MCP Server client - Tools management and execution"""
 import json
+import time
+import asyncio
 import logging
-from typing import Optional
+from typing import Optional, Tuple
 import httpx
-from src.config import MCP_SERVER_URL
+from src.config import MCP_SERVER_URL, TOOL_CATALOG_TTL
+from src import shared_state, timing, tracing
 
 logger = logging.getLogger(__name__)
 
-# Cache
-_cache = {"tools": None, "handlers": None}
+# Tool catalog cache (stale-while-revalidate, keyed by mcp-server's catalog version)
+_cache = {"tools": None, "handlers": None, "version": None, "fetched_at": 0, "task": None, "lock": None}
 
 
 async def _mcp_request(method: str, path: str, json_data: dict = None, timeout: float = 10.0):
     """Helper for MCP server requests"""
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            if method == "GET":
-                resp = await client.get(f"{MCP_SERVER_URL}{path}")
-            else:
-                resp = await client.post(f"{MCP_SERVER_URL}{path}", json=json_data)
-            return resp.json() if resp.status_code == 200 else None
+        with timing.mcp(path):
+            async with httpx.AsyncClient(timeout=timeout, transport=tracing.transport()) as client:
+                if method == "GET":
+                    resp = await client.get(f"{MCP_SERVER_URL}{path}")
+                else:
+                    resp = await client.post(f"{MCP_SERVER_URL}{path}", json=json_data)
+                return resp.json() if resp.status_code == 200 else None
     except Exception as e:
         logger.error(f"❌ MCP request failed ({path}): {e}")
         return None
 
 
+async def get_tool_catalog() -> Tuple[list, dict]:
+    """
+    Get (tools, handlers) from the cache.
+    
+    Only a cold cache waits on MCP server; a stale one is served immediately
+    and revalidated in the background (If-None-Match on the catalog version).
+    """
+    if _cache["tools"] is None:
+        if _cache["lock"] is None:
+            _cache["lock"] = asyncio.Lock()
+        async with _cache["lock"]:
+            if _cache["tools"] is None:
+                await refresh_catalog()
+    elif time.time() - _cache["fetched_at"] > TOOL_CATALOG_TTL:
+        _schedule_revalidate()
+    
+    return _cache["tools"] or [], _cache["handlers"] or {}
+
+
 async def get_mcp_tools() -> list:
-    """Fetch available tools from MCP server (no cache - always fresh)"""
-    data = await _mcp_request("GET", "/tools")
-    if data:
-        tools = data.get("tools", [])
-        logger.info(f"🛠️ Loaded {len(tools)} tools from MCP server")
-        return tools
-    return []
+    """Fetch available tools from MCP server (cached catalog)"""
+    tools, _ = await get_tool_catalog()
+    return tools
 
 
 async def get_tool_handlers() -> dict:
-    """Fetch tool handler info from MCP server (no cache - always fresh)"""
-    data = await _mcp_request("GET", "/tools/handlers")
-    return data.get("handlers", {}) if data else {}
+    """Fetch tool handler info from MCP server (cached catalog)"""
+    _, handlers = await get_tool_catalog()
+    return handlers
+
+
+async def refresh_catalog() -> bool:
+    """Revalidate the catalog (another worker's copy, else MCP server). Returns True if it changed."""
+    shared = shared_state.get("tool_catalog")
+    if shared and shared["fetched_at"] > _cache["fetched_at"] and time.time() - shared["fetched_at"] <= TOOL_CATALOG_TTL:
+        return _adopt(shared)
+    
+    # One worker revalidates; the others keep serving their copy (a cold cache can't wait)
+    if not shared_state.lease("catalog_refresh", 15) and _cache["tools"] is not None:
+        return False
+    try:
+        return await _fetch_catalog()
+    finally:
+        shared_state.release("catalog_refresh")
+
+
+async def _fetch_catalog() -> bool:
+    headers = {"If-None-Match": f'"{_cache["version"]}"'} if _cache["version"] else {}
+    try:
+        with timing.mcp("/tools/catalog"):
+            async with httpx.AsyncClient(timeout=10.0, transport=tracing.transport()) as client:
+                resp = await client.get(f"{MCP_SERVER_URL}/tools/catalog", headers=headers)
+    except Exception as e:
+        logger.error(f"❌ MCP request failed (/tools/catalog): {e}")
+        return False
+    
+    if resp.status_code == 304:
+        _cache["fetched_at"] = time.time()
+        _publish()
+        return False
+    if resp.status_code != 200:
+        logger.error(f"❌ MCP catalog error: {resp.status_code}")
+        return False
+    
+    data = resp.json()
+    _cache["tools"] = data.get("tools", [])
+    _cache["handlers"] = data.get("handlers", {})
+    _cache["version"] = data.get("version")
+    _cache["fetched_at"] = time.time()
+    _publish()
+    logger.info(f"🛠️ Loaded {len(_cache['tools'])} tools from MCP server (catalog {_cache['version']})")
+    return True
+
+
+def _publish():
+    """Share the catalog with the other workers"""
+    shared_state.put("tool_catalog", {k: _cache[k] for k in ("tools", "handlers", "version", "fetched_at")})
+
+
+def _adopt(shared: dict) -> bool:
+    """Take another worker's fresher copy"""
+    changed = shared["version"] != _cache["version"]
+    _cache.update({k: shared[k] for k in ("tools", "handlers", "version", "fetched_at")})
+    if changed:
+        logger.info(f"🛠️ Adopted catalog {_cache['version']} ({len(_cache['tools'])} tools) from another worker")
+    return changed
+
+
+def _schedule_revalidate():
+    """Start one background revalidation if none is running"""
+    task = _cache["task"]
+    if task is None or task.done():
+        _cache["task"] = asyncio.create_task(_revalidate())
+
+
+async def _revalidate():
+    timing.detach()  # Runs in the background, not on the request's critical path
+    await refresh_catalog()
+
+
+async def refresh_zapier() -> Optional[dict]:
+    """Ask MCP server to refresh Zapier tools, then reload the catalog"""
+    data = await _mcp_request("POST", "/zapier/refresh", timeout=30.0)
+    clear_cache()
+    await refresh_catalog()
+    return data
 
 
 async def tool_to_event(name: str, args: dict, result: dict) -> Optional[dict]:
@@ -48,14 +144,22 @@ async def tool_to_event(name: str, args: dict, result: dict) -> Optional[dict]:
 
 
 async def execute_tool_calls(tool_calls: list) -> list:
-    """Execute tool calls via MCP server"""
-    data = await _mcp_request("POST", "/execute_batch", {"tool_calls": tool_calls}, 30.0)
+    """
+    Execute tool calls via MCP server.
+    
+    Each result also carries the tool's UI event ("event" key, from to_event),
+    so no separate /tools/to_event call is needed.
+    """
+    data = await _mcp_request("POST", "/execute_batch", {"tool_calls": tool_calls, "include_events": True}, 30.0)
     if data:
         return data.get("results", [])
-    return [{"tool_call_id": tc.get("id", "unknown"), "role": "tool", "content": json.dumps({"error": "MCP request failed"})} for tc in tool_calls]
+    return [{"tool_call_id": tc.get("id", "unknown"), "role": "tool", "content": json.dumps({"error": "MCP request failed"}), "event": None} for tc in tool_calls]
 
 
 def clear_cache():
-    """Clear cached tools and handlers"""
+    """Invalidate cached tools and handlers (here and for the other workers)"""
+    shared_state.delete("tool_catalog")
     _cache["tools"] = None
     _cache["handlers"] = None
+    _cache["version"] = None
+    _cache["fetched_at"] = 0
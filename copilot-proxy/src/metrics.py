@@ -0,0 +1,74 @@
+"""Prometheus metrics in text exposition format (GET /metrics), no client library needed"""
+from bisect import bisect_left
+
+# Seconds: from a local tool call to a long agentic run
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_registry = []
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label value"""
+
+    def __init__(self, name: str, help: str, label: str = None, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = buckets
+        self._series = {}  # label value -> [bucket counts..., sum, count]
+        _registry.append(self)
+
+    def observe(self, value: float, label: str = ""):
+        series = self._series.get(label)
+        if series is None:
+            series = self._series[label] = [0] * (len(self.buckets) + 2)
+        i = bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label, series in sorted(self._series.items()):
+            labels = f'{self.label}="{_escape(label)}"' if self.label else ""
+            sep = "," if labels else ""
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {series[-1]}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{suffix} {series[-1]}")
+        return lines
+
+
+class Counter:
+    """Monotonic total, one series per label value"""
+
+    def __init__(self, name: str, help: str, label: str = None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._series = {}  # label value -> total
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, label: str = ""):
+        self._series[label] = self._series.get(label, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label, total in sorted(self._series.items()):
+            suffix = f'{{{self.label}="{_escape(label)}"}}' if self.label else ""
+            lines.append(f"{self.name}{suffix} {total}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render() -> str:
+    """Every registered metric (this worker's process only)"""
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
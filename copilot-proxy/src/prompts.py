@@ -14,8 +14,25 @@ HOW TO MODIFY AN ARTIFACT:
 3. replace_in_artifact(old_string="exact", new_string="new", description="change")"""
 
 
-def build_system_prompt(tool_names: list, user_context: dict = None) -> dict:
-    """Build system prompt that forces tool-only behavior"""
+# Turn structure: one tool per turn, or (fast path) several tools per turn
+STEP_RULES = """4. Work step by step - one tool at a time
+5. Call task_complete() when done"""
+
+STEP_EXAMPLE = """1. think("Let me reason...")
+2. send_message("2+2=4 because...")
+3. task_complete()"""
+
+FAST_PATH_RULES = """4. Call every tool you can in the SAME turn - each extra turn is a slow round trip
+5. A turn whose only tools are think() and send_message() ends the task. If you still need
+   another tool's result, call that tool first and answer in a later turn
+6. Call task_complete() when done (in the same turn as your answer)"""
+
+FAST_PATH_EXAMPLE = """One turn with three tool calls:
+think("Let me reason...") + send_message("2+2=4 because...") + task_complete()"""
+
+
+def build_system_prompt(tool_names: list, user_context: dict = None, fast_path: bool = False) -> dict:
+    """Build system prompt that forces tool-only behavior (fast_path: several tools per turn)"""
     
     rules = ARTIFACT_RULES if "create_artifact" in tool_names else ""
     
@@ -37,11 +54,8 @@ RULES:
 1. send_message() to communicate - NEVER plain text
 2. think() for reasoning (shown separately to user)
 3. NEVER repeat think() content in send_message()
-4. Work step by step - one tool at a time
-5. Call task_complete() when done{rules}{context_section}
+{FAST_PATH_RULES if fast_path else STEP_RULES}{rules}{context_section}
 
 Example: "Explain 2+2=4"
-1. think("Let me reason...")
-2. send_message("2+2=4 because...")
-3. task_complete()"""
+{FAST_PATH_EXAMPLE if fast_path else STEP_EXAMPLE}"""
     }
@@ -0,0 +1,114 @@
+"""Response cache for tool-free completions (content-addressed, LRU + TTL + byte cap)"""
+import json
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Optional, Tuple
+from src.config import RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_DEFAULT_TTL, RESPONSE_CACHE_MAX_TTL
+
+logger = logging.getLogger(__name__)
+
+# Sampling parameters that change the answer (part of the key)
+SAMPLING_PARAMS = ("temperature", "top_p", "max_tokens", "presence_penalty", "frequency_penalty", "stop", "seed", "n")
+
+# key -> {"events", "size", "expires"}
+_entries = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "bytes": 0}
+
+
+def cache_key(model: str, messages: list, body: dict) -> str:
+    """Content address: model + normalized messages + sampling parameters"""
+    normalized = [{"role": m.get("role"), "content": (m.get("content") or "").strip()} for m in messages]
+    params = {p: body[p] for p in SAMPLING_PARAMS if p in body}
+    raw = json.dumps({"model": model, "messages": normalized, "params": params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def cache_policy(cache_control: Optional[str]) -> Tuple[bool, int]:
+    """
+    Parse a Cache-Control-style request header into (lookup, store_ttl).
+
+    max-age=N opts in (TTL capped by RESPONSE_CACHE_MAX_TTL), no-cache skips the
+    lookup, no-store skips storing. Without a header RESPONSE_CACHE_DEFAULT_TTL
+    applies (0 = cache off unless the caller opts in).
+    """
+    ttl = RESPONSE_CACHE_DEFAULT_TTL
+    lookup, store = True, True
+    for directive in (cache_control or "").lower().split(","):
+        directive = directive.strip()
+        if directive.startswith("max-age="):
+            try:
+                ttl = min(int(directive[8:]), RESPONSE_CACHE_MAX_TTL)
+            except ValueError:
+                pass
+        elif directive == "no-cache":
+            lookup = False
+        elif directive == "no-store":
+            store = False
+    enabled = ttl > 0
+    return enabled and lookup, ttl if enabled and store else 0
+
+
+def get(key: str) -> Optional[list]:
+    """Cached events for key, or None"""
+    entry = _entries.get(key)
+    if entry and entry["expires"] > time.time():
+        _entries.move_to_end(key)
+        _stats["hits"] += 1
+        return entry["events"]
+    if entry:
+        _remove(key)
+    _stats["misses"] += 1
+    return None
+
+
+def put(key: str, events: list, ttl: int):
+    """Store events, evicting least recently used entries over the byte cap"""
+    size = len(json.dumps(events))
+    if ttl <= 0 or size > RESPONSE_CACHE_MAX_BYTES:
+        return
+    if key in _entries:
+        _remove(key)
+    _entries[key] = {"events": events, "size": size, "expires": time.time() + ttl}
+    _stats["bytes"] += size
+    _stats["stores"] += 1
+    while _stats["bytes"] > RESPONSE_CACHE_MAX_BYTES:
+        oldest = next(iter(_entries))
+        _remove(oldest)
+        _stats["evictions"] += 1
+
+
+def _remove(key: str):
+    entry = _entries.pop(key)
+    _stats["bytes"] -= entry["size"]
+
+
+async def record(gen, key: str, ttl: int):
+    """Pass events through and store them once the run completed with a message"""
+    events = []
+    async for event in gen:
+        if event.get("type") != "timing":  # Describes this run, not the replays
+            events.append(event)
+        yield event
+    if ttl > 0 and any(e.get("type") == "message" for e in events):
+        put(key, events, ttl)
+
+
+async def replay(events: list):
+    """Replay cached events as an agentic event stream"""
+    for event in events:
+        yield event
+
+
+def stats() -> dict:
+    """Hit/miss counters and occupancy"""
+    lookups = _stats["hits"] + _stats["misses"]
+    return {**_stats, "entries": len(_entries), "max_bytes": RESPONSE_CACHE_MAX_BYTES,
+            "hit_rate": round(_stats["hits"] / lookups, 3) if lookups else 0.0}
+
+
+def clear():
+    """Drop all entries"""
+    _entries.clear()
+    _stats["bytes"] = 0
@@ -1,24 +1,21 @@
 """FastAPI route handlers"""
+import asyncio
 import logging
-from fastapi import APIRouter, Request, HTTPException
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi import APIRouter, Request, HTTPException, WebSocket
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 
+from src.config import MODELS, CASCADE_ROUTING, FAST_PATH, COALESCE_REQUESTS
 from src.copilot import get_token
-from src.mcp_client import get_mcp_tools, get_tool_handlers
+from src.mcp_client import get_mcp_tools, get_tool_catalog, refresh_zapier
 from src.messages import clean_messages
 from src.agentic import run_agentic_loop
-from src.streaming import stream_agentic_events
+from src.streaming import stream_agentic_events, stream_run_events
+from src.upstream import pool_stats
+from src import response_cache, coalesce, scheduler, runs, ws, metrics, timing
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# Available models
-MODELS = [
-    {"id": "gpt-4.1", "cost": "0x"}, {"id": "gpt-4o", "cost": "0x"},
-    {"id": "gpt-5-mini", "cost": "0x"}, {"id": "grok-code-fast-1", "cost": "0x"},
-    {"id": "claude-sonnet-4", "cost": "1x"}, {"id": "gemini-2.5-pro", "cost": "1x"},
-]
-
 
 @router.get("/")
 async def root():
@@ -30,6 +27,104 @@ async def health():
     return {"status": "healthy"}
 
 
+@router.get("/v1/pool")
+async def upstream_pool():
+    """Upstream connection pool statistics (for sizing under load)"""
+    return pool_stats()
+
+
+@router.get("/v1/cache")
+async def cache_stats():
+    """Response cache hit/miss counters and request coalescing counts"""
+    return {**response_cache.stats(), "coalescing": coalesce.stats()}
+
+
+@router.delete("/v1/cache")
+async def cache_clear():
+    response_cache.clear()
+    return {"status": "cleared"}
+
+
+@router.get("/v1/scheduler")
+async def scheduler_stats():
+    """Per-model limits, in-flight runs and queue depth per lane"""
+    return scheduler.stats()
+
+
+@router.get("/metrics")
+async def prometheus_metrics():
+    """Latency histograms (runs, setup phases, TTFT, iterations, tools, MCP) in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/v1/runs")
+async def list_runs():
+    """Runs currently in progress, and the background worker pool"""
+    return {"runs": runs.active(), **runs.stats()}
+
+
+@router.post("/v1/runs", status_code=202)
+async def create_run(request: Request):
+    """Start an agentic run in the background; follow it with /v1/runs/{id}/events"""
+    try:
+        body = await request.json()
+    except:
+        raise HTTPException(400, "Invalid JSON")
+    
+    messages = clean_messages(body.get("messages", []))
+    model = body.get("model", "gpt-4.1")
+    use_tools = body.get("use_tools", True)
+    caller, lane = _caller(request, body), body.get("priority", "interactive")
+    
+    try:
+        run = runs.submit(lambda: _open_run(body, messages, model, use_tools, caller, lane), model, body.get("run_id"))
+    except asyncio.QueueFull:
+        raise HTTPException(503, "Too many queued runs", headers={"Retry-After": "5"})
+    except ValueError as e:
+        raise HTTPException(409, str(e))
+    
+    logger.info(f"📥 Run {run.id} queued: {model} | tools={use_tools}")
+    return {"id": run.id, "object": "agent.run", "status": run.status,
+            "events_url": f"/v1/runs/{run.id}/events", "result_url": f"/v1/runs/{run.id}"}
+
+
+@router.get("/v1/runs/{run_id}")
+async def get_run(run_id: str, wait: float = 0):
+    """Run status and final result (?wait=N long-polls up to N seconds for completion)"""
+    run = runs.get(run_id)
+    if not run:
+        result = await runs.shared_result(run_id, min(wait, 60))
+        if not result:
+            raise HTTPException(404, f"Unknown run {run_id}")
+        return result
+    if wait > 0 and not run.done:
+        await run.wait(min(wait, 60))
+    return run.result()
+
+
+@router.get("/v1/runs/{run_id}/events")
+async def run_events(run_id: str, request: Request, after: int = 0):
+    """SSE event log of a run, replayed from the start or after Last-Event-ID"""
+    run = runs.get(run_id)
+    if not run:
+        raise HTTPException(404, f"Unknown run {run_id}")
+    last_event_id = request.headers.get("last-event-id", "")
+    after = int(last_event_id) if last_event_id.isdigit() else after
+    return StreamingResponse(stream_run_events(run, after), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "Connection": "keep-alive"})
+
+
+@router.delete("/v1/runs/{run_id}")
+async def cancel_run(run_id: str):
+    """Abort a run: stops upstream streaming and pending tool executions (202: owned by another worker)"""
+    status = runs.cancel(run_id)
+    if not status:
+        raise HTTPException(404, f"No active run {run_id}")
+    if status == "forwarded":
+        return JSONResponse({"status": "cancelling", "run_id": run_id}, status_code=202)
+    return {"status": "cancelled", "run_id": run_id}
+
+
 @router.get("/v1/models")
 async def list_models():
     return {"object": "list", "data": [{"id": m["id"], "object": "model", "owned_by": "github-copilot", "cost": m["cost"]} for m in MODELS]}
@@ -41,6 +136,14 @@ async def list_tools():
     return {"tools": tools, "count": len(tools)}
 
 
+@router.post("/v1/tools/refresh")
+async def refresh_tools():
+    """Refresh Zapier tools on MCP server and invalidate the local catalog"""
+    data = await refresh_zapier()
+    tools = await get_mcp_tools()
+    return {"status": "refreshed" if data else "mcp_unavailable", "count": len(tools)}
+
+
 @router.post("/v1/chat/completions")
 async def chat_completions(request: Request):
     """Chat completions with agentic tool handling"""
@@ -50,7 +153,6 @@ async def chat_completions(request: Request):
         raise HTTPException(400, "Invalid JSON")
     
     messages = clean_messages(body.get("messages", []))
-    token = await get_token()
     model = body.get("model", "gpt-4.1")
     use_tools = body.get("use_tools", True)
     stream = body.get("stream", False)
@@ -58,18 +160,109 @@ async def chat_completions(request: Request):
     
     logger.info(f"📩 Chat: {model} | tools={use_tools} | stream={stream} | ctx={bool(user_context)}")
     
-    mcp_tools, handlers = (await get_mcp_tools(), await get_tool_handlers()) if use_tools else ([], {})
+    # Tool-free completions may be answered from the response cache (opt-in)
+    cache_lookup, cache_ttl, key = False, 0, None
+    if not use_tools:
+        cache_lookup, cache_ttl = response_cache.cache_policy(request.headers.get("cache-control") or body.get("cache_control"))
+        key = response_cache.cache_key(model, messages, body)
+    cached = response_cache.get(key) if cache_lookup else None
+    if cached is not None:
+        logger.info("💾 Response cache hit")
+        return await _respond(response_cache.replay(cached), model, stream, {"X-Cache": "HIT"})
+    headers = {"X-Cache": "MISS"} if cache_lookup or cache_ttl else {}
+    
+    # Admission control (followers of a coalesced run don't need a slot)
+    admitted = not (key and COALESCE_REQUESTS and coalesce.in_flight(key))
+    try:
+        gen = await _open_run(body, messages, model, use_tools, _caller(request, body),
+                              body.get("priority", "interactive"), admitted)
+    except scheduler.Overloaded as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": str(e.retry_after)})
+    if cache_ttl:
+        gen = response_cache.record(gen, key, cache_ttl)
     
-    gen = run_agentic_loop(messages, token, mcp_tools, handlers, use_tools, model, user_context)
+    # Identical tool-free requests in flight share one upstream run
+    if key and COALESCE_REQUESTS:
+        gen, joined = coalesce.join(key, gen)
+        if joined:
+            headers["X-Coalesced"] = "1"
+            if admitted:
+                # Another request became leader during our setup: our run is dropped unstarted
+                scheduler.release(model)
     
+    # Cancellable by DELETE /v1/runs/{id} and by the client disconnecting
+    run = runs.start(gen, body.get("run_id") or request.headers.get("x-run-id"))
+    headers["X-Run-Id"] = run.id
+    return await _respond(run.events(), model, stream, headers, request, run)
+
+
+@router.websocket("/v1/ws")
+async def chat_websocket(websocket: WebSocket, encoding: str = "json"):
+    """Chat over one WebSocket: concurrent runs multiplexed by id, in-band cancel (see src/ws.py)"""
+    await websocket.accept()
+    
+    async def open_run(body: dict):
+        model = body.get("model", "gpt-4.1")
+        return await _open_run(body, clean_messages(body.get("messages", [])), model, body.get("use_tools", True),
+                               _caller(websocket, body), body.get("priority", "interactive"))
+    
+    await ws.Session(websocket, ws.encoding_for(encoding), open_run).serve()
+
+
+async def _open_run(body: dict, messages: list, model: str, use_tools: bool, caller: str, lane: str, admitted: bool = True):
+    """Wait for an upstream slot (may raise scheduler.Overloaded), then build the agentic event generator"""
+    timing.begin()
+    if admitted:
+        with timing.phase("queue"):
+            await scheduler.acquire(model, caller, lane)
+    try:
+        with timing.phase("token"):
+            token = await get_token()
+        with timing.phase("catalog"):
+            mcp_tools, handlers = await get_tool_catalog() if use_tools else ([], {})
+    except BaseException:
+        # Including cancellation (client gone during setup)
+        if admitted:
+            scheduler.release(model)
+        raise
+    
+    user_context = body.get("user_context", {})
+    conversation_id = body.get("conversation_id") or (user_context or {}).get("telegram_chat_id")
+    cascade = body.get("cascade", CASCADE_ROUTING)
+    fast_path = body.get("fast_path", FAST_PATH)
+    gen = run_agentic_loop(messages, token, mcp_tools, handlers, use_tools, model, user_context, conversation_id,
+                           cascade, fast_path)
+    return scheduler.hold(gen, model) if admitted else gen
+
+
+def _caller(request: Request, body: dict) -> str:
+    """Fair-queuing identity: explicit caller, Telegram chat, else client address"""
+    if body.get("caller"):
+        return str(body["caller"])
+    chat_id = (body.get("user_context") or {}).get("telegram_chat_id")
+    if chat_id:
+        return f"telegram:{chat_id}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+async def _respond(gen, model: str, stream: bool, headers: dict, request: Request = None, run: runs.Run = None):
+    """Agentic events as an SSE stream or a single chat.completion JSON"""
     if stream:
         return StreamingResponse(stream_agentic_events(gen), media_type="text/event-stream", 
-                                 headers={"Cache-Control": "no-cache", "Connection": "keep-alive"})
+                                 headers={"Cache-Control": "no-cache", "Connection": "keep-alive", **headers})
     
-    # Non-streaming
-    events = [e async for e in gen]
+    # Non-streaming (a StreamingResponse notices disconnects by itself, this needs a watcher)
+    watcher = asyncio.create_task(runs.watch_disconnect(request, run)) if run else None
+    try:
+        events = [e async for e in gen]
+    finally:
+        if watcher:
+            watcher.cancel()
+    trace = next((e for e in events if e.get("type") == "timing"), None)
+    if trace:
+        headers["Server-Timing"] = timing.server_timing(trace)
     return JSONResponse({
         "id": "agentic", "object": "chat.completion", "model": model,
         "choices": [{"index": 0, "message": {"role": "assistant", "content": "\n\n".join(e["content"] for e in events if e.get("type") == "message")}, "finish_reason": "stop"}],
         "events": events
-    })
+    }, headers=headers)
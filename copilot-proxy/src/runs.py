@@ -0,0 +1,368 @@
+"""
+Agentic runs - cancellable by id or by client disconnect.
+
+Two kinds:
+    - Run: attached to one HTTP response (/v1/chat/completions)
+    - BackgroundRun: submitted with POST /v1/runs, executed by the worker pool,
+      events kept in a bounded replay log so clients can (re)attach at any time
+
+With several uvicorn workers, a run lives in the worker that accepted it:
+its status/result is also published to shared state (any worker answers
+GET /v1/runs/{id}), but its event stream is local. A DELETE received by
+another worker leaves a cancel flag in shared state, which the owning
+worker picks up within RUN_CANCEL_POLL.
+"""
+import os
+import json
+import uuid
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Optional
+from src.config import (
+    RUN_WORKERS, RUN_QUEUE_MAX, RUN_BUFFER_EVENTS, RUN_TTL, RUN_STORE_MAX_BYTES, RUN_CANCEL_POLL, WORKERS,
+)
+from src import shared_state, tracing
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+CANCEL_FLAG_TTL = 30  # Seconds a cross-worker cancel request waits for its owner
+
+# run_id -> Run (removed once its consumer finishes)
+_runs = {}
+
+# run_id -> BackgroundRun (kept after completion until expired)
+_background = OrderedDict()
+_pool = {"queue": None, "workers": [], "cancels": None}
+
+
+class Run:
+    """
+    Drives one agentic run in its own task.
+
+    The consumer reads events from a queue; cancelling the task raises
+    CancelledError inside the loop, which unwinds the upstream stream, any
+    pending MCP request and speculative tool executions.
+    """
+
+    def __init__(self, run_id: str, gen):
+        self.id = run_id
+        self.started = time.time()
+        self.cancelled = False
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._pump(gen))
+        if WORKERS > 1:
+            shared_state.put(f"owner:{run_id}", os.getpid(), RUN_TTL)  # DELETE may land on another worker
+
+    async def _pump(self, gen):
+        try:
+            async for event in gen:
+                self._queue.put_nowait(event)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"❌ Run {self.id} failed: {e}")
+            self._queue.put_nowait({"type": "error", "status": str(e)})
+        finally:
+            self._queue.put_nowait(_END)
+
+    async def events(self):
+        """Events of the run; leaving early (client disconnect) cancels it"""
+        try:
+            while True:
+                event = await self._queue.get()
+                if event is _END:
+                    break
+                yield event
+            if self.cancelled:
+                yield {"type": "cancelled", "run_id": self.id}
+        finally:
+            self.cancel("client gone")
+            if _runs.get(self.id) is self:
+                del _runs[self.id]
+                if WORKERS > 1:
+                    shared_state.delete(f"owner:{self.id}")
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        if self._task.done():
+            return False
+        logger.info(f"🛑 Cancelling run {self.id} ({reason})")
+        self.cancelled = True
+        self._task.cancel()
+        return True
+
+
+class BackgroundRun:
+    """
+    A run detached from any connection.
+
+    factory is a coroutine function returning the agentic event generator; it
+    is only called once a worker picks the run up. Events get sequence ids
+    (SSE id:) so a reader can resume after the last one it saw.
+    """
+
+    def __init__(self, run_id: str, factory, model: str):
+        self.id = run_id
+        self.model = model
+        self.status = "queued"  # queued | running | completed | failed | cancelled
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.seq = 0
+        self.size = 0
+        self.messages = []
+        self.error = None
+        self.timing = None
+        self.trace = tracing.current()  # Submitting request's span: the run continues its trace
+        self._log = deque()  # (seq, event, size)
+        self._factory = factory
+        self._task = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.finished is not None
+
+    async def execute(self):
+        """Run to completion (called by a worker)"""
+        self.status, self.started = "running", time.time()
+        self.publish()
+        try:
+            with tracing.span("background run", self.trace, **{"run.id": self.id}):
+                await self._consume()
+            self.status = "failed" if self.error else "completed"
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+        except Exception as e:
+            logger.error(f"❌ Run {self.id} failed: {e}")
+            self.status, self.error = "failed", str(e)
+        await self._finish()
+
+    async def _consume(self):
+        gen = await self._factory()
+        async for event in gen:
+            if event.get("type") == "message":
+                self.messages.append(event["content"])
+            elif event.get("type") == "error":
+                self.error = str(event.get("status"))
+            elif event.get("type") == "timing":
+                self.timing = event
+            await self._append(event)
+
+    async def _finish(self):
+        self.finished = time.time()
+        await self._append({"type": "run_complete", "status": self.status, "run_id": self.id})
+        self.publish()
+
+    def publish(self):
+        """Make status/result visible to the other workers"""
+        if WORKERS > 1:
+            shared_state.put(f"run:{self.id}", self.result(), RUN_TTL)
+
+    async def _append(self, event: dict):
+        size = len(json.dumps(event))
+        async with self._changed:
+            self.seq += 1
+            self._log.append((self.seq, event, size))
+            self.size += size
+            while len(self._log) > RUN_BUFFER_EVENTS:
+                self.size -= self._log.popleft()[2]
+            self._changed.notify_all()
+
+    async def subscribe(self, after: int = 0):
+        """(seq, event) pairs after seq `after`, live until the run finishes"""
+        cursor = after
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.seq > cursor or self.done)
+                batch = [(seq, event) for seq, event, _ in self._log if seq > cursor]
+                finished = self.done
+            if batch and batch[0][0] > cursor + 1:
+                # Fell out of the replay buffer
+                yield None, {"type": "gap", "missed": batch[0][0] - cursor - 1}
+            for seq, event in batch:
+                yield seq, event
+                cursor = seq
+            if finished and cursor >= self.seq:
+                return
+
+    async def wait(self, timeout: float):
+        async with self._changed:
+            try:
+                await asyncio.wait_for(self._changed.wait_for(lambda: self.done), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        if self.done:
+            return False
+        logger.info(f"🛑 Cancelling run {self.id} ({reason})")
+        if self._task:
+            self._task.cancel()
+        else:
+            # Still queued: the worker will skip it
+            self.status = "cancelled"
+            asyncio.create_task(self._finish())
+        return True
+
+    def result(self) -> dict:
+        return {
+            "id": self.id, "object": "agent.run", "status": self.status, "model": self.model,
+            "created": self.created, "started": self.started, "finished": self.finished,
+            "content": "\n\n".join(self.messages), "error": self.error, "events": self.seq, "timing": self.timing,
+        }
+
+
+def start(gen, run_id: Optional[str] = None) -> Run:
+    """Register and start a run (caller-chosen id, else a random one)"""
+    run_id = run_id or uuid.uuid4().hex
+    previous = _runs.get(run_id)
+    if previous:
+        previous.cancel("replaced")
+    run = _runs[run_id] = Run(run_id, gen)
+    return run
+
+
+def submit(factory, model: str, run_id: Optional[str] = None) -> BackgroundRun:
+    """Queue a background run; raises asyncio.QueueFull when the backlog is full"""
+    _expire()
+    run_id = run_id or uuid.uuid4().hex
+    if run_id in _background and not _background[run_id].done:
+        raise ValueError(f"Run {run_id} already in progress")
+    run = BackgroundRun(run_id, factory, model)
+    _pending().put_nowait(run)
+    _background.pop(run_id, None)
+    _background[run_id] = run
+    run.publish()  # Queued runs can be cancelled from any worker too
+    return run
+
+
+def get(run_id: str) -> Optional[BackgroundRun]:
+    _expire()
+    return _background.get(run_id)
+
+
+async def shared_result(run_id: str, wait: float = 0) -> Optional[dict]:
+    """Result of a run owned by another worker (polled while waiting for it to finish)"""
+    if WORKERS == 1:
+        return None
+    deadline = time.time() + wait
+    result = shared_state.get(f"run:{run_id}")
+    while result and not result["finished"] and time.time() < deadline:
+        await asyncio.sleep(0.5)
+        result = shared_state.get(f"run:{run_id}")
+    return result
+
+
+def cancel(run_id: str) -> Optional[str]:
+    """
+    Cancel an active run: "cancelled" here, "forwarded" when another worker
+    owns it (it stops within RUN_CANCEL_POLL), None if unknown or finished.
+    """
+    run = _runs.get(run_id) or _background.get(run_id)
+    if run:
+        return "cancelled" if run.cancel("DELETE") else None
+    if WORKERS > 1 and _owned_elsewhere(run_id):
+        shared_state.put(f"cancel:{run_id}", True, CANCEL_FLAG_TTL)
+        return "forwarded"
+    return None
+
+
+def _owned_elsewhere(run_id: str) -> bool:
+    if shared_state.get(f"owner:{run_id}"):
+        return True
+    result = shared_state.get(f"run:{run_id}")
+    return bool(result and not result["finished"])
+
+
+async def _watch_cancels():
+    """Cancel this worker's runs flagged by a DELETE that another worker received"""
+    while True:
+        await asyncio.sleep(RUN_CANCEL_POLL)
+        local = list(_runs.values()) + [run for run in _background.values() if not run.done]
+        try:
+            flagged = [run for run in local if shared_state.get(f"cancel:{run.id}")]
+            for run in flagged:
+                shared_state.delete(f"cancel:{run.id}")
+                run.cancel("DELETE on another worker")
+        except Exception as e:
+            logger.warning(f"⚠️ Cancel flags unreadable: {e}")
+
+
+async def watch_disconnect(request, run: Run, interval: float = 1.0):
+    """Cancel run once the client disconnects (for responses that aren't streamed)"""
+    while not await request.is_disconnected():
+        await asyncio.sleep(interval)
+    run.cancel("client disconnected")
+
+
+def active() -> list:
+    now = time.time()
+    attached = [{"id": r.id, "age": round(now - r.started, 1)} for r in _runs.values()]
+    background = [{"id": r.id, "age": round(now - r.created, 1), "status": r.status}
+                  for r in _background.values() if not r.done]
+    return attached + background
+
+
+def _pending() -> asyncio.Queue:
+    # Created lazily so it binds to the running loop
+    if _pool["queue"] is None:
+        _pool["queue"] = asyncio.Queue(maxsize=RUN_QUEUE_MAX)
+    return _pool["queue"]
+
+
+async def _worker(n: int):
+    queue = _pending()
+    while True:
+        run = await queue.get()
+        if run.done:
+            continue
+        run._task = asyncio.create_task(run.execute())
+        await asyncio.wait([run._task])
+
+
+def start_workers():
+    """Start the background run worker pool"""
+    _pool["workers"] = [asyncio.create_task(_worker(n)) for n in range(RUN_WORKERS)]
+    if WORKERS > 1:
+        _pool["cancels"] = asyncio.create_task(_watch_cancels())
+    logger.info(f"👷 {RUN_WORKERS} run workers started")
+
+
+async def stop_workers():
+    """Cancel workers and whatever they are running"""
+    for run in _background.values():
+        run.cancel("shutdown")
+    tasks = _pool["workers"] + ([_pool["cancels"]] if _pool["cancels"] else [])
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _pool["workers"], _pool["cancels"] = [], None
+
+
+def _expire():
+    """Drop finished runs past RUN_TTL, then the oldest finished ones over RUN_STORE_MAX_BYTES"""
+    now = time.time()
+    for run_id, run in list(_background.items()):
+        if run.done and now - run.finished > RUN_TTL:
+            del _background[run_id]
+
+    total = sum(run.size for run in _background.values())
+    for run_id, run in list(_background.items()):
+        if total <= RUN_STORE_MAX_BYTES:
+            break
+        if run.done:
+            total -= run.size
+            del _background[run_id]
+
+
+def stats() -> dict:
+    runs = list(_background.values())
+    return {
+        "attached": len(_runs), "workers": len(_pool["workers"]),
+        "queued": sum(r.status == "queued" for r in runs), "running": sum(r.status == "running" for r in runs),
+        "finished": sum(r.done for r in runs), "bytes": sum(r.size for r in runs),
+    }
@@ -0,0 +1,255 @@
+"""Admission control in front of the Copilot upstream - per-model limits, fair queuing, priority lanes"""
+import math
+import time
+import heapq
+import asyncio
+import logging
+from itertools import count
+from typing import Optional
+from contextvars import ContextVar
+from src.config import MODEL_CONCURRENCY, CALLER_WEIGHTS, QUEUE_DEADLINES, LANES, WORKERS
+from src import shared_state
+
+logger = logging.getLogger(__name__)
+
+SHARE_INTERVAL = 1.0  # Seconds between shared-state reads/writes of a model's limit (per worker)
+
+# Model whose queue admitted the run executing in this context (see hold())
+_admitted = ContextVar("admitted_model", default=None)
+
+
+class Overloaded(Exception):
+    """Request shed: queued longer than its lane's deadline"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Upstream queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class ModelQueue:
+    """Slots + waiters for one model"""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.max_limit = MODEL_CONCURRENCY.get(model, MODEL_CONCURRENCY["default"])
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.lanes = {lane: [] for lane in LANES}  # lane -> heap of (tag, seq, future)
+        self.vtime = 0.0  # Virtual time of the last dispatched request
+        self.last_tag = {}  # caller -> last virtual finish tag (only tags ahead of vtime matter)
+        self._prune_at = 64
+        self.admitted = 0
+        self.shed = 0
+        self._seq = count()
+        self._wakeup = None
+        self._synced = 0.0
+        self._published = 0.0
+        self._successes = 0  # Not yet applied to the shared limit
+
+    def slots(self) -> int:
+        """
+        This worker's share of the model's limit. The remainder goes to the
+        lowest worker indexes, so the shares never add up to more than the
+        limit (a worker may get none while the limit is below WORKERS).
+        """
+        if WORKERS == 1:
+            return max(1, int(self.limit))
+        share, extra = divmod(int(self.limit), WORKERS)
+        return share + (1 if shared_state.worker_index(WORKERS) < extra else 0)
+
+    def _grown(self, limit: float, successes: int) -> float:
+        """Additive increase: +1/limit per successful response"""
+        for _ in range(successes):
+            if limit >= self.max_limit:
+                break
+            limit += 1.0 / limit
+        return min(float(self.max_limit), limit)
+
+    def sync(self, force: bool = False):
+        """Adopt the limit/pause other workers learned from upstream (at most once per SHARE_INTERVAL)"""
+        if WORKERS == 1 or (not force and time.time() - self._synced < SHARE_INTERVAL):
+            return
+        self._synced = time.time()
+        shared = shared_state.get(f"ratelimit:{self.model}")
+        if shared:
+            self.limit = self._grown(min(float(self.max_limit), max(1.0, shared["limit"])), self._successes)
+            self.paused_until = max(self.paused_until, shared["paused_until"])
+
+    def publish(self):
+        if WORKERS > 1:
+            shared_state.put(f"ratelimit:{self.model}", {"limit": self.limit, "paused_until": self.paused_until})
+            self._published = time.time()
+            self._successes = 0
+
+    def grow(self):
+        """Success: grow the local limit now, fold the successes into the shared one in batches"""
+        self.limit = self._grown(self.limit, 1)
+        if WORKERS == 1:
+            return
+        self._successes += 1
+        if time.time() - self._published >= SHARE_INTERVAL:
+            self.sync(force=True)  # Don't overwrite another worker's back-off with a stale limit
+            self.publish()
+
+    def queued(self, lane: str = None) -> int:
+        lanes = [lane] if lane else LANES
+        return sum(1 for ln in lanes for _, _, fut in self.lanes[ln] if not fut.done())
+
+    def _can_dispatch(self) -> bool:
+        return self.in_flight < self.slots() and time.time() >= self.paused_until
+
+    def enqueue(self, caller: str, lane: str) -> asyncio.Future:
+        """Weighted fair queuing: tag = max(vtime, caller's last tag) + 1/weight"""
+        weight = CALLER_WEIGHTS.get(caller.split(":")[0], 1.0)
+        tag = max(self.vtime, self.last_tag.get(caller, 0.0)) + 1.0 / weight
+        self.last_tag[caller] = tag
+        if len(self.last_tag) >= self._prune_at:
+            # A tag at or behind vtime is the same as no tag: forget those callers
+            self.last_tag = {c: t for c, t in self.last_tag.items() if t > self.vtime}
+            self._prune_at = max(64, 2 * len(self.last_tag))
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.lanes[lane], (tag, next(self._seq), fut))
+        return fut
+
+    def dispatch(self):
+        """Hand free slots to waiters, highest lane first, lowest tag within a lane"""
+        while self._can_dispatch():
+            waiter = self._next_waiter()
+            if waiter is None:
+                break
+            tag, fut = waiter
+            self.vtime = tag
+            self.in_flight += 1
+            self.admitted += 1
+            fut.set_result(True)
+
+        if not self.queued() or self._wakeup is not None:
+            return
+        if time.time() < self.paused_until:
+            # Paused by Retry-After: try again when the pause ends
+            delay = self.paused_until - time.time()
+        elif self.slots() == 0:
+            # The limit is held by other workers: check again once it may have grown
+            delay = SHARE_INTERVAL
+        else:
+            return
+        self._wakeup = asyncio.get_running_loop().call_later(delay, self._resume)
+
+    def _resume(self):
+        self._wakeup = None
+        self.sync()
+        self.dispatch()
+
+    def _next_waiter(self):
+        for lane in LANES:
+            heap = self.lanes[lane]
+            while heap:
+                tag, _, fut = heapq.heappop(heap)
+                if not fut.done():
+                    return tag, fut
+        return None
+
+    def retry_after(self) -> int:
+        """Hint for shed callers: remaining pause, else time for the queue to drain one round"""
+        pause = self.paused_until - time.time()
+        if pause > 0:
+            return math.ceil(pause)
+        return max(1, math.ceil(self.queued() / max(1, self.slots())))
+
+    def stats(self) -> dict:
+        return {
+            "limit": round(self.limit, 2), "max_limit": self.max_limit, "slots": self.slots(), "in_flight": self.in_flight,
+            "queued": {lane: self.queued(lane) for lane in LANES},
+            "paused_for": max(0.0, round(self.paused_until - time.time(), 1)),
+            "admitted": self.admitted, "shed": self.shed,
+        }
+
+
+_queues = {}
+
+
+def _queue(model: str) -> ModelQueue:
+    if model not in _queues:
+        _queues[model] = ModelQueue(model)
+    return _queues[model]
+
+
+async def acquire(model: str, caller: str, lane: str = "interactive"):
+    """Wait for an upstream slot; raises Overloaded past the lane's queue deadline"""
+    lane = lane if lane in LANES else LANES[-1]
+    q = _queue(model)
+    q.sync()
+
+    if q._can_dispatch() and not q.queued():
+        q.in_flight += 1
+        q.admitted += 1
+        return
+
+    fut = q.enqueue(caller, lane)
+    q.dispatch()
+    try:
+        await asyncio.wait_for(fut, timeout=QUEUE_DEADLINES[lane])
+    except BaseException as e:
+        if fut.done() and not fut.cancelled():
+            release(model)  # Granted as the wait ended (timeout, or the caller cancelled)
+        if not isinstance(e, asyncio.TimeoutError):
+            raise
+        q.shed += 1
+        retry_after = q.retry_after()
+        logger.warning(f"🚦 Shed {lane} request from {caller} on {model} (retry after {retry_after}s)")
+        raise Overloaded(retry_after)
+
+
+def release(model: str):
+    """Return a slot"""
+    q = _queue(model)
+    q.in_flight = max(0, q.in_flight - 1)
+    q.dispatch()
+
+
+def observe(model: str, status: int, retry_after: Optional[str] = None):
+    """
+    Adapt the model's limit to upstream responses (AIMD):
+    halve on 429/5xx and honour Retry-After, grow by 1/limit on success.
+    The limit is per model across all workers; each worker takes its share.
+    Back-offs are shared at once, growth at most once per SHARE_INTERVAL.
+    Inside a run, the queue that admitted it adapts (a cascaded run's draft
+    turns go to TOOL_CALL_MODEL but hold a slot of the chosen model).
+    """
+    q = _queue(_admitted.get() or model)
+    if status == 429 or status >= 500:
+        q.sync(force=True)
+        q.limit = max(1.0, q.limit / 2)
+        pause = _parse_retry_after(retry_after)
+        if pause:
+            q.paused_until = max(q.paused_until, time.time() + pause)
+        q.publish()
+        logger.warning(f"🚦 Upstream {status} on {model}: {q.model} limit → {q.limit:.1f}" + (f", paused {pause}s" if pause else ""))
+    elif status == 200 and (q.limit < q.max_limit or q._successes):
+        q.grow()
+        q.dispatch()
+
+
+def _parse_retry_after(value: Optional[str]) -> float:
+    try:
+        return min(float(value), 300.0) if value else 0.0
+    except ValueError:
+        return 0.0
+
+
+async def hold(gen, model: str):
+    """Keep the run's slot until its events are exhausted (or the run is dropped)"""
+    # Set in the task consuming the run: its upstream responses feed this model's queue
+    _admitted.set(model)
+    try:
+        async for event in gen:
+            yield event
+    finally:
+        _admitted.set(None)  # The consuming task may go on with another run
+        release(model)
+
+
+def stats() -> dict:
+    """Queue depth, in-flight and limits per model"""
+    return {model: q.stats() for model, q in _queues.items()}
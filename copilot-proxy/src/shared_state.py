@@ -0,0 +1,144 @@
+"""
+Shared state backend - Copilot token, tool catalog and rate-limit state seen by every worker.
+
+SHARED_STATE selects the backend:
+    memory              single process (default with WORKERS=1)
+    sqlite:<path>       workers on one host share a SQLite file (WAL mode)
+
+Values are JSON-serializable; leases give cross-worker single-flight
+(one worker refreshes, the others adopt its result).
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+from src.config import SHARED_STATE
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """Process-local dict"""
+
+    def __init__(self):
+        self._data = {}  # key -> (value, expires; 0 = never)
+
+    def get(self, key: str):
+        entry = self._data.get(key)
+        if entry and (not entry[1] or entry[1] > time.time()):
+            return entry[0]
+        return None
+
+    def set(self, key: str, value, ttl: float = 0):
+        self._data[key] = (value, time.time() + ttl if ttl else 0)
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def lease(self, key: str, owner: str, ttl: float) -> bool:
+        holder = self.get(f"lease:{key}")
+        if holder not in (None, owner):
+            return False
+        self.set(f"lease:{key}", owner, ttl)
+        return True
+
+    def release(self, key: str, owner: str):
+        if self.get(f"lease:{key}") == owner:
+            self.delete(f"lease:{key}")
+
+
+class SQLiteBackend:
+    """
+    One SQLite file shared by the workers of a host.
+
+    Every operation is a single short statement (autocommit, WAL), fast
+    enough to run inline on the event loop.
+    """
+
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+
+    def get(self, key: str):
+        row = self._db.execute("SELECT value FROM kv WHERE key = ? AND (expires = 0 OR expires > ?)",
+                               (key, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value, ttl: float = 0):
+        self._db.execute("INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)",
+                         (key, json.dumps(value), time.time() + ttl if ttl else 0))
+
+    def delete(self, key: str):
+        self._db.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def lease(self, key: str, owner: str, ttl: float) -> bool:
+        """Take (or extend) the lease unless another owner holds an unexpired one"""
+        now = time.time()
+        cur = self._db.execute(
+            "INSERT INTO kv (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires = excluded.expires "
+            "WHERE kv.expires <= ? OR kv.value = excluded.value",
+            (f"lease:{key}", json.dumps(owner), now + ttl, now))
+        return cur.rowcount == 1
+
+    def release(self, key: str, owner: str):
+        self._db.execute("DELETE FROM kv WHERE key = ? AND value = ?", (f"lease:{key}", json.dumps(owner)))
+
+
+_backend = {"value": None}
+_worker = {"index": None, "checked": 0.0}
+
+
+def backend():
+    """The configured backend (created on first use, i.e. in each worker process)"""
+    if _backend["value"] is None:
+        kind, _, path = SHARED_STATE.partition(":")
+        if kind == "sqlite" and path:
+            _backend["value"] = SQLiteBackend(path)
+            logger.info(f"🗄️ Shared state: SQLite ({path})")
+        else:
+            if kind != "memory":
+                logger.warning(f"⚠️ Unknown SHARED_STATE {SHARED_STATE!r}, using memory")
+            _backend["value"] = MemoryBackend()
+    return _backend["value"]
+
+
+def get(key: str):
+    return backend().get(key)
+
+
+def put(key: str, value, ttl: float = 0):
+    backend().set(key, value, ttl)
+
+
+def delete(key: str):
+    backend().delete(key)
+
+
+def lease(key: str, ttl: float) -> bool:
+    """Cross-worker single-flight: True if this worker may do the work now"""
+    return backend().lease(key, str(os.getpid()), ttl)
+
+
+def release(key: str):
+    backend().release(key, str(os.getpid()))
+
+
+def worker_index(workers: int, ttl: float = 30.0) -> int:
+    """
+    This worker's index in [0, workers), held as a lease renewed every ttl/3.
+    `workers` while every index is taken (a replaced worker's lease not expired yet).
+    """
+    now = time.time()
+    if _worker["index"] is not None and now - _worker["checked"] < ttl / 3:
+        return _worker["index"]
+    _worker["checked"] = now
+    current = _worker["index"]
+    candidates = ([current] if current is not None and current < workers else []) + list(range(workers))
+    _worker["index"] = next((i for i in candidates if lease(f"worker:{i}", ttl)), workers)
+    if _worker["index"] != current:
+        logger.info(f"🗄️ Worker index {_worker['index']}/{workers}")
+    return _worker["index"]
@@ -1,33 +1,167 @@
-"""SSE Streaming utilities"""
-import json
+"""SSE Streaming utilities (bytes out, envelopes pre-encoded)"""
+import time
+import asyncio
+from src.config import SSE_FLUSH_MS, SSE_FLUSH_BYTES
+from src.fastjson import dumps
 
-def sse(event: dict) -> str:
-    """Format event as SSE"""
-    return f"data: {json.dumps(event)}\n\n"
+# Static parts of the OpenAI-compatible chunk around a content delta
+CONTENT_PREFIX = b'data: {"id":"agentic","object":"chat.completion.chunk","choices":[{"index":0,"delta":{"content":'
+CONTENT_SUFFIX = b'},"finish_reason":null}]}\n\n'
+DONE = (b'data: {"id":"agentic","object":"chat.completion.chunk","choices":[{"index":0,"delta":{},"finish_reason":"stop"}]}\n\n'
+        b'data: [DONE]\n\n')
 
+# Deltas are the bulk of the stream: only their content gets serialized
+DELTA_PREFIXES = {
+    "thinking_delta": b'data: {"type":"thinking_delta","content":',
+    "message_delta": b'data: {"type":"message_delta","content":',
+}
 
-def sse_content(content: str) -> str:
+
+def sse(event: dict, event_id: int = None) -> bytes:
+    """Format event as SSE (with an id: line when resumable)"""
+    if event_id is not None:
+        return b"id: %d\ndata: %s\n\n" % (event_id, dumps(event))
+    prefix = DELTA_PREFIXES.get(event.get("type"))
+    if prefix and len(event) == 2:
+        return prefix + dumps(event["content"]) + b"}\n\n"
+    return b"data: " + dumps(event) + b"\n\n"
+
+
+def sse_content(content: str) -> bytes:
     """Format content chunk as OpenAI-compatible SSE"""
-    return sse({"id": "agentic", "object": "chat.completion.chunk", 
-                "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}]})
+    return CONTENT_PREFIX + dumps(content) + CONTENT_SUFFIX
 
 
-def sse_done() -> str:
+def sse_done() -> bytes:
     """Format done signal"""
-    return sse({"id": "agentic", "object": "chat.completion.chunk", 
-                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}) + "data: [DONE]\n\n"
+    return DONE
 
 
+# Events buffered between the inner generator and the coalescer (backpressure beyond it)
+COALESCE_QUEUE_SIZE = 64
+
 # Events that pass through as-is
-PASSTHROUGH = {"model_info", "tool_call", "thinking", "thinking_delta", "history_update", "artifact", "artifact_edit"}
+PASSTHROUGH = {"model_info", "tool_call", "thinking", "thinking_delta", "history_update", "artifact", "artifact_edit", "error", "cancelled", "timing"}
+
+
+class _End:
+    """Inner generator finished (error: what it raised)"""
+
+    def __init__(self, error: Exception = None):
+        self.error = error
+
+
+_TICK = object()  # Slice deadline reached
+
+
+async def _pump(gen, queue: asyncio.Queue):
+    """Run the inner generator in one task (one context for the whole run), feeding the queue"""
+    try:
+        async for event in gen:
+            await queue.put(event)
+        await queue.put(_End())
+    except Exception as e:
+        await queue.put(_End(e))
+    finally:
+        if hasattr(gen, "aclose"):
+            await gen.aclose()
+
+
+def _tick(queue: asyncio.Queue):
+    try:
+        queue.put_nowait(_TICK)
+    except asyncio.QueueFull:
+        pass  # Events are waiting anyway: the slice is checked after each one
+
+
+async def coalesce_deltas(gen, interval_ms: int = SSE_FLUSH_MS, max_bytes: int = SSE_FLUSH_BYTES):
+    """
+    Merge consecutive deltas of one type into time-sliced events.
+
+    Pending text is flushed after interval_ms or max_bytes, and before any
+    other event so ordering is kept. The first delta of each type, and any
+    delta after a quiet interval, goes out immediately (TTFT is unchanged).
+    One pump task drives the inner generator; a timer marks slice deadlines.
+    """
+    if interval_ms <= 0:
+        try:
+            async for event in gen:
+                yield event
+        finally:
+            if hasattr(gen, "aclose"):
+                await gen.aclose()
+        return
+    
+    interval = interval_ms / 1000
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=COALESCE_QUEUE_SIZE)
+    pump = asyncio.create_task(_pump(gen, queue))
+    pending_type, parts, size = None, [], 0
+    seen, last_flush, tick_at = set(), 0.0, None
+    try:
+        while True:
+            item = await queue.get()
+            if isinstance(item, _End):
+                if item.error:
+                    raise item.error
+                break
+            
+            if item is not _TICK:
+                t = item.get("type")
+                if t not in DELTA_PREFIXES or len(item) != 2:
+                    if parts:
+                        yield {"type": pending_type, "content": "".join(parts)}
+                        pending_type, parts, size = None, [], 0
+                    yield item
+                    continue
+                
+                if parts and t != pending_type:
+                    yield {"type": pending_type, "content": "".join(parts)}
+                    pending_type, parts, size, last_flush = None, [], 0, time.monotonic()
+                
+                now = time.monotonic()
+                if not parts and (t not in seen or now - last_flush >= interval):
+                    seen.add(t)
+                    last_flush = now
+                    yield item
+                    continue
+                
+                pending_type = t
+                parts.append(item["content"])
+                size += len(item["content"])
+            
+            if not parts:
+                continue
+            now = time.monotonic()
+            if size >= max_bytes or now - last_flush >= interval:
+                yield {"type": pending_type, "content": "".join(parts)}
+                pending_type, parts, size, last_flush = None, [], 0, now
+            elif tick_at is None or tick_at <= loop.time():
+                # Flush at the end of the slice even if the upstream goes quiet
+                delay = last_flush + interval - now
+                tick_at = loop.time() + delay
+                loop.call_later(delay, _tick, queue)
+        
+        if parts:
+            yield {"type": pending_type, "content": "".join(parts)}
+    finally:
+        pump.cancel()
+        await asyncio.gather(pump, return_exceptions=True)
 
 
 async def stream_agentic_events(gen):
     """Convert agentic events to SSE stream"""
-    async for event in gen:
+    async for event in coalesce_deltas(gen):
         t = event.get("type")
         if t in PASSTHROUGH:
             yield sse(event)
         elif t in ("message_delta", "message"):
             yield sse_content(event["content"])
     yield sse_done()
+
+
+async def stream_run_events(run, after: int = 0):
+    """Raw agentic events of a background run; ids let clients resume with Last-Event-ID"""
+    async for seq, event in run.subscribe(after):
+        yield sse(event, seq)
+    yield b"data: [DONE]\n\n"
@@ -0,0 +1,165 @@
+"""
+Latency breakdown of an agentic run.
+
+A Trace is bound to the run's context (contextvar), so code deep in the call
+stack (MCP client, tool execution) records into it without threading it
+through every signature. The loop ends the run with a `timing` event; the
+same numbers feed the /metrics histograms.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from src.metrics import Histogram, Counter
+
+RUN_SECONDS = Histogram("copilot_proxy_run_seconds", "Agentic run duration")
+PHASE_SECONDS = Histogram("copilot_proxy_phase_seconds", "Run setup phases (queue, token, catalog, context)", "phase")
+TTFT_SECONDS = Histogram("copilot_proxy_ttft_seconds", "Upstream time to first token per iteration", "model")
+ITERATION_SECONDS = Histogram("copilot_proxy_iteration_seconds", "Agentic iteration duration (stream + tools)", "model")
+TOOL_SECONDS = Histogram("copilot_proxy_tool_seconds", "Tool execution time", "tool")
+MCP_SECONDS = Histogram("copilot_proxy_mcp_seconds", "MCP server request time", "path")
+ITERATIONS = Histogram("copilot_proxy_iterations", "Iterations per agentic run", buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15))
+ITERATIONS_SAVED = Counter("copilot_proxy_fast_path_iterations_saved_total",
+                           "Upstream round trips avoided by the fast path", "reason")
+
+_current = ContextVar("run_trace", default=None)
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+class Trace:
+    """Timings of one run: setup phases, iterations, tools, MCP calls"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}  # name -> seconds
+        self.iterations = []  # {"iteration", "model", "started", "ttft", "stream", "duration"}
+        self.tools = []  # (name, seconds)
+        self.mcp = []  # (path, seconds)
+        self.saved = {}  # fast path: reason -> iterations avoided
+        self._summary = None
+
+    def start_iteration(self, n: int, model: str):
+        self._end_iteration()
+        self.iterations.append({"iteration": n, "model": model, "started": time.perf_counter(),
+                                "ttft": None, "stream": None, "duration": None})
+
+    def first_token(self):
+        """Upstream produced its first content or tool chunk (only the first call counts)"""
+        it = self.iterations[-1] if self.iterations else None
+        if it and it["ttft"] is None:
+            it["ttft"] = time.perf_counter() - it["started"]
+
+    def stream_done(self):
+        if self.iterations:
+            self.iterations[-1]["stream"] = time.perf_counter() - self.iterations[-1]["started"]
+
+    def set_model(self, model: str):
+        """Failover mid-iteration"""
+        if self.iterations:
+            self.iterations[-1]["model"] = model
+
+    def save_iterations(self, reason: str, n: int):
+        """Fast path: n upstream round trips a one-tool-per-turn run would have made"""
+        if n > 0:
+            self.saved[reason] = self.saved.get(reason, 0) + n
+            ITERATIONS_SAVED.inc(n, reason)
+
+    def _end_iteration(self):
+        it = self.iterations[-1] if self.iterations else None
+        if it and it["duration"] is None:
+            it["duration"] = time.perf_counter() - it["started"]
+            ITERATION_SECONDS.observe(it["duration"], it["model"])
+            if it["ttft"] is not None:
+                TTFT_SECONDS.observe(it["ttft"], it["model"])
+
+    def finish(self) -> dict:
+        """Close the trace (once) and return the `timing` event"""
+        if self._summary is None:
+            self._end_iteration()
+            total = time.perf_counter() - self.started
+            RUN_SECONDS.observe(total)
+            ITERATIONS.observe(len(self.iterations))
+            self._summary = {
+                "type": "timing",
+                "total_ms": _ms(total),
+                "phases": {name: _ms(s) for name, s in self.phases.items()},
+                "iterations": [{"iteration": it["iteration"], "model": it["model"],
+                                "ttft_ms": _ms(it["ttft"]) if it["ttft"] is not None else None,
+                                "stream_ms": _ms(it["stream"]) if it["stream"] is not None else None,
+                                "duration_ms": _ms(it["duration"])} for it in self.iterations],
+                "tools": [{"name": name, "ms": _ms(s)} for name, s in self.tools],
+                "mcp": {"calls": len(self.mcp), "ms": _ms(sum(s for _, s in self.mcp))},
+            }
+            if self.saved:
+                self._summary["iterations_saved"] = dict(self.saved)
+        return self._summary
+
+
+def begin() -> Trace:
+    """Start a trace for the run executing in the current context"""
+    trace = Trace()
+    _current.set(trace)
+    return trace
+
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+
+def detach():
+    """Stop recording into the caller's trace (background work spawned from a run)"""
+    _current.set(None)
+
+
+@contextmanager
+def phase(name: str):
+    """Time a setup phase of the current run"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        PHASE_SECONDS.observe(elapsed, name)
+        trace = _current.get()
+        if trace:
+            trace.phases[name] = trace.phases.get(name, 0.0) + elapsed
+
+
+def tool(name: str, seconds: float):
+    TOOL_SECONDS.observe(seconds, name)
+    trace = _current.get()
+    if trace:
+        trace.tools.append((name, seconds))
+
+
+@contextmanager
+def mcp(path: str):
+    """Time an MCP server request"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        MCP_SECONDS.observe(elapsed, path)
+        trace = _current.get()
+        if trace:
+            trace.mcp.append((path, elapsed))
+
+
+def server_timing(event: dict) -> str:
+    """Server-Timing header value from a `timing` event"""
+    parts = [f"{name};dur={ms}" for name, ms in event["phases"].items()]
+    for it in event["iterations"]:
+        n = it["iteration"]
+        if it["ttft_ms"] is not None:
+            parts.append(f'ttft{n};dur={it["ttft_ms"]};desc="{it["model"]}"')
+        parts.append(f"iter{n};dur={it['duration_ms']}")
+    if event["tools"]:
+        parts.append(f"tools;dur={round(sum(t['ms'] for t in event['tools']), 1)}")
+    if event["mcp"]["calls"]:
+        parts.append(f"mcp;dur={event['mcp']['ms']}")
+    parts.append(f"total;dur={event['total_ms']}")
+    return ", ".join(parts)
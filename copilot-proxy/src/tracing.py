@@ -0,0 +1 @@
+../../shared/tracing.py
\ No newline at end of file
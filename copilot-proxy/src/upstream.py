@@ -0,0 +1,125 @@
+"""Shared upstream HTTP client - one pooled connection set for the Copilot API"""
+import asyncio
+import logging
+import httpx
+from src import tracing
+from src.config import (
+    COPILOT_API_URL, UPSTREAM_HTTP2, UPSTREAM_MAX_CONNECTIONS, UPSTREAM_MAX_KEEPALIVE,
+    UPSTREAM_KEEPALIVE_EXPIRY, UPSTREAM_TIMEOUT, UPSTREAM_PREWARM,
+)
+
+logger = logging.getLogger(__name__)
+
+# Application-scoped client (created in app lifespan), and the httpcore pool behind it
+_client = {"value": None, "pool": None}
+
+# Upstream requests between send and response close (httpcore does not expose its queue)
+_in_flight = {"now": 0, "peak": 0}
+
+
+class _CountedTransport(httpx.AsyncBaseTransport):
+    """Counts requests in flight, until their response is closed"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request):
+        _in_flight["now"] += 1
+        _in_flight["peak"] = max(_in_flight["peak"], _in_flight["now"])
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            _in_flight["now"] -= 1
+            raise
+        response.stream = _CountedStream(response.stream)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class _CountedStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream):
+        self._stream = stream
+        self._open = True
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        if self._open:
+            self._open = False
+            _in_flight["now"] -= 1
+        await self._stream.aclose()
+
+
+def _build_client() -> httpx.AsyncClient:
+    """Create the pooled client (falls back to HTTP/1.1 if h2 is missing)"""
+    limits = httpx.Limits(
+        max_connections=UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+        keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY,
+    )
+    try:
+        inner = httpx.AsyncHTTPTransport(http2=UPSTREAM_HTTP2, limits=limits)
+    except ImportError:
+        logger.warning("⚠️ h2 not installed, upstream client uses HTTP/1.1")
+        inner = httpx.AsyncHTTPTransport(limits=limits)
+    # httpx keeps the pool private; its connections and is_idle() are public httpcore API
+    _client["pool"] = getattr(inner, "_pool", None)
+    # Upstream calls are timed as spans, but our trace ids stay inside
+    transport = tracing.traced(inner, propagate=False)
+    return httpx.AsyncClient(timeout=UPSTREAM_TIMEOUT, transport=_CountedTransport(transport))
+
+
+def get_client() -> httpx.AsyncClient:
+    """Get the shared upstream client (created lazily outside the app lifespan)"""
+    if _client["value"] is None:
+        _client["value"] = _build_client()
+    return _client["value"]
+
+
+async def start_client():
+    """Create the shared client and pre-warm connections to the Copilot API"""
+    client = get_client()
+    if UPSTREAM_PREWARM > 0:
+        await asyncio.gather(*(_warm(client) for _ in range(UPSTREAM_PREWARM)))
+        logger.info(f"🔥 Upstream pool pre-warmed: {pool_stats()}")
+
+
+async def _warm(client: httpx.AsyncClient):
+    """Open one connection (TCP + TLS) - the response itself is irrelevant"""
+    try:
+        await client.head(COPILOT_API_URL, timeout=10.0)
+    except Exception as e:
+        logger.warning(f"⚠️ Pre-warm failed: {e}")
+
+
+async def close_client():
+    """Close the shared client"""
+    client = _client["value"]
+    _client["value"] = _client["pool"] = None
+    if client is not None:
+        await client.aclose()
+
+
+def pool_stats() -> dict:
+    """
+    Pool limits (config), upstream connections open / idle / in use, and
+    requests in flight (current and peak). With HTTP/2, several requests
+    share one connection. Requests queued for a connection are not exposed
+    by httpcore: compare requests_in_flight with max_connections (HTTP/1.1).
+    """
+    stats = {"http2": UPSTREAM_HTTP2, "max_connections": UPSTREAM_MAX_CONNECTIONS,
+             "max_keepalive": UPSTREAM_MAX_KEEPALIVE, "keepalive_expiry": UPSTREAM_KEEPALIVE_EXPIRY,
+             "connections": None, "idle": None, "in_use": None,
+             "requests_in_flight": _in_flight["now"], "requests_peak": _in_flight["peak"]}
+    pool = _client["pool"]
+    if pool is None or not hasattr(pool, "connections"):
+        return stats  # Another httpx/httpcore layout: connection counts unavailable
+    connections = list(pool.connections)
+    stats["connections"] = len(connections)
+    stats["idle"] = sum(1 for c in connections if c.is_idle())
+    stats["in_use"] = sum(1 for c in connections if not c.is_idle() and not c.is_closed())
+    return stats
@@ -0,0 +1,162 @@
+"""
+WebSocket chat sessions - one connection per client, many concurrent runs, compact frames.
+
+Client -> server (JSON text, or msgpack binary with ?encoding=msgpack):
+    {"op": "run", "id": "r1", "messages": [...], "model": ..., ...}   same fields as /v1/chat/completions
+    {"op": "cancel", "id": "r1"}
+    {"op": "ping"}
+
+Server -> client, arrays to keep per-event overhead small:
+    ["hello", {"encoding": "json"}]
+    ["start", "r1", run_id]            run_id also works with DELETE /v1/runs/{id}
+    ["d", "r1", "text"]                message_delta
+    ["t", "r1", "text"]                thinking_delta
+    ["e", "r1", {event}]               any other agentic event
+    ["err", "r1", "message", retry_after]
+    ["end", "r1", "completed" | "failed" | "cancelled" | "overloaded"]
+    ["pong"]
+"""
+import json
+import asyncio
+import logging
+from src import runs, scheduler
+
+try:
+    import msgpack
+except ImportError:  # JSON frames only
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Chatty event types get a one-letter frame
+DELTA_TAGS = {"message_delta": "d", "thinking_delta": "t"}
+
+
+def encoding_for(requested: str) -> str:
+    if requested == "msgpack" and msgpack is None:
+        logger.warning("⚠️ msgpack not installed, WebSocket falls back to JSON frames")
+        return "json"
+    return "msgpack" if requested == "msgpack" else "json"
+
+
+def encode(frame: list, encoding: str):
+    if encoding == "msgpack":
+        return msgpack.packb(frame, use_bin_type=True)
+    return json.dumps(frame, separators=(",", ":"), ensure_ascii=False)
+
+
+def decode(message: dict) -> dict:
+    """ASGI websocket.receive message -> frame dict (either encoding is accepted)"""
+    try:
+        if message.get("bytes") is not None:
+            if msgpack is None:
+                raise ValueError("binary frames need msgpack")
+            frame = msgpack.unpackb(message["bytes"], raw=False)
+        else:
+            frame = json.loads(message.get("text") or "")
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(str(e))
+    if not isinstance(frame, dict):
+        raise ValueError("frame must be an object")
+    return frame
+
+
+def event_frame(rid: str, event: dict) -> list:
+    tag = DELTA_TAGS.get(event.get("type"))
+    if tag:
+        return [tag, rid, event.get("content", "")]
+    return ["e", rid, event]
+
+
+class Session:
+    """
+    One WebSocket connection.
+
+    Runs are keyed by the client's id; a single writer task owns the socket so
+    frames from concurrent runs never interleave mid-send.
+    """
+
+    def __init__(self, websocket, encoding: str, open_run):
+        self.ws = websocket
+        self.encoding = encoding
+        self._open_run = open_run  # async (body) -> agentic event generator
+        self._outbox = asyncio.Queue()
+        self._runs = {}  # client id -> {"task", "run"}
+
+    def send(self, frame: list):
+        self._outbox.put_nowait(frame)
+
+    async def _write(self):
+        while True:
+            data = encode(await self._outbox.get(), self.encoding)
+            if isinstance(data, bytes):
+                await self.ws.send_bytes(data)
+            else:
+                await self.ws.send_text(data)
+
+    async def serve(self):
+        writer = asyncio.create_task(self._write())
+        self.send(["hello", {"encoding": self.encoding}])
+        try:
+            while True:
+                message = await self.ws.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                try:
+                    frame = decode(message)
+                except ValueError as e:
+                    self.send(["err", None, f"Bad frame: {e}"])
+                    continue
+                self._handle(frame)
+        finally:
+            # Connection gone: every run it started is abandoned
+            for entry in list(self._runs.values()):
+                entry["task"].cancel()
+            writer.cancel()
+
+    def _handle(self, frame: dict):
+        op, rid = frame.get("op"), frame.get("id")
+        if op == "run":
+            if rid is None or rid in self._runs:
+                self.send(["err", rid, "Run id missing or already in use"])
+                return
+            self._runs[rid] = {"task": asyncio.create_task(self._run(rid, frame)), "run": None}
+        elif op == "cancel":
+            entry = self._runs.get(rid)
+            if entry and entry["run"]:
+                entry["run"].cancel("WebSocket cancel")
+            elif entry:
+                entry["task"].cancel()
+        elif op == "ping":
+            self.send(["pong"])
+        else:
+            self.send(["err", rid, f"Unknown op {op!r}"])
+
+    async def _run(self, rid: str, body: dict):
+        status = "completed"
+        try:
+            gen = await self._open_run(body)
+            run = runs.start(gen)
+            self._runs[rid]["run"] = run
+            self.send(["start", rid, run.id])
+            async for event in run.events():
+                if event.get("type") == "error":
+                    status = "failed"
+                elif event.get("type") == "cancelled":
+                    status = "cancelled"
+                    continue
+                self.send(event_frame(rid, event))
+        except scheduler.Overloaded as e:
+            status = "overloaded"
+            self.send(["err", rid, str(e), e.retry_after])
+        except asyncio.CancelledError:
+            status = "cancelled"
+        except Exception as e:
+            logger.error(f"❌ WebSocket run {rid} failed: {e}")
+            status = "failed"
+            self.send(["err", rid, str(e)])
+        finally:
+            self._runs.pop(rid, None)
+            self.send(["end", rid, status])
@@ -0,0 +1,85 @@
+"""Request coalescing: followers replay the leader's events, the run outlives no one"""
+import asyncio
+import pytest
+from src import coalesce
+
+
+@pytest.fixture(autouse=True)
+def fresh_flights(monkeypatch):
+    monkeypatch.setattr(coalesce, "_inflight", {})
+    monkeypatch.setattr(coalesce, "_stats", {"leaders": 0, "followers": 0})
+
+
+async def run(events: list, delay: float = 0.01):
+    for event in events:
+        await asyncio.sleep(delay)
+        yield event
+
+
+async def collect(gen) -> list:
+    return [e async for e in gen]
+
+
+def test_followers_get_every_event_of_one_run():
+    events = [{"type": "message", "content": str(i)} for i in range(3)]
+    started = []
+
+    async def leader_run():
+        started.append("leader")
+        async for e in run(events):
+            yield e
+
+    async def follower_run():
+        started.append("follower")
+        yield {"type": "message", "content": "never"}
+
+    async def scenario():
+        leader, joined = coalesce.join("k", leader_run())
+        assert not joined
+        first = asyncio.create_task(collect(leader))
+        await asyncio.sleep(0.015)  # Joins mid-run: earlier events are replayed
+        follower, joined = coalesce.join("k", follower_run())
+        assert joined
+        return await asyncio.gather(first, collect(follower))
+
+    assert asyncio.run(scenario()) == [events, events]
+    assert started == ["leader"]
+    assert coalesce.stats() == {"leaders": 1, "followers": 1, "in_flight": 0}
+
+
+def test_finished_run_is_not_joined():
+    async def scenario():
+        gen, _ = coalesce.join("k", run([{"type": "message", "content": "a"}]))
+        await collect(gen)
+        assert not coalesce.in_flight("k")
+        _, joined = coalesce.join("k", run([]))
+        return joined
+
+    assert asyncio.run(scenario()) is False
+
+
+def test_run_is_cancelled_when_every_subscriber_leaves():
+    cancelled = []
+
+    async def endless():
+        try:
+            while True:
+                await asyncio.sleep(0.01)
+                yield {"type": "thinking"}
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def scenario():
+        gens = [coalesce.join("k", endless())[0] for _ in range(2)]
+        for gen in gens:
+            await gen.__anext__()
+        await gens[0].aclose()
+        await asyncio.sleep(0.03)
+        assert not cancelled  # One client is still reading
+        await gens[1].aclose()
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert cancelled == [True]
+    assert not coalesce.in_flight("k")
@@ -0,0 +1,62 @@
+"""History shaping: cap, elide consumed tool outputs by age, dedupe identical results"""
+import pytest
+from src.agentic import history
+from src.agentic.history import shape_history, cap, ELIDED_PREFIX, DUPLICATE_PREFIX
+
+POLICIES = {
+    "default": {"max_chars": 100, "keep_iterations": 2, "preview_chars": 10},
+    "search_web": {"keep_iterations": 1},
+    "recall": {"keep_iterations": 10},
+}
+
+
+@pytest.fixture(autouse=True)
+def policies(monkeypatch):
+    monkeypatch.setattr(history, "TOOL_OUTPUT_POLICIES", POLICIES)
+
+
+def turn(call_id: str, name: str, output: str) -> list:
+    """One assistant tool call and its result"""
+    call = {"id": call_id, "type": "function", "function": {"name": name, "arguments": "{}"}}
+    return [{"role": "assistant", "content": None, "tool_calls": [call]},
+            {"role": "tool", "tool_call_id": call_id, "content": output}]
+
+
+def test_cap_keeps_head_and_tail_within_max_chars():
+    capped = cap("a" * 500 + "b" * 500, 100)
+    assert len(capped) == 100
+    assert capped.startswith("a" * 30) and capped.endswith("b" * 30)
+    head, marker, tail = capped.split("\n")
+    assert marker == f"[… {1000 - len(head) - len(tail)} chars cut …]"
+    assert cap(capped, 100) == capped
+    assert cap("short", 20) == "short"
+
+
+def test_outputs_are_elided_after_keep_iterations():
+    messages = [{"role": "user", "content": "go"},
+                *turn("1", "search_web", "s" * 80), *turn("2", "fetch", "r" * 80), *turn("3", "fetch", "q" * 80)]
+    shape_history(messages)
+    outputs = [m["content"] for m in messages if m["role"] == "tool"]
+    # search_web keeps 1 iteration, fetch the default 2: only the newest two stay verbatim
+    assert outputs[0] == f"{ELIDED_PREFIX} search_web output already used (80 chars): {'s' * 10}"
+    assert outputs[1:] == ["r" * 80, "q" * 80]
+
+
+def test_recent_oversized_output_is_capped():
+    messages = turn("1", "recall", "x" * 500)
+    shape_history(messages)
+    assert len(messages[1]["content"]) == 100
+
+
+def test_identical_outputs_reference_the_first():
+    same = "same result " * 7
+    messages = [*turn("1", "recall", same), *turn("2", "recall", same), *turn("3", "recall", "tiny"), *turn("4", "recall", "tiny")]
+    shape_history(messages)
+    outputs = [m["content"] for m in messages if m["role"] == "tool"]
+    assert outputs == [same, f"{DUPLICATE_PREFIX} Same result as tool call 1", "tiny", "tiny"]
+
+
+def test_shaping_twice_changes_nothing():
+    messages = [*turn("1", "search_web", "s" * 300), *turn("2", "recall", "r" * 300), *turn("3", "recall", "r" * 300)]
+    once = [dict(m) for m in shape_history(messages)]
+    assert shape_history(messages) == once
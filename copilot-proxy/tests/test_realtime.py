@@ -0,0 +1,56 @@
+"""FieldStream: incremental decoding must match json.loads however the arguments are chunked"""
+import json
+import pytest
+from src.agentic.realtime import FieldStream
+
+ARGUMENTS = [
+    {"message": "plain text"},
+    {"message": 'quote " backslash \\ slash / tab \t newline \n'},
+    {"message": "accents é, CJK 漢字, emoji 😀🎉"},
+    {"thought": "ignored", "nested": {"message": "not me", "list": [1, "]", {"x": "}"}]}, "message": "last key"},
+    {"n": -1.5, "flag": True, "none": None, "message": "after scalars"},
+]
+
+
+def feed_in(field: str, raw: str, size: int) -> FieldStream:
+    stream = FieldStream(field)
+    text = "".join(stream.feed(raw[i:i + size]) for i in range(0, len(raw), size))
+    assert text == stream.text
+    return stream
+
+
+@pytest.mark.parametrize("args", ARGUMENTS)
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_decodes_like_json_loads(args, size):
+    for ensure_ascii in (True, False):  # \uXXXX escapes (surrogate pairs for emoji) or raw characters
+        raw = json.dumps(args, ensure_ascii=ensure_ascii)
+        stream = feed_in("message", raw, size)
+        assert stream.text == args["message"]
+        assert stream.done
+
+
+def test_escape_split_across_chunks_is_held_back():
+    stream = FieldStream("message")
+    assert stream.feed('{"message": "a\\') == "a"
+    assert not stream.in_value
+    assert stream.feed("n") == "\n"
+    assert stream.feed("\\ud83d") == ""  # High surrogate waits for its pair
+    assert not stream.in_value
+    assert stream.feed("\\ude00") == "😀"
+    assert stream.in_value
+
+
+def test_lone_surrogates_become_replacement_characters():
+    stream = feed_in("message", '{"message": "\\ud83dx\\ude00"}', 1)
+    assert stream.text == "�x�"
+
+
+def test_missing_field_ends_with_the_object():
+    stream = feed_in("message", json.dumps({"thought": "hmm", "other": [1, 2]}), 3)
+    assert stream.done and stream.text == "" and stream.value_start is None
+
+
+def test_value_start_is_the_raw_offset_of_the_content():
+    raw = '{"a": {"b": 1}, "message": "hello"}'
+    stream = feed_in("message", raw, 4)
+    assert raw[stream.value_start:].startswith('hello"')
@@ -0,0 +1,135 @@
+"""stream_resilient() against a scripted fake upstream: resume splicing, failover, cancellation"""
+import asyncio
+import pytest
+from src.agentic import resilient_stream
+
+
+class FakeUpstream:
+    """Stands in for stream_copilot(): each request plays the next script"""
+
+    def __init__(self, *scripts):
+        self.scripts = list(scripts)
+        self.requests = []  # (model, messages) per request
+
+    async def __call__(self, token, messages, body):
+        self.requests.append((body["model"], messages))
+        for item in self.scripts.pop(0):
+            if item == "hang":
+                await asyncio.sleep(3600)
+            yield item
+
+
+def tool(index, arguments, id=None, name=None):
+    return ("tool_chunk", {"index": index, "id": id, "name": name, "arguments": arguments})
+
+
+def run(upstream, model="gpt-4.1", stream_fields=None):
+    async def collect():
+        body = {"model": model, "messages": []}
+        return [c async for c in resilient_stream.stream_resilient("token", [], body, stream_fields)]
+    return asyncio.run(collect())
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(resilient_stream, "UPSTREAM_BACKOFF", 0)
+    monkeypatch.setattr(resilient_stream, "UPSTREAM_RETRIES", 1)
+
+
+def test_resumed_reply_continues_the_text(monkeypatch):
+    upstream = FakeUpstream(
+        [("content_chunk", "Hello wo"), ("error", 502)],
+        [("content_chunk", "rld"), ("done", None)],
+    )
+    monkeypatch.setattr(resilient_stream, "stream_copilot", upstream)
+
+    chunks = run(upstream)
+
+    assert chunks == [("content_chunk", "Hello wo"), ("content_chunk", "rld"), ("done", None)]
+    note = upstream.requests[1][1][-1]
+    assert note["role"] == "system" and "«Hello wo»" in note["content"]
+
+
+def test_cut_off_streamed_call_is_spliced_in_place(monkeypatch):
+    upstream = FakeUpstream(
+        [tool(0, '{"message": "Hel', id="a", name="send_message"), ("error", 500)],
+        [tool(0, '{"mess', id="b", name="send_message"), tool(0, 'age": "'), tool(0, 'lo"}'), ("done", None)],
+    )
+    monkeypatch.setattr(resilient_stream, "stream_copilot", upstream)
+
+    chunks = run(upstream, stream_fields={"send_message": "message"})
+
+    calls = [data for kind, data in chunks if kind == "tool_chunk"]
+    assert {c["index"] for c in calls} == {0}
+    assert "".join(c["arguments"] for c in calls) == '{"message": "Hello"}'
+    assert [c["id"] for c in calls if c["id"]] == ["a"]
+    assert chunks[-1] == ("done", None)
+
+
+def test_cut_off_call_is_reset_and_redone_after_complete_ones(monkeypatch):
+    upstream = FakeUpstream(
+        [tool(0, '{"thought": "ok"}', id="a", name="think"), tool(1, '{"q": "x', id="b", name="search"),
+         ("error", 503)],
+        [tool(0, '{"q": "xyz"}', id="c", name="search"), ("done", None)],
+    )
+    monkeypatch.setattr(resilient_stream, "stream_copilot", upstream)
+
+    chunks = run(upstream, stream_fields={"think": "thought"})
+
+    assert ("tool_reset", 1) in chunks
+    redone = chunks[chunks.index(("tool_reset", 1)) + 1]
+    assert redone == tool(1, '{"q": "xyz"}', id="c", name="search")
+    assert 'think({"thought": "ok"})' in upstream.requests[1][1][-1]["content"]
+
+
+def test_fails_over_once_retries_are_spent(monkeypatch):
+    upstream = FakeUpstream(
+        [("error", 503)],
+        [("error", 503)],
+        [("content_chunk", "hi"), ("done", None)],
+    )
+    monkeypatch.setattr(resilient_stream, "stream_copilot", upstream)
+
+    chunks = run(upstream, model="gpt-4.1")
+
+    assert chunks == [("failover", "gpt-4o"), ("content_chunk", "hi"), ("done", None)]
+    assert [model for model, _ in upstream.requests] == ["gpt-4.1", "gpt-4.1", "gpt-4o"]
+
+
+def test_final_4xx_is_not_retried(monkeypatch):
+    upstream = FakeUpstream([("error", 400)])
+    monkeypatch.setattr(resilient_stream, "stream_copilot", upstream)
+
+    assert run(upstream) == [("error", 400)]
+    assert len(upstream.requests) == 1
+
+
+def test_stall_after_first_chunk_resumes(monkeypatch):
+    monkeypatch.setattr(resilient_stream, "UPSTREAM_IDLE_TIMEOUT", 0.05)
+    upstream = FakeUpstream(
+        [("content_chunk", "Hi"), "hang"],
+        [("content_chunk", " there"), ("done", None)],
+    )
+    monkeypatch.setattr(resilient_stream, "stream_copilot", upstream)
+
+    assert run(upstream) == [("content_chunk", "Hi"), ("content_chunk", " there"), ("done", None)]
+
+
+def test_cancel_before_first_token_leaves_no_pending_tasks(monkeypatch):
+    monkeypatch.setattr(resilient_stream, "UPSTREAM_HEDGE", True)
+    monkeypatch.setattr(resilient_stream, "UPSTREAM_TTFT_DEADLINE", 0.05)
+    upstream = FakeUpstream(["hang"], ["hang"])
+    monkeypatch.setattr(resilient_stream, "stream_copilot", upstream)
+
+    async def cancelled_run():
+        body = {"model": "gpt-4.1", "messages": []}
+        consumer = asyncio.create_task(resilient_stream.stream_resilient("token", [], body).__anext__())
+        await asyncio.sleep(0.08)  # Hedge started, both requests waiting for a first token
+        consumer.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await consumer
+        await asyncio.sleep(0)
+        return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    assert asyncio.run(cancelled_run()) == []
+    assert len(upstream.requests) == 2
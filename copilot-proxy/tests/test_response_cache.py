@@ -0,0 +1,73 @@
+"""Response cache: request policy, content addressing, TTL and byte-capped LRU"""
+import json
+import asyncio
+import pytest
+from src import response_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(response_cache, "_entries", response_cache.OrderedDict())
+    monkeypatch.setattr(response_cache, "_stats", {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "bytes": 0})
+
+
+def message(content: str) -> list:
+    return [{"type": "message", "content": content}]
+
+
+@pytest.mark.parametrize("header, policy", [
+    (None, (False, 0)),
+    ("max-age=60", (True, 60)),
+    ("max-age=999999", (True, response_cache.RESPONSE_CACHE_MAX_TTL)),
+    ("max-age=60, no-cache", (False, 60)),
+    ("no-store, max-age=60", (True, 0)),
+    ("max-age=abc", (False, 0)),
+])
+def test_cache_policy(header, policy, monkeypatch):
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_DEFAULT_TTL", 0)
+    assert response_cache.cache_policy(header) == policy
+
+
+def test_key_ignores_whitespace_and_unrelated_fields():
+    key = response_cache.cache_key("gpt-4o", [{"role": "user", "content": " hi\n"}], {"stream": True})
+    assert key == response_cache.cache_key("gpt-4o", [{"role": "user", "content": "hi"}], {})
+    assert key != response_cache.cache_key("gpt-4o", [{"role": "user", "content": "hi"}], {"temperature": 0})
+    assert key != response_cache.cache_key("gpt-4.1", [{"role": "user", "content": "hi"}], {})
+
+
+def test_expired_entries_miss(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    response_cache.put("k", message("a"), ttl=10)
+    assert response_cache.get("k") == message("a")
+    now[0] += 11
+    assert response_cache.get("k") is None
+    assert response_cache.stats()["bytes"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(monkeypatch):
+    size = len(json.dumps(message("a")))
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_MAX_BYTES", 2 * size)
+    response_cache.put("a", message("a"), ttl=60)
+    response_cache.put("b", message("b"), ttl=60)
+    response_cache.get("a")  # b is now the least recently used
+    response_cache.put("c", message("c"), ttl=60)
+    assert response_cache.get("b") is None
+    assert response_cache.get("a") and response_cache.get("c")
+    assert response_cache.stats()["evictions"] == 1
+
+
+def test_record_stores_completed_runs_without_timing():
+    async def run(events):
+        for event in events:
+            yield event
+
+    async def scenario():
+        events = [{"type": "thinking"}, *message("a"), {"type": "timing", "total_ms": 5}]
+        passed = [e async for e in response_cache.record(run(events), "done", 60)]
+        assert passed == events
+        [e async for e in response_cache.record(run([{"type": "error"}]), "failed", 60)]
+
+    asyncio.run(scenario())
+    assert response_cache.get("done") == [{"type": "thinking"}, *message("a")]
+    assert response_cache.get("failed") is None
@@ -0,0 +1,57 @@
+"""Run cancellation, including a DELETE received by a worker that doesn't own the run"""
+import asyncio
+import pytest
+from src import runs, shared_state
+
+
+@pytest.fixture
+def two_workers(monkeypatch):
+    monkeypatch.setattr(runs, "WORKERS", 2)
+    monkeypatch.setattr(runs, "RUN_CANCEL_POLL", 0.01)
+    monkeypatch.setitem(shared_state._backend, "value", shared_state.MemoryBackend())
+
+
+async def slow_run():
+    yield {"type": "message_delta", "content": "Hel"}
+    await asyncio.sleep(3600)
+    yield {"type": "message_delta", "content": "lo"}
+
+
+def test_delete_on_the_owning_worker_cancels_at_once():
+    async def scenario():
+        run = runs.start(slow_run(), "r-local")
+        await asyncio.sleep(0)
+        assert runs.cancel("r-local") == "cancelled"
+        return [e async for e in run.events()]
+
+    events = asyncio.run(scenario())
+    assert events[-1] == {"type": "cancelled", "run_id": "r-local"}
+    assert runs.cancel("r-local") is None
+
+
+def test_delete_on_another_worker_is_forwarded_to_the_owner(two_workers):
+    async def scenario():
+        watcher = asyncio.create_task(runs._watch_cancels())
+        run = runs.start(slow_run(), "r-remote")
+        await asyncio.sleep(0)
+        owned = runs._runs.pop("r-remote")  # As seen from a worker that doesn't have it
+        status = runs.cancel("r-remote")
+        runs._runs["r-remote"] = owned
+        events = await asyncio.wait_for(_collect(run), 1.0)
+        watcher.cancel()
+        return status, events
+
+    status, events = asyncio.run(scenario())
+    assert status == "forwarded"
+    assert events[-1] == {"type": "cancelled", "run_id": "r-remote"}
+    assert shared_state.get("owner:r-remote") is None
+    assert shared_state.get("cancel:r-remote") is None
+
+
+def test_unknown_run_is_not_forwarded(two_workers):
+    assert runs.cancel("r-nobody") is None
+    assert shared_state.get("cancel:r-nobody") is None
+
+
+async def _collect(run) -> list:
+    return [e async for e in run.events()]
@@ -0,0 +1,148 @@
+"""Scheduler slot accounting: requests coalesced, cancelled or shed must give their slot back"""
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI
+from src import scheduler, routes
+
+
+@pytest.fixture(autouse=True)
+def fresh_queues(monkeypatch):
+    monkeypatch.setattr(scheduler, "_queues", {})
+
+
+def in_flight(model: str) -> int:
+    return scheduler._queue(model).in_flight
+
+
+def test_coalesced_followers_release_their_slot(monkeypatch):
+    async def get_token():
+        await asyncio.sleep(0.01)  # Every request is past the in-flight check before the leader joins
+        return "token"
+
+    async def agentic_loop(messages, token, *args):
+        await asyncio.sleep(0.05)
+        yield {"type": "message", "content": "4"}
+
+    monkeypatch.setattr(routes, "get_token", get_token)
+    monkeypatch.setattr(routes, "run_agentic_loop", agentic_loop)
+    app = FastAPI()
+    app.include_router(routes.router)
+
+    async def requests():
+        body = {"model": "gpt-4o", "use_tools": False, "messages": [{"role": "user", "content": "2+2?"}]}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://proxy") as client:
+            return await asyncio.gather(*(client.post("/v1/chat/completions", json=body) for _ in range(3)))
+
+    responses = asyncio.run(requests())
+
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert sorted(str(r.headers.get("x-coalesced")) for r in responses) == ["1", "1", "None"]
+    assert in_flight("gpt-4o") == 0
+
+
+def test_cancelled_during_setup_releases_the_slot(monkeypatch):
+    async def get_token():
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(routes, "get_token", get_token)
+
+    async def disconnect_during_setup():
+        setup = asyncio.create_task(routes._open_run({}, [], "gpt-4o", False, "ip:test", "interactive"))
+        await asyncio.sleep(0.01)
+        assert in_flight("gpt-4o") == 1
+        setup.cancel()
+        await asyncio.gather(setup, return_exceptions=True)
+
+    asyncio.run(disconnect_during_setup())
+    assert in_flight("gpt-4o") == 0
+
+
+def test_waiter_cancelled_after_being_granted_releases_the_slot():
+    async def scenario():
+        scheduler._queue("m").limit = 1
+        await scheduler.acquire("m", "a")
+        waiter = asyncio.create_task(scheduler.acquire("m", "b"))
+        await asyncio.sleep(0)  # Queued
+        scheduler.release("m")  # Hands the slot to the waiter...
+        waiter.cancel()  # ...which is cancelled before it resumes
+        await asyncio.gather(waiter, return_exceptions=True)
+        # Python 3.11's wait_for returns the result instead: then the waiter holds the slot
+        return waiter.cancelled()
+
+    cancelled = asyncio.run(scenario())
+    assert in_flight("m") == (0 if cancelled else 1)
+
+
+def test_shed_past_the_deadline_takes_no_slot(monkeypatch):
+    monkeypatch.setattr(scheduler, "QUEUE_DEADLINES", {"interactive": 0.02, "background": 0.02})
+
+    async def scenario():
+        scheduler._queue("m").limit = 1
+        await scheduler.acquire("m", "a")
+        with pytest.raises(scheduler.Overloaded):
+            await scheduler.acquire("m", "b")
+        scheduler.release("m")
+
+    asyncio.run(scenario())
+    assert in_flight("m") == 0
+    assert scheduler._queue("m").shed == 1
+
+
+async def grant_order(model: str, waiters: list) -> list:
+    """Queue (caller, lane) waiters behind one held slot, then release slots one at a time"""
+    scheduler._queue(model).limit = 1
+    await scheduler.acquire(model, "holder")
+    order = []
+
+    async def wait(caller, lane):
+        await scheduler.acquire(model, caller, lane)
+        order.append(caller)
+
+    tasks = [asyncio.create_task(wait(caller, lane)) for caller, lane in waiters]
+    await asyncio.sleep(0)
+    for _ in waiters:
+        scheduler.release(model)
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_weighted_fair_queuing_favours_heavier_callers():
+    waiters = [("ip:a", "interactive")] * 3 + [("telegram:1", "interactive")] * 3
+    order = asyncio.run(grant_order("m", waiters))
+    # telegram weighs 2.0: finish tags 0.5, 1.0, 1.5 against 1, 2, 3
+    assert order == ["telegram:1", "ip:a", "telegram:1", "telegram:1", "ip:a", "ip:a"]
+
+
+def test_interactive_lane_goes_before_background():
+    waiters = [("ip:a", "background"), ("ip:b", "background"), ("ip:c", "interactive")]
+    assert asyncio.run(grant_order("m", waiters)) == ["ip:c", "ip:a", "ip:b"]
+
+
+def test_aimd_halves_on_throttling_and_grows_on_success():
+    q = scheduler._queue("m")
+    scheduler.observe("m", 429)
+    assert q.limit == q.max_limit / 2
+    scheduler.observe("m", 503)
+    assert q.limit == q.max_limit / 4
+    limit = q.limit
+    scheduler.observe("m", 200)
+    assert q.limit == limit + 1 / limit
+    for _ in range(100):
+        scheduler.observe("m", 200)
+    assert q.limit == q.max_limit
+
+
+def test_retry_after_pauses_dispatch(monkeypatch):
+    monkeypatch.setattr(scheduler, "QUEUE_DEADLINES", {"interactive": 0.05, "background": 0.05})
+
+    async def scenario():
+        scheduler.observe("m", 429, "2")
+        assert scheduler._queue("m").stats()["paused_for"] > 1
+        with pytest.raises(scheduler.Overloaded) as shed:
+            await scheduler.acquire("m", "a")
+        return shed.value.retry_after
+
+    assert asyncio.run(scenario()) == 2
+    assert in_flight("m") == 0
@@ -0,0 +1,73 @@
+"""SpeculativeExecutor batching: one /execute_batch round trip per batch, side effects in order"""
+import json
+import asyncio
+from src.agentic import speculative
+from src.agentic.speculative import SpeculativeExecutor, ready_tool_calls
+
+
+def call(id: str, name: str = "search") -> dict:
+    return {"id": id, "type": "function", "function": {"name": name, "arguments": "{}"}}
+
+
+def fake_batches(monkeypatch) -> list:
+    batches = []
+
+    async def execute_tools(tool_calls, handlers):
+        batches.append([tc["id"] for tc in tool_calls])
+        await asyncio.sleep(0.01)
+        return [{"tool_call_id": tc["id"], "role": "tool", "content": json.dumps(tc["id"])} for tc in tool_calls]
+
+    monkeypatch.setattr(speculative, "execute_tools", execute_tools)
+    return batches
+
+
+def test_calls_completing_at_stream_end_share_one_batch(monkeypatch):
+    batches = fake_batches(monkeypatch)
+
+    async def scenario():
+        return await SpeculativeExecutor({}).results([call("a"), call("b"), call("c")])
+
+    results = asyncio.run(scenario())
+    assert batches == [["a", "b", "c"]]
+    assert [r["tool_call_id"] for r in results] == ["a", "b", "c"]
+
+
+def test_early_call_runs_alone_the_rest_in_one_batch(monkeypatch):
+    batches = fake_batches(monkeypatch)
+
+    async def scenario():
+        executor = SpeculativeExecutor({})
+        executor.submit([call("a")])
+        await asyncio.sleep(0.02)  # Done while the model streams on
+        return await executor.results([call("a"), call("b"), call("c")])
+
+    results = asyncio.run(scenario())
+    assert batches == [["a"], ["b", "c"]]
+    assert [r["tool_call_id"] for r in results] == ["a", "b", "c"]
+
+
+def test_calls_ready_while_a_batch_runs_join_the_next_one(monkeypatch):
+    batches = fake_batches(monkeypatch)
+
+    async def scenario():
+        executor = SpeculativeExecutor({})
+        executor.submit([call("a")])
+        await asyncio.sleep(0)  # a is executing
+        executor.submit([call("b")])
+        executor.submit([call("c"), call("b")])
+        return await executor.results([call("a"), call("b"), call("c"), call("d")])
+
+    results = asyncio.run(scenario())
+    assert batches == [["a"], ["b", "c", "d"]]
+    assert [r["content"] for r in results] == ['"a"', '"b"', '"c"', '"d"']
+
+
+def test_only_finished_arguments_are_ready():
+    buffer = {
+        0: {"id": "a", "name": "think", "arguments": '{"thought": "x"}'},
+        1: {"id": "b", "name": "search", "arguments": '{"q": "y'},
+    }
+    assert [tc["id"] for tc in ready_tool_calls(buffer)] == ["a"]
+    buffer[1]["arguments"] += '"}'
+    assert [tc["id"] for tc in ready_tool_calls(buffer)] == ["b"]
+    assert ready_tool_calls(buffer) == []
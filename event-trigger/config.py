@@ -7,8 +7,15 @@ COPILOT_PROXY_URL = os.getenv("COPILOT_PROXY_URL", "http://copilot-proxy:8080")
 # Memory Service URL for user lookups
 MEMORY_SERVICE_URL = os.getenv("MEMORY_SERVICE_URL", "http://memory-service:8084")
 
+# Max time to wait for an AI run to finish (seconds)
+RUN_TIMEOUT = float(os.getenv("RUN_TIMEOUT", "600"))
+
 # Default AI model
 DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "gpt-4.1")
 
 # Webhook secret for validation (optional)
 WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
+# Tracing: spans appended as JSON lines to TRACE_FILE (empty = traceparent propagation only)
+SERVICE_NAME = os.getenv("SERVICE_NAME", "event-trigger")
+TRACE_FILE = os.getenv("TRACE_FILE", "")
@@ -5,13 +5,15 @@ Uses the plugin system from sources/ for formatting and instructions.
 Integrates with memory-service to find user's telegram_chat_id.
 """
 import json
+import asyncio
 import logging
 import re
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 import httpx
+import tracing
 
-from config import COPILOT_PROXY_URL, MEMORY_SERVICE_URL, DEFAULT_MODEL
+from config import COPILOT_PROXY_URL, MEMORY_SERVICE_URL, DEFAULT_MODEL, RUN_TIMEOUT
 from sources import registry
 
 logger = logging.getLogger(__name__)
@@ -35,7 +37,7 @@ class EventProcessor:
         Returns user info including telegram_chat_id if found.
         """
         try:
-            async with httpx.AsyncClient(timeout=5.0, follow_redirects=True) as client:
+            async with httpx.AsyncClient(timeout=5.0, follow_redirects=True, transport=tracing.transport()) as client:
                 response = await client.post(
                     f"{self.memory_url}/users/lookup-by-account",
                     json={
@@ -57,7 +59,7 @@ class EventProcessor:
         Used to inject conversation history for context.
         """
         try:
-            async with httpx.AsyncClient(timeout=5.0, follow_redirects=True) as client:
+            async with httpx.AsyncClient(timeout=5.0, follow_redirects=True, transport=tracing.transport()) as client:
                 response = await client.get(
                     f"{self.memory_url}/conversations/user/{telegram_chat_id}/recent-messages",
                     params={"limit": limit}
@@ -71,7 +73,7 @@ class EventProcessor:
     async def save_message(self, telegram_chat_id: str, role: str, content: str) -> bool:
         """Save a message to memory-service."""
         try:
-            async with httpx.AsyncClient(timeout=5.0, follow_redirects=True) as client:
+            async with httpx.AsyncClient(timeout=5.0, follow_redirects=True, transport=tracing.transport()) as client:
                 response = await client.post(
                     f"{self.memory_url}/conversations/message",
                     json={
@@ -188,22 +190,37 @@ class EventProcessor:
             self.history = self.history[-self.max_history:]
         
         try:
-            # Call AI
-            async with httpx.AsyncClient(timeout=120.0) as client:
+            # Run as a background run on copilot-proxy and long-poll for the result:
+            # short requests instead of one connection held for the whole run
+            async with httpx.AsyncClient(timeout=60.0, transport=tracing.transport()) as client:
                 response = await client.post(
-                    f"{self.copilot_url}/v1/chat/completions",
+                    f"{self.copilot_url}/v1/runs",
                     json={
                         "messages": messages,
                         "model": model or DEFAULT_MODEL,
-                        "stream": False
+                        # Webhook work yields to interactive users in copilot-proxy's scheduler
+                        "priority": "background",
+                        "caller": f"event-trigger:{source}"
                     }
                 )
                 
-                if response.status_code != 200:
+                if response.status_code != 202:
                     raise Exception(f"AI error: {response.status_code} - {response.text}")
                 
-                result = response.json()
-                ai_response = result.get("choices", [{}])[0].get("message", {}).get("content", "")
+                run = response.json()
+                deadline = asyncio.get_running_loop().time() + RUN_TIMEOUT
+                while run.get("status") in ("queued", "running"):
+                    if asyncio.get_running_loop().time() > deadline:
+                        await client.delete(f"{self.copilot_url}/v1/runs/{run['id']}")
+                        raise Exception(f"AI run {run['id']} timed out after {RUN_TIMEOUT}s")
+                    response = await client.get(f"{self.copilot_url}/v1/runs/{run['id']}", params={"wait": 30})
+                    if response.status_code != 200:
+                        raise Exception(f"AI error: {response.status_code} - {response.text}")
+                    run = response.json()
+                
+                if run["status"] != "completed":
+                    raise Exception(f"AI run {run['status']}: {run.get('error')}")
+                ai_response = run.get("content", "")
                 
                 # Save event and response to memory for context
                 if telegram_chat_id:
@@ -256,14 +273,16 @@ class EventProcessor:
         ]
         
         try:
-            async with httpx.AsyncClient(timeout=120.0) as client:
+            async with httpx.AsyncClient(timeout=120.0, transport=tracing.transport()) as client:
                 async with client.stream(
                     "POST",
                     f"{self.copilot_url}/v1/chat/completions",
                     json={
                         "messages": messages,
                         "model": model or DEFAULT_MODEL,
-                        "stream": True
+                        "stream": True,
+                        "priority": "background",
+                        "caller": f"event-trigger:{source}"
                     }
                 ) as response:
                     async for line in response.aiter_lines():
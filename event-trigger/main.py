@@ -16,17 +16,20 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Any, Dict
 
-from config import WEBHOOK_SECRET
+from config import WEBHOOK_SECRET, SERVICE_NAME, TRACE_FILE
 from sources import registry
 from event_processor import event_processor
+import tracing
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+tracing.configure(SERVICE_NAME, TRACE_FILE)
 
 app = FastAPI(
     title="Event Trigger Service",
     description="Webhook receiver that triggers AI processing - Sources are auto-discovered"
 )
+app.add_middleware(tracing.TraceMiddleware)
 
 
 # ============================================================================
@@ -3,15 +3,24 @@ MCP Server - Plugin-based Tools System
 Each tool is a separate file in the tools/ directory
 Supports Zapier MCP integration via zapier-bridge service
 """
+import os
 import json
-from fastapi import FastAPI, HTTPException
+import hashlib
+import logging
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import Any, Dict, List
 
 from tools import load_all_tools
 from zapier_bridge import zapier_bridge
+import tracing
+
+logger = logging.getLogger(__name__)
+tracing.configure(os.getenv("SERVICE_NAME", "mcp-server"), os.getenv("TRACE_FILE", ""))
 
 app = FastAPI(title="MCP Tools Server")
+app.add_middleware(tracing.TraceMiddleware)
 
 # Load local tools at startup
 print("Loading MCP tools...")
@@ -30,6 +39,7 @@ class ToolCallRequest(BaseModel):
 
 class ToolCallBatchRequest(BaseModel):
     tool_calls: List[Dict[str, Any]]
+    include_events: bool = False  # Attach each tool's to_event() output to its result
 
 
 @app.get("/")
@@ -61,19 +71,83 @@ async def get_zapier_tools():
 
 @app.get("/tools/handlers")
 async def get_handlers():
-    """Return tool handler info (to_event, is_terminal)"""
+    """Return tool handler info (to_event, is_terminal, is_pure)"""
+    zapier_tools = await zapier_bridge.get_tools()
+    return {"handlers": _handler_info(zapier_tools)}
+
+
+@app.get("/tools/catalog")
+async def get_catalog(request: Request):
+    """Return tools + handlers in one response, versioned with an ETag"""
+    zapier_tools = await zapier_bridge.get_tools()
+    tools = TOOLS + zapier_tools
+    handlers = _handler_info(zapier_tools)
+    version = hashlib.sha256(json.dumps([tools, handlers], sort_keys=True).encode()).hexdigest()[:16]
+    etag = f'"{version}"'
+    
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse({"version": version, "tools": tools, "handlers": handlers}, headers={"ETag": etag})
+
+
+def _pure_spec(name: str, module) -> dict:
+    """
+    Result/event mapping a pure tool declares with pure_spec(), so the proxy
+    can run it locally. {"$arg": "param"} stands for that argument, every
+    other value is literal. References are checked against the tool's
+    parameters at startup.
+    """
+    if not hasattr(module, "pure_spec"):
+        raise ValueError(f"Pure tool {name} must declare pure_spec()")
+    spec = module.pure_spec()
+    definition = next(t for t in TOOLS if t["function"]["name"] == name)
+    params = definition["function"].get("parameters", {}).get("properties", {})
+    unknown = [ref for ref in _arg_refs(spec) if ref not in params]
+    if unknown:
+        raise ValueError(f"pure_spec() of {name} refers to unknown arguments {unknown}")
+    return {"result": spec["result"], "event": spec.get("event")}
+
+
+def _arg_refs(value):
+    """Argument names referenced by {"$arg": name} in a pure_spec() mapping"""
+    if isinstance(value, dict):
+        if set(value) == {"$arg"}:
+            yield value["$arg"]
+        else:
+            for v in value.values():
+                yield from _arg_refs(v)
+    elif isinstance(value, list):
+        for v in value:
+            yield from _arg_refs(v)
+
+
+def _local_handler_info() -> dict:
+    """Handler info for local tools (static, computed once at startup)"""
     info = {}
     for name, module in HANDLERS.items():
         info[name] = {
             "has_to_event": hasattr(module, "to_event"),
-            "is_terminal": getattr(module, "is_terminal", lambda: False)()
+            "is_terminal": getattr(module, "is_terminal", lambda: False)(),
+            "is_pure": getattr(module, "is_pure", lambda: False)()
         }
-    # Add Zapier tools (no special handlers)
-    zapier_tools = await zapier_bridge.get_tools()
+        if info[name]["is_pure"]:
+            info[name]["pure"] = _pure_spec(name, module)
+        if hasattr(module, "get_stream_field"):
+            field, event = module.get_stream_field()
+            info[name]["stream"] = {"field": field, "event": event}
+    return info
+
+
+LOCAL_HANDLERS = _local_handler_info()
+
+
+def _handler_info(zapier_tools: list) -> dict:
+    """Handler info for local tools + Zapier tools (no special handlers)"""
+    info = dict(LOCAL_HANDLERS)
     for tool in zapier_tools:
         name = tool["function"]["name"]
-        info[name] = {"has_to_event": False, "is_terminal": False}
-    return {"handlers": info}
+        info[name] = {"has_to_event": False, "is_terminal": False, "is_pure": False}
+    return info
 
 
 @app.post("/tools/to_event")
@@ -99,7 +173,8 @@ async def execute_tool(request: ToolCallRequest):
     """Execute a single tool (local or Zapier)"""
     # Check if it's a Zapier tool
     if request.name.startswith("zapier_"):
-        result = await zapier_bridge.execute(request.name, request.arguments)
+        with tracing.span(f"tool {request.name}"):
+            result = await zapier_bridge.execute(request.name, request.arguments)
         if result.get("success"):
             return {"tool": request.name, "result": result.get("result")}
         else:
@@ -110,7 +185,8 @@ async def execute_tool(request: ToolCallRequest):
         raise HTTPException(status_code=404, detail=f"Tool '{request.name}' not found")
     
     try:
-        result = FUNCTIONS[request.name](**request.arguments)
+        with tracing.span(f"tool {request.name}"):
+            result = FUNCTIONS[request.name](**request.arguments)
         return {"tool": request.name, "result": result}
     except Exception as e:
         return {"tool": request.name, "error": str(e)}
@@ -118,7 +194,7 @@ async def execute_tool(request: ToolCallRequest):
 
 @app.post("/execute_batch")
 async def execute_batch(request: ToolCallBatchRequest):
-    """Execute multiple tool calls (local and Zapier)"""
+    """Execute multiple tool calls (local and Zapier), optionally with their UI events"""
     results = []
     
     for tc in request.tool_calls:
@@ -133,27 +209,44 @@ async def execute_batch(request: ToolCallBatchRequest):
         
         # Check if Zapier tool
         if name.startswith("zapier_"):
-            result = await zapier_bridge.execute(name, args)
+            with tracing.span(f"tool {name}"):
+                result = await zapier_bridge.execute(name, args)
             if result.get("success"):
-                results.append({"tool_call_id": tool_id, "role": "tool", "content": json.dumps(result.get("result", ""))})
+                results.append(_batch_result(request, tool_id, name, args, result.get("result", "")))
             else:
-                results.append({"tool_call_id": tool_id, "role": "tool", "content": json.dumps({"error": result.get("error")})})
+                results.append(_batch_result(request, tool_id, name, args, {"error": result.get("error")}))
             continue
         
         # Local tool
         if name not in FUNCTIONS:
-            results.append({"tool_call_id": tool_id, "role": "tool", "content": json.dumps({"error": "Not found"})})
+            results.append(_batch_result(request, tool_id, name, args, {"error": "Not found"}))
             continue
         
         try:
-            result = FUNCTIONS[name](**args)
-            results.append({"tool_call_id": tool_id, "role": "tool", "content": json.dumps(result)})
+            with tracing.span(f"tool {name}"):
+                result = FUNCTIONS[name](**args)
         except Exception as e:
-            results.append({"tool_call_id": tool_id, "role": "tool", "content": json.dumps({"error": str(e)})})
+            result = {"error": str(e)}
+        results.append(_batch_result(request, tool_id, name, args, result))
     
     return {"results": results}
 
 
+def _batch_result(request: ToolCallBatchRequest, tool_id: str, name: str, args: dict, result) -> dict:
+    """Build a tool result message (+ "event" when include_events is set)"""
+    entry = {"tool_call_id": tool_id, "role": "tool", "content": json.dumps(result)}
+    if request.include_events:
+        module = HANDLERS.get(name)
+        event = None
+        if module is not None and hasattr(module, "to_event"):
+            try:
+                event = module.to_event(args, result if isinstance(result, dict) else {})
+            except Exception as e:
+                logger.warning(f"⚠️ to_event failed for {name}: {e}", exc_info=True)
+        entry["event"] = event
+    return entry
+
+
 @app.get("/health")
 async def health():
     zapier_enabled = await zapier_bridge.is_enabled()
@@ -5,6 +5,9 @@ Each .py file in this directory is a tool plugin with:
   - execute(**args) -> result dict  
   - to_event(args, result) -> UI event (optional)
   - is_terminal() -> bool (optional)
+  - is_pure() -> bool (optional, result/event only depend on arguments)
+  - pure_spec() -> {"result", "event"} (required with is_pure, {"$arg": name} = that argument)
+  - get_stream_field() -> (arg, event type) (optional, string argument streamed live)
 """
 import os
 import importlib
@@ -15,7 +18,7 @@ def load_all_tools():
     """Load all tool plugins"""
     tools = []
     functions = {}
-    handlers = {}  # Tool name -> module (for to_event, is_terminal)
+    handlers = {}  # Tool name -> module (for to_event, is_terminal, is_pure, pure_spec, get_stream_field)
     
     tools_dir = os.path.dirname(__file__)
     
@@ -3,6 +3,7 @@ Tool to get the current user's configuration (linked accounts, trigger settings)
 """
 import os
 import httpx
+import tracing
 
 MEMORY_SERVICE_URL = os.environ.get("MEMORY_SERVICE_URL", "http://memory-service:8084")
 
@@ -32,7 +33,7 @@ def execute(telegram_chat_id: str) -> dict:
         return {"success": False, "error": "Telegram chat ID is required"}
     
     try:
-        with httpx.Client(timeout=10.0) as client:
+        with httpx.Client(timeout=10.0, transport=tracing.transport(sync=True)) as client:
             # Get linked accounts
             accounts_response = client.get(
                 f"{MEMORY_SERVICE_URL}/accounts/{telegram_chat_id}"
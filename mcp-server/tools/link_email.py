@@ -4,6 +4,7 @@ This allows the AI to send notifications to the user when emails arrive.
 """
 import os
 import httpx
+import tracing
 
 MEMORY_SERVICE_URL = os.environ.get("MEMORY_SERVICE_URL", "http://memory-service:8084")
 
@@ -46,7 +47,7 @@ def execute(email: str, telegram_chat_id: str) -> dict:
         return {"success": False, "error": "Invalid email address format"}
     
     try:
-        with httpx.Client(timeout=10.0) as client:
+        with httpx.Client(timeout=10.0, transport=tracing.transport(sync=True)) as client:
             response = client.post(
                 f"{MEMORY_SERVICE_URL}/accounts/link",
                 json={
@@ -4,6 +4,7 @@ Used for RAG - search through previously stored information.
 """
 import os
 import httpx
+import tracing
 
 MEMORY_SERVICE_URL = os.environ.get("MEMORY_SERVICE_URL", "http://memory-service:8084")
 
@@ -47,7 +48,7 @@ def execute(query: str, category: str = None, telegram_chat_id: str = None, limi
         return {"success": False, "error": "Search query is required"}
     
     try:
-        with httpx.Client(timeout=10.0) as client:
+        with httpx.Client(timeout=10.0, transport=tracing.transport(sync=True)) as client:
             payload = {
                 "query": query,
                 "limit": limit
@@ -4,6 +4,7 @@ Used for RAG - the AI can recall this information later.
 """
 import os
 import httpx
+import tracing
 
 MEMORY_SERVICE_URL = os.environ.get("MEMORY_SERVICE_URL", "http://memory-service:8084")
 
@@ -49,7 +50,7 @@ def execute(content: str, category: str = "general", telegram_chat_id: str = Non
         category = "general"
     
     try:
-        with httpx.Client(timeout=10.0) as client:
+        with httpx.Client(timeout=10.0, transport=tracing.transport(sync=True)) as client:
             payload = {
                 "content": content,
                 "category": category
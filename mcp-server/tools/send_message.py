@@ -37,6 +37,24 @@ def to_event(args: dict, result: dict) -> dict:
     }
 
 
+def get_stream_field() -> tuple:
+    """(string argument, event type) streamed live to the user while the model writes it"""
+    return "message", "message_delta"
+
+
 def is_terminal() -> bool:
     """Does this tool end the agentic loop?"""
     return False
+
+
+def is_pure() -> bool:
+    """No side effects - result and event only depend on arguments (run by the proxy)"""
+    return True
+
+
+def pure_spec() -> dict:
+    """Result and event built by the proxy ({"$arg": name} = that argument), must match execute()/to_event()"""
+    return {
+        "result": {"content": {"$arg": "message"}},
+        "event": {"type": "message", "content": {"$arg": "message"}}
+    }
@@ -3,6 +3,7 @@ Send Telegram Tool - Send messages via Telegram Bot API
 """
 import os
 import httpx
+import tracing
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 TELEGRAM_DEFAULT_CHAT_ID = os.getenv("TELEGRAM_DEFAULT_CHAT_ID", "")
@@ -53,7 +54,7 @@ def execute(message: str, chat_id: str = None) -> dict:
     
     try:
         # Direct connection without proxy for Telegram API
-        with httpx.Client(timeout=30.0) as client:
+        with httpx.Client(timeout=30.0, transport=tracing.transport(sync=True, propagate=False)) as client:
             url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
             response = client.post(url, json={
                 "chat_id": target_chat_id,
@@ -85,7 +86,7 @@ def _get_last_chat_id() -> str:
     
     try:
         # Direct connection without proxy
-        with httpx.Client(timeout=10.0) as client:
+        with httpx.Client(timeout=10.0, transport=tracing.transport(sync=True, propagate=False)) as client:
             url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/getUpdates"
             response = client.get(url, params={"limit": 1, "offset": -1})
             
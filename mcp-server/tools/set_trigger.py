@@ -4,6 +4,7 @@ Allows enabling/disabling triggers and setting custom instructions.
 """
 import os
 import httpx
+import tracing
 
 MEMORY_SERVICE_URL = os.environ.get("MEMORY_SERVICE_URL", "http://memory-service:8084")
 
@@ -52,7 +53,7 @@ def execute(telegram_chat_id: str, source: str, enabled: bool = True, instructio
         return {"success": False, "error": f"Invalid source. Must be one of: {', '.join(VALID_SOURCES)}"}
     
     try:
-        with httpx.Client(timeout=10.0) as client:
+        with httpx.Client(timeout=10.0, transport=tracing.transport(sync=True)) as client:
             response = client.post(
                 f"{MEMORY_SERVICE_URL}/triggers/config",
                 json={
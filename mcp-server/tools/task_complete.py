@@ -32,3 +32,13 @@ def to_event(args: dict, result: dict) -> dict:
 def is_terminal() -> bool:
     """This tool ends the agentic loop"""
     return True
+
+
+def is_pure() -> bool:
+    """No side effects - result and event only depend on arguments (run by the proxy)"""
+    return True
+
+
+def pure_spec() -> dict:
+    """Result and event built by the proxy, must match execute()/to_event()"""
+    return {"result": {"status": "complete"}, "event": None}
@@ -41,6 +41,24 @@ def to_event(args: dict, result: dict) -> dict:
     }
 
 
+def get_stream_field() -> tuple:
+    """(string argument, event type) streamed live in the thinking block while the model writes it"""
+    return "thought", "thinking_delta"
+
+
 def is_terminal() -> bool:
     """Does this tool end the agentic loop?"""
     return False
+
+
+def is_pure() -> bool:
+    """No side effects - result and event only depend on arguments (run by the proxy)"""
+    return True
+
+
+def pure_spec() -> dict:
+    """Result and event built by the proxy ({"$arg": name} = that argument), must match execute()/to_event()"""
+    return {
+        "result": {"content": {"$arg": "thought"}},
+        "event": {"type": "thinking", "content": {"$arg": "thought"}}
+    }
@@ -3,6 +3,7 @@ Tool to unlink an account from the user's profile.
 """
 import os
 import httpx
+import tracing
 
 MEMORY_SERVICE_URL = os.environ.get("MEMORY_SERVICE_URL", "http://memory-service:8084")
 
@@ -47,7 +48,7 @@ def execute(telegram_chat_id: str, account_type: str, account_identifier: str) -
         return {"success": False, "error": "Account identifier is required"}
     
     try:
-        with httpx.Client(timeout=10.0) as client:
+        with httpx.Client(timeout=10.0, transport=tracing.transport(sync=True)) as client:
             response = client.post(
                 f"{MEMORY_SERVICE_URL}/accounts/unlink",
                 json={
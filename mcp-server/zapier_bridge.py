@@ -5,6 +5,7 @@ import os
 import json
 import logging
 import httpx
+import tracing
 from typing import Dict, Any, List, Optional
 
 logger = logging.getLogger(__name__)
@@ -25,7 +26,7 @@ class ZapierBridge:
     async def _request(self, method: str, path: str, json_data: dict = None) -> Optional[Dict]:
         """Make request to Zapier Bridge"""
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
+            async with httpx.AsyncClient(timeout=30.0, transport=tracing.transport()) as client:
                 url = f"{self.url}{path}"
                 if method == "GET":
                     resp = await client.get(url)
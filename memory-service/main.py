@@ -1,11 +1,15 @@
 """
 Memory Service - Stores user configs, linked accounts, and memories for RAG.
 """
+import os
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 import models
+import tracing
 from routes import router
 
+tracing.configure(os.getenv("SERVICE_NAME", "memory-service"), os.getenv("TRACE_FILE", ""))
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize database on startup."""
@@ -18,6 +22,7 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+app.add_middleware(tracing.TraceMiddleware)
 app.include_router(router)
 
 
@@ -2,11 +2,12 @@
 Database models for memory service.
 Uses SQLite with aiosqlite for async operations.
 """
+import os
 import aiosqlite
 from datetime import datetime
 from pathlib import Path
 
-DATABASE_PATH = Path("/app/data/memory.db")
+DATABASE_PATH = Path(os.getenv("DATABASE_PATH", "/app/data/memory.db"))
 
 
 async def init_db():
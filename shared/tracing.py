@@ -0,0 +1,212 @@
+"""
+W3C trace context (traceparent) propagation and span timing.
+
+- TraceMiddleware: a server span per incoming request, continuing the caller's trace
+- transport() / traced(): httpx transport that sends traceparent and times outgoing requests
+- span(): an internal span around any block
+
+Spans are appended as JSON lines to TRACE_FILE (unset = propagation only).
+
+This is the one copy for every service: their builds copy it in (a symlink
+in the service tree for local runs), and each service calls configure()
+with its name and trace file at startup.
+"""
+import os
+import json
+import time
+import secrets
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Tuple
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# (trace_id, span_id) of the active span
+_current: ContextVar = ContextVar("trace_context", default=None)
+_exporter = {"file": None}
+_config = {"service": os.getenv("SERVICE_NAME", "unknown"), "trace_file": os.getenv("TRACE_FILE", "")}
+
+
+def configure(service: str, trace_file: str = ""):
+    """Name spans after this service and export them to trace_file (empty = off)"""
+    _config.update(service=service, trace_file=trace_file)
+
+
+def parse(header: Optional[str]) -> Optional[Tuple[str, str]]:
+    """(trace_id, parent_id) from a traceparent header, None if absent or invalid"""
+    parts = (header or "").strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        if int(parts[1], 16) == 0 or int(parts[2], 16) == 0:
+            return None
+    except ValueError:
+        return None
+    return parts[1].lower(), parts[2].lower()
+
+
+def current() -> Optional[Tuple[str, str]]:
+    return _current.get()
+
+
+def traceparent() -> Optional[str]:
+    """Header value for the active span (None outside any span)"""
+    ctx = _current.get()
+    return f"00-{ctx[0]}-{ctx[1]}-01" if ctx else None
+
+
+class Span:
+    """One timed operation; exported when ended"""
+
+    def __init__(self, name: str, kind: str, parent: Optional[Tuple[str, str]] = None, **attributes):
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent[0] if parent else secrets.token_hex(16)
+        self.parent_id = parent[1] if parent else None
+        self.span_id = secrets.token_hex(8)
+        self.attributes = attributes
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+
+    @property
+    def context(self) -> Tuple[str, str]:
+        return self.trace_id, self.span_id
+
+    def end(self, **attributes):
+        self.attributes.update(attributes)
+        _export({
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "service": _config["service"], "name": self.name, "kind": self.kind,
+            "start": round(self.start, 6), "duration_ms": round((time.perf_counter() - self._t0) * 1000, 3),
+            "attributes": self.attributes,
+        })
+
+
+def _export(record: dict):
+    path = _config["trace_file"]
+    if not path:
+        return
+    try:
+        if _exporter["file"] is None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            _exporter["file"] = open(path, "a", buffering=1)  # Line-buffered, appends stay whole lines
+        _exporter["file"].write(json.dumps(record, default=str) + "\n")
+    except OSError as e:
+        logger.warning(f"Span export failed: {e}")
+
+
+@contextmanager
+def span(name: str, parent: Optional[Tuple[str, str]] = None, **attributes):
+    """Internal span, child of parent / the active span (or a new trace)"""
+    s = Span(name, "internal", parent or _current.get(), **attributes)
+    token = _current.set(s.context)
+    error = None
+    try:
+        yield s
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        s.end(**({"error": error} if error else {}))
+
+
+class TraceMiddleware:
+    """ASGI middleware: server span per request (ends once the response body is sent)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+
+        header = next((v.decode("latin-1") for k, v in scope.get("headers", []) if k == b"traceparent"), None)
+        method = scope.get("method", "WS")
+        s = Span(f"{method} {scope.get('path', '')}", "server", parse(header), **{"http.method": method})
+        token = _current.set(s.context)
+        status = {}
+
+        async def send_traced(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_traced)
+        finally:
+            _current.reset(token)
+            s.end(**{"http.status_code": status.get("code")})
+
+
+def _client_span(request, propagate: bool) -> Span:
+    # External URLs may carry credentials in the path (e.g. Telegram bot token): host only
+    target = f"{request.url.host}{request.url.path}" if propagate else request.url.host
+    s = Span(f"{request.method} {target}", "client", _current.get(),
+             **{"http.method": request.method, "http.host": request.url.host})
+    if propagate:
+        request.headers["traceparent"] = f"00-{s.trace_id}-{s.span_id}-01"
+    return s
+
+
+class _AsyncTracedTransport(httpx.AsyncBaseTransport):
+    """Client span per request: ends at the response headers, or with the error (timeout, cancellation)"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, propagate: bool):
+        self._transport = transport
+        self._propagate = propagate
+
+    async def handle_async_request(self, request):
+        s = _client_span(request, self._propagate)
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException as e:
+            s.end(error=type(e).__name__)
+            raise
+        s.end(**{"http.status_code": response.status_code})
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class _TracedTransport(httpx.BaseTransport):
+    """Sync counterpart of _AsyncTracedTransport"""
+
+    def __init__(self, transport: httpx.BaseTransport, propagate: bool):
+        self._transport = transport
+        self._propagate = propagate
+
+    def handle_request(self, request):
+        s = _client_span(request, self._propagate)
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException as e:
+            s.end(error=type(e).__name__)
+            raise
+        s.end(**{"http.status_code": response.status_code})
+        return response
+
+    def close(self):
+        self._transport.close()
+
+
+def transport(sync: bool = False, propagate: bool = True, **options):
+    """
+    httpx transport for a client: client span per request, traceparent header.
+
+    options go to httpx.(Async)HTTPTransport (http2, limits...).
+    propagate=False times calls to external APIs without sending them our trace ids.
+    """
+    if sync:
+        return traced(httpx.HTTPTransport(**options), propagate)
+    return traced(httpx.AsyncHTTPTransport(**options), propagate)
+
+
+def traced(transport, propagate: bool = True):
+    """An existing httpx transport (sync or async) with client spans, as transport() builds"""
+    if isinstance(transport, httpx.AsyncBaseTransport):
+        return _AsyncTracedTransport(transport, propagate)
+    return _TracedTransport(transport, propagate)
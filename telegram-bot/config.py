@@ -5,3 +5,7 @@ TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 COPILOT_PROXY_URL = os.getenv("COPILOT_PROXY_URL", "http://copilot-proxy:8080")
 MEMORY_SERVICE_URL = os.getenv("MEMORY_SERVICE_URL", "http://memory-service:8084")
 DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "gpt-4.1")
+
+# Tracing: spans appended as JSON lines to TRACE_FILE (empty = traceparent propagation only)
+SERVICE_NAME = os.getenv("SERVICE_NAME", "telegram-bot")
+TRACE_FILE = os.getenv("TRACE_FILE", "")
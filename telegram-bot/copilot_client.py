@@ -1,8 +1,13 @@
 """Client for Copilot Proxy API"""
 import json
+import uuid
 import httpx
+import tracing
 from config import COPILOT_PROXY_URL, DEFAULT_MODEL
 
+# telegram_user_id -> run ids in progress (so /new can abort them)
+_active_runs = {}
+
 
 async def chat(messages: list, model: str = None, user_context: dict = None) -> dict:
     """
@@ -47,7 +52,20 @@ async def chat_stream(messages: list, model: str = None, user_context: dict = No
     if user_context:
         body["user_context"] = user_context
     
-    async with httpx.AsyncClient(timeout=120.0) as client:
+    # Named run, cancellable with cancel_runs()
+    owner = (user_context or {}).get("telegram_user_id")
+    body["run_id"] = f"telegram-{owner}-{uuid.uuid4().hex[:12]}" if owner else uuid.uuid4().hex
+    _active_runs.setdefault(owner, set()).add(body["run_id"])
+    
+    try:
+        async for event in _stream(body):
+            yield event
+    finally:
+        _active_runs.get(owner, set()).discard(body["run_id"])
+
+
+async def _stream(body: dict):
+    async with httpx.AsyncClient(timeout=120.0, transport=tracing.transport()) as client:
         async with client.stream("POST", f"{COPILOT_PROXY_URL}/v1/chat/completions", json=body) as resp:
             if resp.status_code != 200:
                 yield {"type": "error", "content": f"Error: {resp.status_code}"}
@@ -116,10 +134,23 @@ async def chat_stream(messages: list, model: str = None, user_context: dict = No
                 yield {"type": "message", "content": buffer["message"]}
 
 
+async def cancel_runs(user_id: str) -> int:
+    """Abort this user's runs still in progress on copilot-proxy"""
+    cancelled = 0
+    async with httpx.AsyncClient(timeout=10.0, transport=tracing.transport()) as client:
+        for run_id in list(_active_runs.pop(user_id, ())):
+            try:
+                resp = await client.delete(f"{COPILOT_PROXY_URL}/v1/runs/{run_id}")
+                cancelled += resp.status_code in (200, 202)  # 202: another proxy worker owns it
+            except httpx.HTTPError:
+                pass
+    return cancelled
+
+
 async def get_models() -> list:
     """Get available models"""
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with httpx.AsyncClient(timeout=10.0, transport=tracing.transport()) as client:
             resp = await client.get(f"{COPILOT_PROXY_URL}/v1/models")
             if resp.status_code == 200:
                 return resp.json().get("data", [])
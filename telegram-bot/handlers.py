@@ -7,6 +7,7 @@ from telegram.constants import ParseMode, ChatAction
 import copilot_client
 import conversations
 import memory_client
+import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -73,6 +74,7 @@ async def new_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /new command"""
     user_id = update.effective_user.id
     conversations.clear_conversation(user_id)
+    await copilot_client.cancel_runs(str(user_id))
     await update.message.reply_text("🔄 Nouvelle conversation! L'historique a été effacé.")
 
 
@@ -114,7 +116,12 @@ async def model_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle user messages"""
+    """Handle user messages (one trace per message, followed across services via traceparent)"""
+    with tracing.span("telegram message", **{"chat.id": update.effective_chat.id}):
+        await _handle_message(update, context)
+
+
+async def _handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     user_message = update.message.text
     chat_id = update.effective_chat.id
@@ -2,8 +2,9 @@
 import logging
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
 
-from config import TELEGRAM_BOT_TOKEN
+from config import TELEGRAM_BOT_TOKEN, SERVICE_NAME, TRACE_FILE
 from handlers import start, help_command, new_conversation, select_model, model_callback, handle_message, toggle_mode
+import tracing
 
 # Logging
 logging.basicConfig(
@@ -12,6 +13,7 @@ logging.basicConfig(
     datefmt="%H:%M:%S"
 )
 logger = logging.getLogger(__name__)
+tracing.configure(SERVICE_NAME, TRACE_FILE)
 
 
 def main():
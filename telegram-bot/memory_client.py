@@ -1,6 +1,7 @@
 """Client for Memory Service API"""
 import logging
 import httpx
+import tracing
 from config import MEMORY_SERVICE_URL
 
 logger = logging.getLogger(__name__)
@@ -12,7 +13,7 @@ async def save_message(telegram_chat_id: str, role: str, content: str, conversat
         # Use telegram_chat_id as conversation_id if not provided
         conv_id = conversation_id or f"telegram_{telegram_chat_id}"
         
-        async with httpx.AsyncClient(timeout=5.0) as client:
+        async with httpx.AsyncClient(timeout=5.0, transport=tracing.transport()) as client:
             response = await client.post(
                 f"{MEMORY_SERVICE_URL}/conversations/message",
                 json={
@@ -31,7 +32,7 @@ async def save_message(telegram_chat_id: str, role: str, content: str, conversat
 async def get_recent_messages(telegram_chat_id: str, limit: int = 20) -> list:
     """Get recent messages for a user from memory service."""
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
+        async with httpx.AsyncClient(timeout=5.0, transport=tracing.transport()) as client:
             response = await client.get(
                 f"{MEMORY_SERVICE_URL}/conversations/user/{telegram_chat_id}/recent-messages",
                 params={"limit": limit}
@@ -46,7 +47,7 @@ async def get_recent_messages(telegram_chat_id: str, limit: int = 20) -> list:
 async def link_account(telegram_chat_id: str, account_type: str, account_identifier: str) -> bool:
     """Link an external account to the user."""
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
+        async with httpx.AsyncClient(timeout=5.0, transport=tracing.transport()) as client:
             response = await client.post(
                 f"{MEMORY_SERVICE_URL}/accounts/link",
                 json={
@@ -64,7 +65,7 @@ async def link_account(telegram_chat_id: str, account_type: str, account_identif
 async def get_linked_accounts(telegram_chat_id: str) -> list:
     """Get all linked accounts for a user."""
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
+        async with httpx.AsyncClient(timeout=5.0, transport=tracing.transport()) as client:
             response = await client.get(
                 f"{MEMORY_SERVICE_URL}/accounts/{telegram_chat_id}"
             )
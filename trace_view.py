@@ -0,0 +1,85 @@
+"""
+Rebuild traces from the span files written by the services (TRACE_FILE) and print them as trees.
+
+    python trace_view.py                       # 10 slowest traces in ./traces/*.jsonl
+    python trace_view.py --trace <trace_id>    # one trace
+    python trace_view.py --limit 3 path/to/*.jsonl
+
+The critical path (the longest child at each level) is marked with *.
+"""
+import sys
+import glob
+import json
+import argparse
+from collections import defaultdict
+
+
+def load(paths):
+    traces = defaultdict(list)
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                try:
+                    span = json.loads(line)
+                except ValueError:
+                    continue  # Partial line of a file still being written
+                traces[span["trace_id"]].append(span)
+    return traces
+
+
+def print_trace(spans):
+    by_id = {s["span_id"]: s for s in spans}
+    children = defaultdict(list)
+    roots = []
+    for s in spans:
+        if s["parent_id"] in by_id:
+            children[s["parent_id"]].append(s)
+        else:
+            roots.append(s)  # True root, or its parent's service doesn't export spans
+    t0 = min(s["start"] for s in spans)
+
+    def walk(span, depth, critical):
+        offset = (span["start"] - t0) * 1000
+        mark = "*" if critical else " "
+        status = span["attributes"].get("http.status_code")
+        print(f"{mark} {offset:9.1f} ms {span['duration_ms']:9.1f} ms  {'  ' * depth}"
+              f"[{span['service']}] {span['name']}" + (f" → {status}" if status else ""))
+        kids = sorted(children[span["span_id"]], key=lambda s: s["start"])
+        slowest = max(kids, key=lambda s: s["start"] + s["duration_ms"] / 1000, default=None)
+        for kid in kids:
+            walk(kid, depth + 1, critical and kid is slowest)
+
+    for root in sorted(roots, key=lambda s: s["start"]):
+        walk(root, 0, True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*", default=None)
+    parser.add_argument("--trace", help="trace id to show")
+    parser.add_argument("--limit", type=int, default=10, help="slowest traces to show")
+    args = parser.parse_args()
+
+    traces = load(args.files or glob.glob("traces/*.jsonl"))
+    if not traces:
+        sys.exit("No spans found")
+
+    if args.trace:
+        ids = [args.trace]
+    else:
+        def span_of(spans):
+            return max(s["start"] + s["duration_ms"] / 1000 for s in spans) - min(s["start"] for s in spans)
+        ids = sorted(traces, key=lambda t: span_of(traces[t]), reverse=True)[:args.limit]
+
+    for trace_id in ids:
+        spans = traces.get(trace_id)
+        if not spans:
+            print(f"Unknown trace {trace_id}")
+            continue
+        services = sorted({s["service"] for s in spans})
+        print(f"\ntrace {trace_id} | {len(spans)} spans | {', '.join(services)}")
+        print_trace(spans)
+
+
+if __name__ == "__main__":
+    main()
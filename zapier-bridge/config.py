@@ -10,3 +10,7 @@ ZAPIER_MCP_SECRET = os.getenv("ZAPIER_MCP_SECRET", "")
 
 # Enable/disable Zapier integration - Only URL is required
 ZAPIER_ENABLED = bool(ZAPIER_MCP_URL)
+
+# Tracing: spans appended as JSON lines to TRACE_FILE (empty = traceparent propagation only)
+SERVICE_NAME = os.getenv("SERVICE_NAME", "zapier-bridge")
+TRACE_FILE = os.getenv("TRACE_FILE", "")
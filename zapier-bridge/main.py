@@ -17,10 +17,12 @@ from pydantic import BaseModel
 from typing import Any, Dict, List, Optional
 
 from zapier_client import zapier_client
-from config import ZAPIER_ENABLED, ZAPIER_MCP_URL
+from config import ZAPIER_ENABLED, ZAPIER_MCP_URL, SERVICE_NAME, TRACE_FILE
+import tracing
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+tracing.configure(SERVICE_NAME, TRACE_FILE)
 
 
 @asynccontextmanager
@@ -37,6 +39,7 @@ async def lifespan(app: FastAPI):
 
 
 app = FastAPI(title="Zapier MCP Bridge", lifespan=lifespan)
+app.add_middleware(tracing.TraceMiddleware)
 
 
 class ToolCallRequest(BaseModel):